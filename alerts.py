@@ -0,0 +1,119 @@
+import os
+import re
+import time
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import exceptions
+import metrics
+
+ERROR_WINDOW: float = float(os.getenv('ERROR_WINDOW', 3600))
+ERROR_CHAT_ID: Optional[str] = os.getenv('ERROR_CHAT_ID')
+MAX_MESSAGE: int = 200
+PREFIX: str = 'Сбой в работе программы: '
+
+QUOTED = re.compile(r'"[^"]*"|\'[^\']*\'')
+IDENTIFIER = re.compile(r'\b[0-9a-f]{8,}\b|\d[\w\-]*(?:[.:]\w+)*',
+                        re.IGNORECASE)
+SPACES = re.compile(r'\s+')
+
+Fingerprint = Tuple[str, str]
+
+
+def error_class(error: BaseException) -> str:
+    """Возвращает ближайший класс ошибки из ``exceptions.py``.
+
+    Ошибки сторонних библиотек называются своим классом.
+    """
+    for cls in type(error).__mro__:
+        if cls.__module__ == exceptions.__name__:
+            return cls.__name__
+    return type(error).__name__
+
+
+def normalise(message: str) -> str:
+    """Убирает из текста ошибки числа, идентификаторы и строки в кавычках.
+
+    Так ошибки, отличающиеся только временем, номером чата или
+    названием работы, получают один отпечаток.
+    """
+    message = QUOTED.sub('"…"', message)
+    message = IDENTIFIER.sub('<N>', message)
+    return SPACES.sub(' ', message).strip()[:MAX_MESSAGE]
+
+
+def fingerprint(error: BaseException) -> Fingerprint:
+    """Возвращает отпечаток ошибки: класс и нормализованный текст."""
+    return error_class(error), normalise(str(error))
+
+
+class Entry:
+    """Ошибки одного отпечатка в текущем окне."""
+
+    __slots__ = ('text', 'reported_at', 'suppressed', 'since')
+
+    def __init__(self, text: str, now: float) -> None:
+        self.text = text
+        self.reported_at = now
+        self.suppressed: int = 0
+        self.since: float = 0.0
+
+
+class ErrorAggregator:
+    """Сводит повторяющиеся ошибки в редкие уведомления.
+
+    Ошибки группируются по ``fingerprint``. О первой ошибке
+    отпечатка сообщается сразу, повторы в течение ``window`` секунд
+    только считаются, а по окончании окна уходит одна сводка
+    «ещё N раз с …». Так за окно по каждому отпечатку отправляется
+    не больше одного сообщения, а новая поломка видна сразу.
+    Отпечатки без повторов забываются через окно.
+    """
+
+    def __init__(self, window: float = ERROR_WINDOW,
+                 clock: Callable[[], float] = time.monotonic,
+                 wall: Callable[[], float] = time.time) -> None:
+        self.window = window
+        self.clock = clock
+        self.wall = wall
+        self._entries: Dict[Fingerprint, Entry] = {}
+        self._ready: List[str] = []
+        self._lock = threading.Lock()
+
+    def record(self, error: BaseException) -> None:
+        """Учитывает ошибку."""
+        key: Fingerprint = fingerprint(error)
+        metrics.ERRORS.labels(key[0]).inc()
+        now: float = self.clock()
+        with self._lock:
+            entry: Optional[Entry] = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = Entry(str(error), now)
+                self._ready.append(f'{PREFIX}{error}')
+                return
+            if not entry.suppressed:
+                entry.since = self.wall()
+            entry.suppressed += 1
+            entry.text = str(error)
+
+    def due(self) -> List[str]:
+        """Возвращает уведомления, которые пора отправить."""
+        now: float = self.clock()
+        with self._lock:
+            ready, self._ready = self._ready, []
+            for key, entry in list(self._entries.items()):
+                if now - entry.reported_at < self.window:
+                    continue
+                if not entry.suppressed:
+                    del self._entries[key]
+                    continue
+                since: str = time.strftime('%Y-%m-%d %H:%M:%S',
+                                           time.localtime(entry.since))
+                ready.append(f'{PREFIX}{entry.text} Повторилось ещё '
+                             f'{entry.suppressed} раз с {since}.')
+                entry.reported_at = now
+                entry.suppressed = 0
+        return ready
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,338 @@
+import os
+import sys
+import json
+import math
+import sqlite3
+import argparse
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import homework
+import intervals
+import state
+
+ACCURACY: float = float(os.getenv('REVIEW_STATS_ACCURACY', 0.01))
+MAX_AGE: float = float(os.getenv('REVIEW_MAX_AGE', 30 * 24 * 60 * 60))
+MIN_DURATION: float = 1.0
+QUANTILES: Tuple[float, ...] = (0.5, 0.9, 0.99)
+FINAL_STATUSES: FrozenSet[str] = frozenset(
+    status for status in homework.HOMEWORK_VERDICTS
+    if status not in intervals.ACTIVE_STATUSES
+)
+MAX_LINES: int = 10
+DATE_FORMAT: str = '%Y-%m-%dT%H:%M:%SZ'
+
+Key = Tuple[str, str]
+
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    """Переводит ``date_updated`` из ответа API в секунды Unix."""
+    if not value:
+        return None
+    try:
+        moment = datetime.strptime(value, DATE_FORMAT)
+    except (TypeError, ValueError):
+        return None
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+
+class Sketch:
+    """Потоковая оценка перцентилей с относительной ошибкой ``accuracy``.
+
+    Значения раскладываются по корзинам с логарифмическими границами
+    (как в DDSketch): корзина ``k`` покрывает ``(gamma**(k-1),
+    gamma**k]``. Размер зависит от разброса значений, а не от их
+    числа: для длительностей от секунды до месяца это не больше
+    тысячи корзин. Оценки складываются (``merge``) без потери
+    точности.
+    """
+
+    __slots__ = ('accuracy', 'gamma', 'buckets', 'count')
+
+    def __init__(self, accuracy: float = ACCURACY) -> None:
+        self.accuracy = accuracy
+        self.gamma: float = (1 + accuracy) / (1 - accuracy)
+        self.buckets: Dict[int, int] = {}
+        self.count: int = 0
+
+    def add(self, value: float) -> None:
+        """Учитывает значение."""
+        bucket: int = math.ceil(math.log(max(value, MIN_DURATION),
+                                         self.gamma))
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+
+    def merge(self, other: 'Sketch') -> None:
+        """Добавляет значения другой оценки с той же точностью."""
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+
+    def quantile(self, share: float) -> Optional[float]:
+        """Возвращает перцентиль ``share`` или ``None`` без значений."""
+        if not self.count:
+            return None
+        rank: float = share * (self.count - 1)
+        seen: int = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                break
+        return 2 * self.gamma ** bucket / (self.gamma + 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Возвращает оценку в виде, пригодном для JSON."""
+        return {'accuracy': self.accuracy, 'buckets': self.buckets}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Sketch':
+        """Восстанавливает оценку из ``to_dict``."""
+        sketch = cls(data['accuracy'])
+        for bucket, count in data['buckets'].items():
+            sketch.buckets[int(bucket)] = count
+        sketch.count = sum(sketch.buckets.values())
+        return sketch
+
+
+class Aggregate:
+    """Итоги проверок одного урока: число, исходы, среднее, перцентили."""
+
+    __slots__ = ('outcomes', 'total', 'sketch')
+
+    def __init__(self, accuracy: float = ACCURACY) -> None:
+        self.outcomes: Dict[str, int] = {}
+        self.total: float = 0.0
+        self.sketch = Sketch(accuracy)
+
+    @property
+    def count(self) -> int:
+        """Число завершённых проверок."""
+        return self.sketch.count
+
+    @property
+    def mean(self) -> Optional[float]:
+        """Средняя длительность проверки в секундах."""
+        return self.total / self.count if self.count else None
+
+    def add(self, duration: float, status: str) -> None:
+        """Учитывает завершённую проверку."""
+        self.outcomes[status] = self.outcomes.get(status, 0) + 1
+        self.total += duration
+        self.sketch.add(duration)
+
+    def merge(self, other: 'Aggregate') -> None:
+        """Добавляет итоги другого агрегата."""
+        for status, count in other.outcomes.items():
+            self.outcomes[status] = self.outcomes.get(status, 0) + count
+        self.total += other.total
+        self.sketch.merge(other.sketch)
+
+    def dumps(self) -> str:
+        """Сериализует агрегат для хранилища."""
+        return json.dumps({'outcomes': self.outcomes, 'total': self.total,
+                           'sketch': self.sketch.to_dict()})
+
+    @classmethod
+    def loads(cls, text: str) -> 'Aggregate':
+        """Восстанавливает агрегат из ``dumps``."""
+        data: Dict[str, Any] = json.loads(text)
+        aggregate = cls()
+        aggregate.outcomes = data['outcomes']
+        aggregate.total = data['total']
+        aggregate.sketch = Sketch.from_dict(data['sketch'])
+        return aggregate
+
+
+class ReviewStats:
+    """Длительность проверок по урокам и когортам.
+
+    Начало проверки — ``date_updated`` перехода в ``reviewing``,
+    конец — ``date_updated`` перехода в итоговый статус. Агрегаты
+    обновляются при каждом переходе и пишутся в хранилище в той же
+    транзакции, что и контрольная точка, поэтому отчёт читает
+    готовые итоги, а не историю переходов.
+    Начала проверок, не завершённых за ``max_age`` секунд (работу
+    удалили, пользователь ушёл), забываются, чтобы не копиться
+    бесконечно; такие проверки в итоги не попадают.
+    """
+
+    def __init__(self, store: Optional[state.StateStore] = None,
+                 accuracy: float = ACCURACY,
+                 max_age: float = MAX_AGE) -> None:
+        self.store = store
+        self.accuracy = accuracy
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self.started: 'OrderedDict[Key, float]' = OrderedDict()
+        self.aggregates: Dict[Key, Aggregate] = {}
+        if store is not None:
+            self.started.update(store.load_review_starts())
+            self.aggregates = load_aggregates([store])
+
+    def observe(self, tenant: str, item: Dict[str, Any],
+                cohort: str = '') -> Optional[float]:
+        """Учитывает переход работы ``item``.
+
+        Возвращает длительность завершённой проверки в секундах или
+        ``None``, если переход не завершает проверку.
+        """
+        moment: Optional[float] = parse_time(item.get('date_updated'))
+        status: Optional[str] = item.get('status')
+        if moment is None:
+            return None
+        key: Key = (tenant, state.homework_key(item))
+        with self._lock:
+            self._expire(moment - self.max_age)
+            if status in intervals.ACTIVE_STATUSES:
+                self.started[key] = moment
+                self.started.move_to_end(key)
+                if self.store is not None:
+                    self.store.start_review(*key, moment)
+                return None
+            if status not in FINAL_STATUSES or key not in self.started:
+                return None
+            started: float = self.started.pop(key)
+            lesson: str = str(item.get('lesson_name') or '')
+            aggregate: Aggregate = self.aggregates.setdefault(
+                (lesson, cohort), Aggregate(self.accuracy)
+            )
+            duration: float = max(moment - started, 0.0)
+            aggregate.add(duration, str(status))
+            if self.store is not None:
+                self.store.finish_review(*key, lesson, cohort,
+                                         aggregate.dumps())
+        return duration
+
+    def _expire(self, before: float) -> None:
+        """Забывает начала проверок раньше ``before``.
+
+        Начала идут в порядке добавления, а ``date_updated`` почти
+        не убывает, поэтому проверяется только голова очереди.
+        """
+        expired: bool = False
+        while self.started and next(iter(self.started.values())) < before:
+            self.started.popitem(last=False)
+            expired = True
+        if expired and self.store is not None:
+            self.store.expire_reviews(before)
+
+    def summary(self, by: str = 'lesson') -> List[Tuple[str, Aggregate]]:
+        """Возвращает итоги по урокам или когортам, больше проверок — выше."""
+        with self._lock:
+            return group(self.aggregates, by)
+
+
+def load_aggregates(stores: List[state.StateStore]) -> Dict[Key, Aggregate]:
+    """Читает и складывает агрегаты из нескольких хранилищ."""
+    aggregates: Dict[Key, Aggregate] = {}
+    for store in stores:
+        for lesson, cohort, text in store.load_review_stats():
+            aggregate: Aggregate = Aggregate.loads(text)
+            if (lesson, cohort) in aggregates:
+                aggregates[lesson, cohort].merge(aggregate)
+            else:
+                aggregates[lesson, cohort] = aggregate
+    return aggregates
+
+
+def group(aggregates: Dict[Key, Aggregate],
+          by: str = 'lesson') -> List[Tuple[str, Aggregate]]:
+    """Складывает агрегаты по уроку (``lesson``) или когорте."""
+    position: int = 0 if by == 'lesson' else 1
+    grouped: Dict[str, Aggregate] = {}
+    for key, aggregate in aggregates.items():
+        grouped.setdefault(key[position], Aggregate(
+            aggregate.sketch.accuracy
+        )).merge(aggregate)
+    return sorted(grouped.items(), key=lambda item: (-item[1].count,
+                                                     item[0]))
+
+
+def hours(seconds: Optional[float]) -> str:
+    """Форматирует длительность в часах."""
+    return '—' if seconds is None else f'{seconds / 3600:.1f}'
+
+
+def format_row(name: str, aggregate: Aggregate) -> List[str]:
+    """Возвращает строку отчёта: проверки, исходы, среднее, перцентили."""
+    return [name or '—', str(aggregate.count),
+            *(str(aggregate.outcomes.get(status, 0))
+              for status in sorted(FINAL_STATUSES)),
+            hours(aggregate.mean),
+            *(hours(aggregate.sketch.quantile(share))
+              for share in QUANTILES)]
+
+
+def report(rows: List[Tuple[str, Aggregate]], by: str = 'lesson') -> str:
+    """Форматирует итоги таблицей, длительности — в часах."""
+    header: List[str] = [by, 'reviews', *sorted(FINAL_STATUSES), 'mean_h',
+                         *(f'p{int(share * 100)}_h' for share in QUANTILES)]
+    table: List[List[str]] = [header] + [format_row(name, aggregate)
+                                         for name, aggregate in rows]
+    widths: List[int] = [max(len(line[column]) for line in table)
+                         for column in range(len(header))]
+    return '\n'.join(
+        '  '.join(cell.ljust(width) for cell, width in zip(line, widths))
+        .rstrip()
+        for line in table
+    )
+
+
+def format_stats(rows: List[Tuple[str, Aggregate]],
+                 limit: int = MAX_LINES) -> str:
+    """Отвечает на /stats: длительность проверок по урокам."""
+    if not rows:
+        return 'Завершённых проверок пока нет.'
+    return '\n'.join(
+        f'"{name or "—"}": проверок {aggregate.count}, в среднем '
+        f'{hours(aggregate.mean)} ч, медиана '
+        f'{hours(aggregate.sketch.quantile(0.5))} ч, 90% — за '
+        f'{hours(aggregate.sketch.quantile(0.9))} ч.'
+        for name, aggregate in rows[:limit]
+    )
+
+
+def state_paths(path: Optional[str]) -> List[str]:
+    """Возвращает базу состояния и базы процессов ``sharding``."""
+    if not path:
+        return []
+    return ([path] if os.path.exists(path) else []) + state.shard_paths(path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа ``python homework.py stats``."""
+    parser = argparse.ArgumentParser(
+        prog='homework.py stats',
+        description='Длительность проверок по урокам или когортам.'
+    )
+    parser.add_argument('--db', action='append',
+                        help='база состояния; по умолчанию STATE_DB '
+                        'и базы процессов STATE_DB.<номер>')
+    parser.add_argument('--by', choices=('lesson', 'cohort'),
+                        default='lesson')
+    args = parser.parse_args(argv)
+    paths: List[str] = args.db or state_paths(state.STATE_DB)
+    if not paths:
+        print('Не найдена база состояния: укажите --db или STATE_DB.',
+              file=sys.stderr)
+        return 2
+    stores: List[state.StateStore] = []
+    try:
+        for path in paths:
+            stores.append(state.StateStore(path, read_only=True))
+        aggregates: Dict[Key, Aggregate] = load_aggregates(stores)
+    except sqlite3.Error as error:
+        print(f'Не удалось прочитать базу состояния: {error}',
+              file=sys.stderr)
+        return 2
+    finally:
+        for store in stores:
+            store.close()
+    print(report(group(aggregates, args.by), args.by))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
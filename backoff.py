@@ -0,0 +1,21 @@
+import os
+import random
+
+JITTER: float = float(os.getenv('POLL_JITTER', 0.1))
+
+
+def exponential_delay(base: float, attempt: int, cap: float) -> float:
+    """Возвращает задержку ``base * 2 ** attempt``, не больше ``cap``."""
+    if attempt >= 64:
+        return cap
+    return min(base * 2 ** attempt, cap)
+
+
+def jittered(delay: float, ratio: float = JITTER,
+             rng: random.Random = random) -> float:
+    """Сдвигает задержку на случайную долю в пределах ``±ratio``.
+
+    Разброс симметричный, поэтому средняя задержка не меняется,
+    а повторные запросы разных пользователей не совпадают по времени.
+    """
+    return delay * (1 + rng.uniform(-ratio, ratio))
@@ -0,0 +1,132 @@
+"""Сквозная нагрузка: опрос, переходы статусов и отправка в Telegram.
+
+Запускает заглушки API Практикума и Bot API, гоняет настоящий цикл
+``PollingEngine.run`` заданное время и печатает опросы в секунду,
+перцентили задержки уведомлений (от ответа API со сменой статуса
+до получения sendMessage) и расход CPU/памяти на 1000 пользователей.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_e2e.py --tenants 5000 --period 10 --churn 0.1
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telegram  # noqa: E402
+from telegram.utils.request import Request  # noqa: E402
+
+import delivery  # noqa: E402
+import engine  # noqa: E402
+import homework  # noqa: E402
+import http_client  # noqa: E402
+import intervals  # noqa: E402
+from stub_servers import (practicum_server, telegram_server,  # noqa: E402
+                          telegram_stats)
+
+
+def rss_kib() -> int:
+    """Текущий размер резидентной памяти процесса в КиБ (Linux)."""
+    with open('/proc/self/status', encoding='ascii') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def percentile(values: List[float], share: float) -> float:
+    """Перцентиль по ближайшему рангу."""
+    if not values:
+        return float('nan')
+    ordered: List[float] = sorted(values)
+    return ordered[min(int(share * len(ordered)), len(ordered) - 1)]
+
+
+async def drive(polling: engine.PollingEngine, duration: float) -> None:
+    task: asyncio.Task = asyncio.create_task(polling.run())
+    await asyncio.sleep(duration)
+    if polling.pipeline is not None:
+        await polling.pipeline.join()
+    await polling.outbound.join(timeout=10)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+def run(args: argparse.Namespace) -> None:
+    homework.logger.setLevel(logging.CRITICAL)
+    with practicum_server(latency=args.latency, error_rate=args.error_rate,
+                          churn=args.churn) as endpoint, \
+            telegram_server(latency=args.telegram_latency) as base_url:
+        homework.ENDPOINT = endpoint
+        http_client.configure(pool_maxsize=args.concurrency)
+        bot = telegram.Bot(
+            token='123456:bench-token', base_url=base_url,
+            request=Request(con_pool_size=args.senders + 4)
+        )
+        rss_before: int = rss_kib()
+        tenants: List[engine.Tenant] = [
+            engine.Tenant(
+                token=f'token-{i}', chat_id=i,
+                interval=intervals.AdaptiveInterval(
+                    base=args.period, active=args.period, cap=args.period
+                ),
+            )
+            for i in range(args.tenants)
+        ]
+        polling = engine.PollingEngine(bot, tenants,
+                                       concurrency=args.concurrency,
+                                       retry_period=args.period)
+        polling.outbound = delivery.SendQueue(
+            bot, global_rate=args.telegram_rate, chat_rate=1,
+            senders=args.senders
+        )
+        wall: float = time.perf_counter()
+        cpu: float = time.process_time()
+        asyncio.run(drive(polling, args.duration))
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        rss_after: int = rss_kib()
+        stats = polling.stats()
+        received = telegram_stats(base_url)
+        polling.close()
+    thousands: float = args.tenants / 1000
+    latencies: List[float] = received['latencies']
+    fetch = stats.get('fetch', {})
+    print(f'tenants={args.tenants} period={args.period}s '
+          f'duration={args.duration}s latency={args.latency}s '
+          f'error_rate={args.error_rate} churn={args.churn}')
+    print(f'polls={polling.polled} api_errors={fetch.get("failed", 0)} '
+          f'polls/s={polling.polled / wall:.0f}')
+    print(f'notifications sent={stats["outbound"]["processed"]} '
+          f'received={received["received"]} '
+          f'failed={stats["outbound"]["failed"]}')
+    print('notification latency ms: ' + ' '.join(
+        f'p{int(share * 100)}={percentile(latencies, share) * 1000:.1f}'
+        for share in (0.5, 0.9, 0.99)
+    ))
+    print(f'cpu={cpu:.2f}s ({cpu / wall:.2f} cores) '
+          f'per 1k tenants: {cpu / wall / thousands:.3f} cores, '
+          f'{(rss_after - rss_before) / thousands / 1024:.2f} MiB RSS')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tenants', type=int, default=5000)
+    parser.add_argument('--period', type=float, default=10,
+                        help='интервал опроса одного пользователя, с')
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='задержка ответа API, с')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--churn', type=float, default=0.1,
+                        help='доля ответов со сменой статуса')
+    parser.add_argument('--telegram-latency', type=float, default=0.02)
+    parser.add_argument('--telegram-rate', type=float, default=1000)
+    parser.add_argument('--senders', type=int, default=delivery.SENDERS)
+    run(parser.parse_args())
@@ -0,0 +1,69 @@
+"""Сколько пользователей выдерживает одно ядро.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_engine.py --tenants 2000 --cycles 3
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import homework  # noqa: E402
+import engine  # noqa: E402
+import http_client  # noqa: E402
+from stub_servers import practicum_server  # noqa: E402
+
+
+class NullBot:
+    """Бот, который ничего не отправляет."""
+
+    def send_message(self, chat_id, text, **kwargs) -> None:
+        pass
+
+
+async def run_cycles(polling: engine.PollingEngine, cycles: int) -> int:
+    polled: int = 0
+    for _ in range(cycles):
+        polled += await polling.run_cycle()
+    return polled
+
+
+def run(tenants: int, cycles: int, concurrency: int, latency: float) -> None:
+    homework.logger.setLevel(logging.WARNING)
+    with practicum_server(latency=latency) as endpoint:
+        homework.ENDPOINT = endpoint
+        http_client.configure(pool_maxsize=concurrency)
+        polling = engine.PollingEngine(
+            NullBot(),
+            [engine.Tenant(token=f'token-{i}', chat_id=i)
+             for i in range(tenants)],
+            concurrency=concurrency,
+        )
+        wall: float = time.perf_counter()
+        cpu: float = time.process_time()
+        polled: int = asyncio.run(run_cycles(polling, cycles))
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        polling.close()
+    per_cpu_second: float = polled / cpu
+    print(f'tenants={tenants} cycles={cycles} concurrency={concurrency} '
+          f'latency={latency}s')
+    print(f'polls={polled} wall={wall:.2f}s cpu={cpu:.2f}s')
+    print(f'polls/s (wall)={polled / wall:.0f} '
+          f'polls per cpu-second={per_cpu_second:.0f}')
+    print(f'tenants per core at RETRY_PERIOD={homework.RETRY_PERIOD}s: '
+          f'{per_cpu_second * homework.RETRY_PERIOD:.0f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tenants', type=int, default=2000)
+    parser.add_argument('--cycles', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+    run(args.tenants, args.cycles, args.concurrency, args.latency)
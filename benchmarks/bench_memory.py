@@ -0,0 +1,121 @@
+"""Память на одного пользователя: записи со __slots__ против словарей.
+
+Создаёт ``--tenants`` пользователей с ``--homeworks`` работами и
+прогоняет их статусы из разобранного JSON через индекс переходов.
+«До» — прежнее устройство (dataclass ``Tenant`` со словарём
+заголовков, индекс и интервал с ``__dict__``, статусы — строки
+из каждого ответа), «после» — текущие ``engine.Tenant`` и
+``records``. Память считается через ``tracemalloc``.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_memory.py --tenants 100000
+"""
+import os
+import sys
+import gc
+import json
+import argparse
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Union
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine  # noqa: E402
+import records  # noqa: E402
+import state  # noqa: E402
+
+STATUSES = ('reviewing', 'approved', 'rejected')
+
+
+class LegacyTracker:
+    def __init__(self) -> None:
+        self.statuses: Dict[str, str] = {}
+
+    def mark(self, homework: Dict) -> None:
+        self.statuses[state.homework_key(homework)] = homework.get('status')
+
+
+class LegacyInterval:
+    def __init__(self) -> None:
+        self.base = 600
+        self.active = 120
+        self.cap = 10800
+        self.jitter = 0.1
+        self.rng = None
+        self.idle_polls = 0
+
+
+@dataclass
+class LegacyTenant:
+    token: str
+    chat_id: Union[int, str]
+    from_date: int = 0
+    headers: Dict[str, str] = field(init=False, repr=False)
+    key: str = field(init=False, repr=False)
+    payload_hash: Optional[bytes] = field(default=None, repr=False)
+    tracker: LegacyTracker = field(default_factory=LegacyTracker)
+    interval: LegacyInterval = field(default_factory=LegacyInterval)
+
+    def __post_init__(self) -> None:
+        self.headers = {'Authorization': f'OAuth {self.token}'}
+        self.key = state.tenant_key(self.token)
+
+
+def response(number: int, homeworks: int) -> bytes:
+    return json.dumps({'homeworks': [
+        {'id': number * homeworks + index,
+         'homework_name': f'hw{index}', 'lesson_name': 'lesson',
+         'status': STATUSES[(number + index) % len(STATUSES)],
+         'date_updated': '2024-01-01T00:00:00Z'}
+        for index in range(homeworks)
+    ], 'current_date': 1700000000}).encode()
+
+
+def before(number: int, content: bytes) -> LegacyTenant:
+    tenant = LegacyTenant(token=f'token-{number}', chat_id=number)
+    for item in json.loads(content)['homeworks']:
+        tenant.tracker.mark(item)
+    tenant.payload_hash = bytes(32)
+    return tenant
+
+
+def after(number: int, content: bytes) -> engine.Tenant:
+    tenant = engine.Tenant(token=f'token-{number}', chat_id=number)
+    parsed: List[Dict] = json.loads(content)['homeworks']
+    for transition in records.find_transitions(tenant.tracker, parsed):
+        tenant.tracker.mark(transition.homework)
+    tenant.payload_hash = bytes(32)
+    return tenant
+
+
+def measure(build: Callable[[int, bytes], object], tenants: int,
+            homeworks: int) -> float:
+    """Возвращает байты на пользователя."""
+    contents: List[bytes] = [response(number, homeworks)
+                             for number in range(tenants)]
+    gc.collect()
+    tracemalloc.start()
+    start: int = tracemalloc.get_traced_memory()[0]
+    kept: List[object] = [build(number, content)
+                          for number, content in enumerate(contents)]
+    gc.collect()
+    used: int = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del kept
+    return used / tenants
+
+
+def run(args: argparse.Namespace) -> None:
+    print(f'tenants={args.tenants} homeworks={args.homeworks}')
+    old: float = measure(before, args.tenants, args.homeworks)
+    new: float = measure(after, args.tenants, args.homeworks)
+    print(f'before: {old:7.0f} bytes/tenant')
+    print(f'after:  {new:7.0f} bytes/tenant ({new / old:.0%})')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tenants', type=int, default=100000)
+    parser.add_argument('--homeworks', type=int, default=3)
+    run(parser.parse_args())
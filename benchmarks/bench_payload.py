@@ -0,0 +1,74 @@
+"""Разбор и проверка ответа API: прежний путь против нового.
+
+Прежний путь — ``json.loads``, ``check_response`` и ``parse_status``
+для каждой работы. Новый — ``payload.parse`` (быстрый декодер, если
+установлен ``orjson``, и проверка за один проход) и пропуск ответа,
+совпадающего с предыдущим (``payload.fingerprint``).
+
+Запуск из корня репозитория:
+    python benchmarks/bench_payload.py --homeworks 10000
+"""
+import os
+import sys
+import json
+import timeit
+import logging
+import argparse
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import homework  # noqa: E402
+import payload  # noqa: E402
+
+
+def make_content(count: int) -> bytes:
+    statuses: List[str] = list(homework.HOMEWORK_VERDICTS)
+    homeworks: List[Dict] = [{
+        'id': index,
+        'status': statuses[index % len(statuses)],
+        'homework_name': f'user__hw{index}.zip',
+        'reviewer_comment': 'Всё хорошо.',
+        'date_updated': '2024-01-01T00:00:00Z',
+        'lesson_name': f'Урок {index % 20}',
+    } for index in range(count)]
+    return json.dumps({'homeworks': homeworks,
+                       'current_date': 1700000000}).encode()
+
+
+def old_path(content: bytes) -> None:
+    response = json.loads(content)
+    homework.check_response(response)
+    for item in response['homeworks']:
+        homework.parse_status(item)
+
+
+def report(name: str, func: Callable[[], None], number: int) -> float:
+    seconds: float = min(timeit.repeat(func, number=number, repeat=5))
+    per_call: float = seconds / number * 1000
+    print(f'{name:<28} {per_call:8.3f} ms')
+    return per_call
+
+
+def run(count: int, number: int) -> None:
+    homework.logger.setLevel(logging.CRITICAL)
+    content: bytes = make_content(count)
+    print(f'homeworks={count} payload={len(content) / 1024:.0f} KiB '
+          f'decoder={"orjson" if payload.orjson else "json"}')
+    old: float = report('json + check + parse_status',
+                        lambda: old_path(content), number)
+    report('json.loads only', lambda: json.loads(content), number)
+    new: float = report('payload.parse',
+                        lambda: payload.parse(content), number)
+    skip: float = report('payload.fingerprint (skip)',
+                         lambda: payload.fingerprint(content), number)
+    print(f'speedup: parse x{old / new:.1f}, unchanged payload '
+          f'x{old / skip:.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--homeworks', type=int, default=10000)
+    parser.add_argument('--number', type=int, default=20)
+    args = parser.parse_args()
+    run(args.homeworks, args.number)
@@ -0,0 +1,62 @@
+"""Стоимость планирования и перепланирования опросов.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_scheduler.py --tenants 100000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import PollScheduler  # noqa: E402
+
+
+def measure(label: str, operations: int, started: float) -> None:
+    elapsed: float = time.perf_counter() - started
+    print(f'{label:<28} {operations:>9} ops '
+          f'{elapsed * 1e9 / operations:>8.0f} ns/op')
+
+
+def run(tenants: int, period: float, resolution: float) -> None:
+    rng = random.Random(0)
+    poll_scheduler = PollScheduler(resolution)
+
+    started: float = time.perf_counter()
+    poll_scheduler.spread(range(tenants), period, 0.0)
+    measure('spread', tenants, started)
+
+    started = time.perf_counter()
+    for key in range(tenants):
+        poll_scheduler.schedule(key, rng.uniform(0, period))
+    measure('reschedule (pending)', tenants, started)
+
+    started = time.perf_counter()
+    popped: int = 0
+    wakeups: int = 0
+    now: float = 0.0
+    while poll_scheduler.next_deadline() is not None:
+        now = poll_scheduler.next_deadline()
+        due = poll_scheduler.pop_due(now)
+        popped += len(due)
+        wakeups += 1
+    measure('pop_due', popped, started)
+    print(f'{"wakeups":<28} {wakeups:>9} '
+          f'({popped / wakeups:.1f} deadlines per wakeup)')
+
+    started = time.perf_counter()
+    for key in range(tenants):
+        poll_scheduler.schedule(key, now + rng.uniform(0, period))
+        poll_scheduler.pop_due(now)
+    measure('schedule + pop_due', tenants, started)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tenants', type=int, default=100_000)
+    parser.add_argument('--period', type=float, default=600)
+    parser.add_argument('--resolution', type=float, default=1)
+    args = parser.parse_args()
+    run(args.tenants, args.period, args.resolution)
@@ -0,0 +1,136 @@
+"""Масштабирование опроса по процессам-обработчикам.
+
+Для каждого числа процессов из ``--workers`` запускает настоящий
+``sharding.Supervisor``: пользователи делятся по кольцу
+консистентного хеширования, аренда берётся в общей базе SQLite,
+каждый процесс гоняет свой ``PollingEngine``. Печатает опросы
+в секунду, ускорение относительно одного процесса и процессорное
+время обработчиков. Заглушек API несколько (``--api-servers``),
+чтобы узким местом не стала сама заглушка.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_shards.py --tenants 4000 --workers 1,2,4
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import functools
+import multiprocessing
+from contextlib import ExitStack
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telegram  # noqa: E402
+from telegram.utils.request import Request  # noqa: E402
+
+import engine  # noqa: E402
+import homework  # noqa: E402
+import http_client  # noqa: E402
+import intervals  # noqa: E402
+import sharding  # noqa: E402
+from stub_servers import practicum_server, telegram_server  # noqa: E402
+
+Result = Tuple[str, int, float]
+
+
+def bench_worker(index: int, count: int, args: argparse.Namespace,
+                 endpoints: List[str], base_url: str, leases_path: str,
+                 results: multiprocessing.Queue) -> None:
+    """Процесс-обработчик: как ``sharding.run_worker``, но на заглушках."""
+    homework.logger.setLevel(logging.CRITICAL)
+    homework.ENDPOINT = endpoints[index % len(endpoints)]
+    owner: str = sharding.worker_name(index)
+    ring = sharding.HashRing([sharding.worker_name(node)
+                              for node in range(count)])
+    tenants: List[engine.Tenant] = []
+    for number in range(args.tenants):
+        tenant = engine.Tenant(
+            token=f'token-{number}', chat_id=number,
+            interval=intervals.AdaptiveInterval(
+                base=args.period, active=args.period, cap=args.period
+            ),
+        )
+        if ring.owner(tenant.key) == owner:
+            tenants.append(tenant)
+    http_client.configure(pool_maxsize=args.concurrency)
+    bot = telegram.Bot(token='123456:bench-token', base_url=base_url,
+                       request=Request(con_pool_size=8))
+    polling = engine.PollingEngine(bot, tenants,
+                                   concurrency=args.concurrency,
+                                   retry_period=args.period)
+    leases = sharding.LeaseStore(leases_path)
+    cpu: float = time.process_time()
+    try:
+        asyncio.run(sharding.hold_leases(leases, owner, polling))
+    finally:
+        results.put((owner, polling.polled, time.process_time() - cpu))
+        polling.close()
+        leases.close()
+
+
+def measure(count: int, args: argparse.Namespace, endpoints: List[str],
+            base_url: str) -> Tuple[float, float]:
+    """Возвращает опросы в секунду и процессорное время обработчиков."""
+    results: multiprocessing.Queue = multiprocessing.Queue()
+    with tempfile.TemporaryDirectory() as directory:
+        target = functools.partial(
+            bench_worker, args=args, endpoints=endpoints, base_url=base_url,
+            leases_path=os.path.join(directory, 'leases.sqlite3'),
+            results=results
+        )
+        supervisor = sharding.Supervisor(count, target=target)
+        for index in range(count):
+            supervisor.spawn(index)
+        wall: float = time.perf_counter()
+        time.sleep(args.duration)
+        supervisor.stop(timeout=30)
+        wall = time.perf_counter() - wall
+        collected: List[Result] = [results.get(timeout=10)
+                                   for _ in range(count)]
+    polled: int = sum(result[1] for result in collected)
+    cpu: float = sum(result[2] for result in collected)
+    return polled / wall, cpu
+
+
+def run(args: argparse.Namespace) -> None:
+    counts: List[int] = [int(value) for value in args.workers.split(',')]
+    with ExitStack() as stack:
+        endpoints: List[str] = [
+            stack.enter_context(practicum_server(port=8770 + number,
+                                                 latency=args.latency))
+            for number in range(args.api_servers or max(counts))
+        ]
+        base_url: str = stack.enter_context(telegram_server())
+        print(f'tenants={args.tenants} period={args.period}s '
+              f'duration={args.duration}s latency={args.latency}s '
+              f'cpus={os.cpu_count()} api_servers={len(endpoints)}')
+        rates: Dict[int, float] = {}
+        for count in counts:
+            rate, cpu = measure(count, args, endpoints, base_url)
+            rates[count] = rate
+            speedup: float = rate / rates[counts[0]] * counts[0]
+            print(f'workers={count:<3} polls/s={rate:8.0f} '
+                  f'speedup={speedup:5.2f} '
+                  f'efficiency={speedup / count:5.2f} cpu={cpu:.1f}s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tenants', type=int, default=4000)
+    parser.add_argument('--workers', default='1,2,4',
+                        help='числа процессов через запятую')
+    parser.add_argument('--period', type=float, default=0.5,
+                        help='интервал опроса одного пользователя, с')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='задержка ответа API, с')
+    parser.add_argument('--api-servers', type=int, default=0,
+                        help='число заглушек API (по умолчанию — '
+                        'наибольшее число процессов)')
+    run(parser.parse_args())
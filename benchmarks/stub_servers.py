@@ -0,0 +1,161 @@
+"""Локальные заглушки API Практикума и Telegram Bot API для бенчмарков.
+
+Серверы запускаются в отдельных процессах, чтобы их работа
+не попадала в замер процессорного времени бота.
+"""
+import re
+import json
+import time
+import random
+import multiprocessing
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Type
+
+STATUSES = ('reviewing', 'approved', 'rejected')
+MARKER = re.compile(r'hw@(\d+\.\d+)')
+
+
+class JSONHandler(BaseHTTPRequestHandler):
+    """Общая часть заглушек: keep-alive и ответы в JSON."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def send_json(self, data, status: int = 200) -> None:
+        body: bytes = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class PracticumHandler(JSONHandler):
+    """Отвечает как homework_statuses.
+
+    ``latency`` — задержка ответа, ``error_rate`` — доля ответов
+    с кодом 500, ``churn`` — доля ответов со сменой статуса работы.
+    Название работы содержит время ответа, по нему заглушка
+    Telegram считает задержку доставки уведомления.
+    """
+
+    latency: float = 0.0
+    error_rate: float = 0.0
+    churn: float = 0.0
+    rng = random.Random(0)
+    statuses: Dict[str, int] = {}
+
+    def do_GET(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.send_json({'code': 'internal_error'}, status=500)
+            return
+        homeworks: List[Dict] = []
+        if self.churn and self.rng.random() < self.churn:
+            token: str = self.headers.get('Authorization', '')
+            index: int = self.statuses.get(token, -1) + 1
+            self.statuses[token] = index
+            now: float = time.time()
+            homeworks.append({
+                'id': 1,
+                'homework_name': f'hw@{now:.6f}',
+                'status': STATUSES[index % len(STATUSES)],
+                'lesson_name': 'bench',
+                'date_updated': datetime.fromtimestamp(
+                    now, timezone.utc
+                ).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            })
+        self.send_json({'homeworks': homeworks,
+                        'current_date': int(time.time())})
+
+
+class TelegramHandler(JSONHandler):
+    """Отвечает как метод sendMessage Bot API.
+
+    По адресу ``/stats`` отдаёт число полученных сообщений
+    и задержки их доставки в секундах.
+    """
+
+    latency: float = 0.0
+    latencies: List[float] = []
+    received: int = 0
+
+    def do_POST(self) -> None:
+        length: int = int(self.headers.get('Content-Length', 0))
+        data: Dict = json.loads(self.rfile.read(length) or b'{}')
+        if self.latency:
+            time.sleep(self.latency)
+        text: str = data.get('text', '')
+        marker = MARKER.search(text)
+        if marker:
+            TelegramHandler.latencies.append(
+                time.time() - float(marker.group(1))
+            )
+        TelegramHandler.received += 1
+        self.send_json({'ok': True, 'result': {
+            'message_id': TelegramHandler.received,
+            'date': int(time.time()),
+            'chat': {'id': int(data.get('chat_id', 0)), 'type': 'private'},
+            'text': text,
+        }})
+
+    def do_GET(self) -> None:
+        self.send_json({'received': TelegramHandler.received,
+                        'latencies': TelegramHandler.latencies})
+
+
+def _serve(handler: Type[BaseHTTPRequestHandler], port: int,
+           attributes: Dict, ready) -> None:
+    for name, value in attributes.items():
+        setattr(handler, name, value)
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    ready.set()
+    server.serve_forever()
+
+
+@contextmanager
+def _server(handler: Type[BaseHTTPRequestHandler], port: int,
+            **attributes) -> Iterator[None]:
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(target=_serve,
+                                      args=(handler, port, attributes, ready),
+                                      daemon=True)
+    process.start()
+    ready.wait(10)
+    try:
+        yield
+    finally:
+        process.terminate()
+        process.join()
+
+
+@contextmanager
+def practicum_server(port: int = 8765, latency: float = 0.0,
+                     error_rate: float = 0.0,
+                     churn: float = 0.0) -> Iterator[str]:
+    """Запускает заглушку API Практикума и возвращает адрес эндпоинта."""
+    with _server(PracticumHandler, port, latency=latency,
+                 error_rate=error_rate, churn=churn):
+        yield f'http://127.0.0.1:{port}/api/user_api/homework_statuses/'
+
+
+@contextmanager
+def telegram_server(port: int = 8766,
+                    latency: float = 0.0) -> Iterator[str]:
+    """Запускает заглушку Bot API и возвращает base_url для telegram.Bot."""
+    with _server(TelegramHandler, port, latency=latency):
+        yield f'http://127.0.0.1:{port}/bot'
+
+
+def telegram_stats(base_url: str) -> Dict:
+    """Возвращает статистику заглушки Bot API."""
+    from urllib.request import urlopen
+    with urlopen(base_url.rsplit('/', 1)[0] + '/stats') as response:
+        return json.load(response)
@@ -0,0 +1,111 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+import backoff
+import exceptions
+
+FAILURE_THRESHOLD: int = int(os.getenv('BREAKER_THRESHOLD', 5))
+BASE_DELAY: float = float(os.getenv('BREAKER_BASE_DELAY', 30))
+MAX_DELAY: float = float(os.getenv('BREAKER_MAX_DELAY', 30 * 60))
+
+CLOSED: str = 'closed'
+OPEN: str = 'open'
+HALF_OPEN: str = 'half_open'
+
+
+class CircuitBreaker:
+    """Предохранитель для запросов к API.
+
+    После ``failure_threshold`` неудачных запросов подряд
+    предохранитель размыкается, и запросы не отправляются. Через
+    паузу, которая растёт вдвое после каждой неудачной пробы
+    (от ``base_delay`` до ``max_delay``, со случайным разбросом),
+    пропускается один пробный запрос. Удачная проба замыкает
+    предохранитель, неудачная снова размыкает его.
+    """
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD,
+                 base_delay: float = BASE_DELAY,
+                 max_delay: float = MAX_DELAY,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.state: str = CLOSED
+        self.failures: int = 0
+        self.opened: int = 0
+        self.retry_at: float = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Разрешает или запрещает очередной запрос."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.clock() >= self.retry_at:
+                self.state = HALF_OPEN
+                return True
+            return False
+
+    def retry_in(self) -> float:
+        """Возвращает, через сколько секунд будет пробный запрос."""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(self.retry_at - self.clock(), 0.0)
+
+    def record_success(self) -> None:
+        """Отмечает удачный запрос."""
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.opened = 0
+
+    def record_failure(self) -> None:
+        """Отмечает неудачный запрос.
+
+        Неудачи запросов, начатых до размыкания, не учитываются:
+        иначе каждый запрос, бывший в полёте, заново размыкал бы
+        предохранитель и удлинял паузу.
+        """
+        with self._lock:
+            if self.state == OPEN:
+                return
+            self.failures += 1
+            if (self.state == HALF_OPEN
+                    or self.failures >= self.failure_threshold):
+                self._open()
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """Учитывает исход запроса в блоке ``with``.
+
+        ``BadConnection`` — неудача, выход из блока без ошибки —
+        успех. Другие ошибки считаются неудачей только во время
+        пробы: иначе предохранитель навсегда остался бы
+        полуразомкнутым и больше не пропустил ни одного запроса.
+        """
+        try:
+            yield
+        except exceptions.BadConnection:
+            self.record_failure()
+            raise
+        except Exception:
+            with self._lock:
+                probing: bool = self.state == HALF_OPEN
+            if probing:
+                self.record_failure()
+            raise
+        self.record_success()
+
+    def _open(self) -> None:
+        delay: float = backoff.jittered(backoff.exponential_delay(
+            self.base_delay, self.opened, self.max_delay
+        ))
+        self.state = OPEN
+        self.opened += 1
+        self.retry_at = self.clock() + delay
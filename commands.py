@@ -0,0 +1,203 @@
+import os
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (TYPE_CHECKING, Callable, Dict, Hashable, List, Optional,
+                    Tuple, Union)
+
+import homework
+import metrics
+
+if TYPE_CHECKING:
+    import telegram
+
+BOT_COMMANDS: bool = os.getenv('BOT_COMMANDS', '').lower() in ('1', 'true',
+                                                               'yes')
+CACHE_TTL: float = float(os.getenv('COMMANDS_CACHE_TTL', 60))
+POLL_TIMEOUT: int = int(os.getenv('COMMANDS_POLL_TIMEOUT', 30))
+WORKERS: int = int(os.getenv('COMMANDS_WORKERS', 4))
+MAX_LINES: int = 10
+
+logger = homework.logger.getChild('commands')
+
+Response = Dict[str, Union[int, List]]
+ChatId = Union[int, str]
+Reply = Callable[[ChatId, str], None]
+Local = Dict[str, Callable[[], str]]
+
+
+class StatusCache:
+    """Кэш ответов API по пользователям со временем жизни ``ttl``.
+
+    Одновременные промахи по одному пользователю объединяются:
+    запрос к API делает первый поток, остальные ждут его результата
+    (или его исключения). Поэтому поток команд не умножает нагрузку
+    на API Практикума.
+    """
+
+    def __init__(self, fetch: Callable[[Hashable], Response],
+                 ttl: float = CACHE_TTL,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.fetch = fetch
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: Dict[Hashable, Tuple[float, Response]] = {}
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Response:
+        """Возвращает ответ API из кэша или запрашивает его."""
+        with self._lock:
+            entry: Optional[Tuple[float, Response]] = self._entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                metrics.STATUS_CACHE.labels('hit').inc()
+                return entry[1]
+            future: Optional[Future] = self._inflight.get(key)
+            leader: bool = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            metrics.STATUS_CACHE.labels('shared').inc()
+            return future.result()
+        metrics.STATUS_CACHE.labels('miss').inc()
+        try:
+            response: Response = self.fetch(key)
+        except BaseException as error:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(error)
+            raise
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, response)
+            del self._inflight[key]
+        future.set_result(response)
+        return response
+
+    def invalidate(self, key: Hashable) -> None:
+        """Удаляет ответ из кэша, например после смены статуса."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+def verdict(item: Dict[str, Union[str, int]]) -> str:
+    """Возвращает описание статуса работы."""
+    status: str = item.get('status')
+    return homework.HOMEWORK_VERDICTS.get(status, f'статус {status}')
+
+
+def format_status(response: Response) -> str:
+    """Отвечает на /status: статусы последних работ."""
+    homeworks: List[Dict] = response.get('homeworks') or []
+    if not homeworks:
+        return 'Работ пока нет.'
+    return '\n'.join(f'"{item.get("homework_name")}": {verdict(item)}'
+                     for item in homeworks[:MAX_LINES])
+
+
+def format_last(response: Response) -> str:
+    """Отвечает на /last: подробности о последней работе."""
+    homeworks: List[Dict] = response.get('homeworks') or []
+    if not homeworks:
+        return 'Работ пока нет.'
+    item: Dict[str, Union[str, int]] = homeworks[0]
+    lines: List[str] = [f'Последняя работа "{item.get("homework_name")}".',
+                        verdict(item)]
+    if item.get('date_updated'):
+        lines.append(f'Обновлено: {item["date_updated"]}.')
+    if item.get('reviewer_comment'):
+        lines.append(f'Комментарий ревьюера: {item["reviewer_comment"]}')
+    return '\n'.join(lines)
+
+
+COMMANDS: Dict[str, Callable[[Response], str]] = {
+    '/status': format_status,
+    '/last': format_last,
+}
+
+
+class CommandListener:
+    """Принимает команды /status и /last через getUpdates.
+
+    Отвечает только в известных чатах: ``chats`` связывает чат
+    с ключом пользователя в ``cache``. Ответы отправляет ``reply``.
+    Команды из ``local`` отвечают без запроса к API, например /stats.
+    """
+
+    def __init__(self, bot: 'telegram.Bot', cache: StatusCache,
+                 chats: Dict[str, Hashable], reply: Reply,
+                 poll_timeout: int = POLL_TIMEOUT,
+                 workers: int = WORKERS,
+                 local: Optional[Local] = None) -> None:
+        self.bot = bot
+        self.cache = cache
+        self.chats = chats
+        self.reply = reply
+        self.local: Local = local or {}
+        self.poll_timeout = poll_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix='commands')
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Запускает приём команд в фоновом потоке."""
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='commands')
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Останавливает приём команд."""
+        self._stopped.set()
+        self._executor.shutdown(wait=False)
+
+    def handle(self, chat_id: ChatId, text: Optional[str]) -> Optional[str]:
+        """Отвечает на команду и возвращает текст ответа."""
+        if not text:
+            return None
+        command: str = text.split()[0].split('@')[0]
+        key: Optional[Hashable] = self.chats.get(str(chat_id))
+        if key is None or (command not in COMMANDS
+                           and command not in self.local):
+            return None
+        try:
+            answer: str = (self.local[command]() if command in self.local
+                           else COMMANDS[command](self.cache.get(key)))
+        except Exception as error:
+            logger.error('Чат %s: не удалось выполнить %s: %s',
+                         chat_id, command, error)
+            answer = 'Не удалось получить статус, попробуйте позже.'
+        self.reply(chat_id, answer)
+        return answer
+
+    def _run(self) -> None:
+        offset: Optional[int] = None
+        while not self._stopped.is_set():
+            try:
+                updates = self.bot.get_updates(
+                    offset=offset, timeout=self.poll_timeout,
+                    allowed_updates=['message']
+                )
+            except Exception as error:
+                logger.error('Не удалось получить команды: %s', error)
+                self._stopped.wait(self.poll_timeout)
+                continue
+            for update in updates:
+                offset = update.update_id + 1
+                message = update.message
+                if message is not None:
+                    self._executor.submit(self.handle, message.chat_id,
+                                          message.text)
+
+
+def start_from_env(bot: 'telegram.Bot', cache: StatusCache,
+                   chats: Dict[str, Hashable],
+                   reply: Reply,
+                   local: Optional[Local] = None) -> Optional[CommandListener]:
+    """Запускает приём команд, если задан BOT_COMMANDS."""
+    if not BOT_COMMANDS:
+        return None
+    listener = CommandListener(bot, cache, chats, reply, local=local)
+    listener.start()
+    logger.info('Бот отвечает на команды: %s.',
+                ', '.join([*COMMANDS, *(local or {})]))
+    return listener
@@ -0,0 +1,286 @@
+import os
+import heapq
+import asyncio
+import itertools
+from collections import deque
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import (TYPE_CHECKING, Callable, Union, NoReturn, List, Dict,
+                    Deque, Tuple, Optional)
+
+import backoff
+import exceptions
+import homework
+import metrics
+
+GLOBAL_RATE: float = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))
+CHAT_RATE: float = float(os.getenv('TELEGRAM_CHAT_RATE', 1))
+SENDERS: int = int(os.getenv('TELEGRAM_SENDERS', 8))
+MAX_ATTEMPTS: int = int(os.getenv('TELEGRAM_MAX_ATTEMPTS', 5))
+MAX_PENDING: int = int(os.getenv('TELEGRAM_MAX_PENDING', 10000))
+RETRY_BASE: float = 1.0
+RETRY_CAP: float = 60.0
+
+logger = homework.logger.getChild('delivery')
+
+ChatId = Union[int, str]
+Failed = Callable[[ChatId, BaseException], None]
+
+if TYPE_CHECKING:
+    import telegram
+
+
+@metrics.timed(metrics.FUNCTION_LATENCY, 'send_message')
+def send(bot: 'telegram.Bot', chat_id: ChatId, text: str) -> None:
+    """Отправляет сообщение очереди; время учитывается как send_message."""
+    homework.send_message_to_chat(bot, chat_id, text)
+
+
+class TokenBucket:
+    """Ограничитель частоты: ``rate`` событий в секунду.
+
+    ``reserve`` всегда забирает жетон, даже в долг, и возвращает,
+    сколько секунд нужно подождать, чтобы не превысить частоту.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens: float = self.capacity
+        self.updated: Optional[float] = None
+
+    def reserve(self, now: float) -> float:
+        """Забирает жетон и возвращает время ожидания в секундах."""
+        if self.updated is not None:
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+@dataclass
+class OutboundMessage:
+    """Сообщение в очереди на отправку."""
+
+    chat_id: ChatId
+    text: str
+    attempts: int = 0
+    on_sent: Optional[Callable[[], None]] = None
+
+
+class SendQueue:
+    """Очередь исходящих сообщений Telegram с ограничением частоты.
+
+    Общая частота отправки ограничена ``global_rate`` сообщений в
+    секунду, частота в одном чате — ``chat_rate``. Сообщения одного
+    чата уходят по порядку, занятый чат не задерживает остальные.
+    На ``RetryAfter`` чат ставится на паузу на указанное Telegram
+    время, сетевые ошибки повторяются с растущей задержкой, прочие
+    ошибки Telegram записываются в лог, и сообщение отбрасывается.
+    Об отброшенном сообщении сообщается ``on_failed(chat_id, error)``.
+
+    ``submit`` не ждёт отправки, поэтому опрос API не блокируется.
+    ``put`` дополнительно ждёт, пока в очереди меньше ``max_pending``
+    сообщений, и так передаёт давление вызывающему коду.
+    """
+
+    def __init__(self, bot: 'telegram.Bot',
+                 executor: Optional[Executor] = None,
+                 global_rate: float = GLOBAL_RATE,
+                 chat_rate: float = CHAT_RATE,
+                 senders: int = SENDERS,
+                 max_attempts: int = MAX_ATTEMPTS,
+                 max_pending: int = MAX_PENDING,
+                 on_failed: Optional[Failed] = None) -> None:
+        self.bot = bot
+        self.executor = executor
+        self.bucket = TokenBucket(global_rate)
+        self.chat_interval: float = 1 / chat_rate
+        self.senders = senders
+        self.max_attempts = max_attempts
+        self.max_pending = max_pending
+        self.on_failed = on_failed
+        self.sent: int = 0
+        self.failed: int = 0
+        self.retried: int = 0
+        self._chats: Dict[ChatId, Deque[OutboundMessage]] = {}
+        self._next_allowed: Dict[ChatId, float] = {}
+        self._ready: List[Tuple[float, int, ChatId]] = []
+        self._counter = itertools.count()
+        self._pending: int = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def pending(self) -> int:
+        """Количество сообщений, ожидающих отправки."""
+        return self._pending
+
+    def start(self) -> None:
+        """Запускает отправителей в текущем цикле событий."""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._space = asyncio.Event()
+        if not self._pending:
+            self._idle.set()
+        if self._pending < self.max_pending:
+            self._space.set()
+        self._tasks = [asyncio.create_task(self._sender())
+                       for _ in range(self.senders)]
+
+    def submit(self, chat_id: ChatId, text: str,
+               on_sent: Optional[Callable[[], None]] = None) -> None:
+        """Ставит сообщение в очередь и сразу возвращает управление.
+
+        ``on_sent`` вызывается после успешной отправки сообщения.
+        """
+        self.start()
+        self._pending += 1
+        self._idle.clear()
+        if self._pending >= self.max_pending:
+            self._space.clear()
+        queue: Optional[Deque[OutboundMessage]] = self._chats.get(chat_id)
+        message = OutboundMessage(chat_id, text, on_sent=on_sent)
+        if queue is not None:
+            queue.append(message)
+            return
+        self._chats[chat_id] = deque([message])
+        now: float = asyncio.get_running_loop().time()
+        self._push(chat_id, max(now, self._next_allowed.pop(chat_id, now)))
+
+    async def put(self, chat_id: ChatId, text: str,
+                  on_sent: Optional[Callable[[], None]] = None) -> None:
+        """Ставит сообщение в очередь, дождавшись в ней места."""
+        self.start()
+        while self._pending >= self.max_pending:
+            await self._space.wait()
+        self.submit(chat_id, text, on_sent)
+
+    async def join(self, timeout: Optional[float] = None) -> bool:
+        """Ждёт отправки всех сообщений.
+
+        Возвращает ``False``, если за ``timeout`` секунд очередь
+        не опустела.
+        """
+        if self._idle is None:
+            return True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def stop(self) -> None:
+        """Останавливает отправителей."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _push(self, chat_id: ChatId, ready_at: float) -> None:
+        heapq.heappush(self._ready, (ready_at, next(self._counter), chat_id))
+        self._wakeup.set()
+
+    async def _sender(self) -> NoReturn:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            ready_at: float = self._ready[0][0]
+            now: float = loop.time()
+            if ready_at > now:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(),
+                                           ready_at - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            chat_id: ChatId = heapq.heappop(self._ready)[2]
+            wait: float = self.bucket.reserve(now)
+            if wait:
+                await asyncio.sleep(wait)
+            await self._deliver(chat_id)
+
+    async def _deliver(self, chat_id: ChatId) -> None:
+        loop = asyncio.get_running_loop()
+        queue: Deque[OutboundMessage] = self._chats[chat_id]
+        message: OutboundMessage = queue[0]
+        delay: float = self.chat_interval
+        try:
+            await loop.run_in_executor(self.executor, send, self.bot,
+                                       chat_id, message.text)
+        except exceptions.DontSentMessage as error:
+            delay = max(delay, self._retry_delay(message, error))
+        except Exception as error:
+            logger.error('Чат %s: сообщение отброшено: %s', chat_id, error)
+            self._fail(queue, error)
+        else:
+            self.sent += 1
+            if message.on_sent is not None:
+                try:
+                    message.on_sent()
+                except Exception as error:
+                    logger.error('Чат %s: не удалось отметить отправку: %s',
+                                 chat_id, error)
+            self._done(queue)
+        ready_at: float = loop.time() + delay
+        if queue:
+            self._push(chat_id, ready_at)
+        else:
+            del self._chats[chat_id]
+            self._next_allowed[chat_id] = ready_at
+
+    def _retry_delay(self, message: OutboundMessage,
+                     error: exceptions.DontSentMessage) -> float:
+        """Решает судьбу неотправленного сообщения.
+
+        Возвращает паузу перед следующей отправкой в этот чат.
+        """
+        from telegram.error import BadRequest, NetworkError, RetryAfter
+
+        cause: Optional[BaseException] = error.__cause__
+
+        queue: Deque[OutboundMessage] = self._chats[message.chat_id]
+        if isinstance(cause, RetryAfter):
+            logger.warning('Чат %s: Telegram просит подождать %s с.',
+                           message.chat_id, cause.retry_after)
+            self.retried += 1
+            return float(cause.retry_after)
+        message.attempts += 1
+        if (isinstance(cause, NetworkError)
+                and not isinstance(cause, BadRequest)
+                and message.attempts < self.max_attempts):
+            self.retried += 1
+            return backoff.jittered(backoff.exponential_delay(
+                RETRY_BASE, message.attempts, RETRY_CAP
+            ))
+        logger.error('Чат %s: сообщение отброшено после %d попыток.',
+                     message.chat_id, message.attempts)
+        self._fail(queue, error)
+        return 0.0
+
+    def _fail(self, queue: Deque[OutboundMessage],
+              error: BaseException) -> None:
+        chat_id: ChatId = queue[0].chat_id
+        self._done(queue, failed=True)
+        if self.on_failed is not None:
+            self.on_failed(chat_id, error)
+
+    def _done(self, queue: Deque[OutboundMessage],
+              failed: bool = False) -> None:
+        queue.popleft()
+        self._pending -= 1
+        if failed:
+            self.failed += 1
+        if self._pending < self.max_pending:
+            self._space.set()
+        if not self._pending:
+            self._idle.set()
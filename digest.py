@@ -0,0 +1,114 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple, Union
+
+DIGEST_WINDOW: float = float(os.getenv('DIGEST_WINDOW', 0))
+DIGEST_IMMEDIATE: bool = os.getenv('DIGEST_IMMEDIATE', '1').lower() in (
+    '1', 'true', 'yes'
+)
+HEADER: str = 'Изменились статусы проверки работ: {count}.'
+
+ChatId = Union[int, str]
+Batch = Tuple[ChatId, str, List[int]]
+
+
+def render(messages: List[str]) -> str:
+    """Собирает уведомления одного чата в одно сообщение.
+
+    Одно уведомление отправляется как есть. В метриках сокращения
+    отправок сообщение учитывает тот, кто его отправляет
+    (``metrics.count_sent``).
+    """
+    if len(messages) == 1:
+        return messages[0]
+    return '\n'.join([HEADER.format(count=len(messages)),
+                      *(f'• {message}' for message in messages)])
+
+
+class Pending:
+    """Уведомления чата, ждущие конца окна."""
+
+    __slots__ = ('chat_id', 'opened', 'messages', 'rows')
+
+    def __init__(self, chat_id: ChatId, opened: float) -> None:
+        self.chat_id = chat_id
+        self.opened = opened
+        self.messages: List[str] = []
+        self.rows: List[int] = []
+
+
+class Digest:
+    """Объединяет уведомления чата за ``window`` секунд в одно.
+
+    Первое уведомление открывает окно чата. С ``immediate`` оно
+    уходит сразу, и задержку получают только следующие за ним;
+    иначе ждёт конца окна вместе с остальными. По окончании окна
+    накопленное отправляется одним сообщением. Окна всех чатов одной
+    длины, поэтому порядок открытия совпадает с порядком дедлайнов.
+    С нулевым ``window`` уведомления не объединяются.
+    Номера записей исходящих (``rows``) передаются вместе с
+    сообщением, чтобы отметить отправленными все сразу.
+    """
+
+    def __init__(self, window: float = DIGEST_WINDOW,
+                 immediate: bool = DIGEST_IMMEDIATE,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.window = window
+        self.immediate = immediate
+        self.clock = clock
+        self._chats: 'OrderedDict[str, Pending]' = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        """Объединяются ли уведомления."""
+        return self.window > 0
+
+    def add(self, chat_id: ChatId, message: str,
+            row_id: Optional[int] = None) -> List[Batch]:
+        """Добавляет уведомление; возвращает то, что пора отправить."""
+        rows: List[int] = [] if row_id is None else [row_id]
+        if not self.enabled:
+            return [(chat_id, render([message]), rows)]
+        now: float = self.clock()
+        ready: List[Batch] = self.due(now)
+        pending: Optional[Pending] = self._chats.get(str(chat_id))
+        if pending is None:
+            pending = self._chats[str(chat_id)] = Pending(chat_id, now)
+            if self.immediate:
+                ready.append((chat_id, render([message]), rows))
+                return ready
+        pending.messages.append(message)
+        pending.rows.extend(rows)
+        return ready
+
+    def due(self, now: Optional[float] = None) -> List[Batch]:
+        """Возвращает накопленное в чатах, чьё окно закончилось."""
+        if now is None:
+            now = self.clock()
+        ready: List[Batch] = []
+        while self._chats:
+            pending: Pending = next(iter(self._chats.values()))
+            if pending.opened + self.window > now:
+                break
+            self._chats.popitem(last=False)
+            ready.extend(self._emit(pending))
+        return ready
+
+    def flush(self) -> List[Batch]:
+        """Возвращает всё накопленное, не дожидаясь конца окон."""
+        ready: List[Batch] = []
+        while self._chats:
+            ready.extend(self._emit(self._chats.popitem(last=False)[1]))
+        return ready
+
+    def next_deadline(self) -> Optional[float]:
+        """Возвращает время конца ближайшего окна."""
+        if not self._chats:
+            return None
+        return next(iter(self._chats.values())).opened + self.window
+
+    def _emit(self, pending: Pending) -> List[Batch]:
+        if not pending.messages:
+            return []
+        return [(pending.chat_id, render(pending.messages), pending.rows)]
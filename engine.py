@@ -0,0 +1,589 @@
+import os
+import sys
+import json
+import time
+import functools
+import random
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import (TYPE_CHECKING, Any, Awaitable, Callable, Union, NoReturn,
+                    List, Dict, Set, Tuple, Iterable, Optional)
+
+import alerts
+import analytics
+import backoff
+import breaker
+import commands
+import delivery
+import digest
+import exceptions
+import homework
+import http_client
+import intervals
+import logs
+import metrics
+import outbox
+import payload
+import pipeline
+import records
+import scheduler
+import shutdown
+import state
+import transitions
+
+TENANTS_FILE: Optional[str] = os.getenv('TENANTS_FILE')
+MAX_CONCURRENCY: int = int(os.getenv('MAX_CONCURRENCY', 100))
+SCHEDULER_RESOLUTION: float = float(os.getenv('SCHEDULER_RESOLUTION', 1))
+QUEUE_SIZE: int = int(os.getenv('PIPELINE_QUEUE_SIZE', 1000))
+STATS_INTERVAL: float = float(os.getenv('STATS_INTERVAL', 60))
+
+if TYPE_CHECKING:
+    import telegram
+
+logger = homework.logger.getChild('engine')
+
+Fetched = Tuple[int, bytes]
+Job = Tuple[int, Dict[str, Union[int, List]], bytes]
+Outgoing = Tuple[Union[int, str], str, Optional[int]]
+
+
+class Tenant:
+    """Пара «токен Практикума — чат Telegram» и её позиция опроса.
+
+    Записей по одной на пользователя, поэтому у класса ``__slots__``,
+    а заголовки запроса собираются при обращении.
+    """
+
+    __slots__ = ('token', 'chat_id', 'from_date', 'key', 'payload_hash',
+                 'tracker', 'interval', 'cohort')
+
+    def __init__(self, token: str, chat_id: Union[int, str],
+                 from_date: int = 0, payload_hash: Optional[bytes] = None,
+                 tracker: Optional[transitions.TransitionTracker] = None,
+                 interval: Optional[intervals.AdaptiveInterval] = None,
+                 cohort: str = '') -> None:
+        self.token = token
+        self.chat_id = chat_id
+        self.from_date = from_date
+        self.key: str = state.tenant_key(token)
+        self.payload_hash = payload_hash
+        self.tracker = (tracker if tracker is not None
+                        else transitions.TransitionTracker())
+        self.interval = (interval if interval is not None
+                         else intervals.AdaptiveInterval())
+        self.cohort = cohort
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Заголовки запроса к API Практикума."""
+        return {'Authorization': f'OAuth {self.token}'}
+
+    def __repr__(self) -> str:
+        return (f'Tenant(token={self.token!r}, chat_id={self.chat_id!r}, '
+                f'from_date={self.from_date!r})')
+
+
+def load_tenants(path: str, from_date: int = 0) -> List[Tenant]:
+    """Читает список пользователей из JSON-файла.
+
+    Файл содержит список объектов с ключами
+    ``practicum_token`` и ``chat_id``; необязательный ``cohort``
+    группирует пользователей в статистике проверок.
+    """
+    with open(path, encoding='utf-8') as file:
+        records: List[Dict[str, Union[int, str]]] = json.load(file)
+    return [Tenant(token=record['practicum_token'],
+                   chat_id=record['chat_id'],
+                   from_date=from_date,
+                   cohort=str(record.get('cohort', '')))
+            for record in records]
+
+
+def restore_tenants(tenants: Iterable[Tenant],
+                    store: state.StateStore) -> int:
+    """Восстанавливает ``from_date`` и статусы работ из хранилища.
+
+    Возвращает количество восстановленных пользователей.
+    """
+    timestamps: Dict[str, int] = store.load_timestamps()
+    statuses: Dict[str, Dict[str, str]] = store.load_all_statuses()
+    dates: Dict[str, Dict[str, str]] = store.load_all_dates()
+    restored: int = 0
+    for tenant in tenants:
+        if tenant.key in statuses:
+            tenant.tracker = transitions.TransitionTracker(
+                records.intern_statuses(statuses[tenant.key]),
+                dates.get(tenant.key)
+            )
+        if tenant.key in timestamps:
+            tenant.from_date = timestamps[tenant.key]
+            restored += 1
+    return restored
+
+
+class PollingEngine:
+    """Опрашивает API для множества пользователей из одного процесса.
+
+    Блокирующие запросы к API и Telegram выполняются в пуле потоков,
+    число одновременных запросов к API ограничено ``concurrency``.
+    Часы предохранителя и кэша ответов задаёт ``clock``: так движок
+    работает и в виртуальном времени (см. ``replay.py``).
+    Статус работы запоминается, когда уведомление поставлено в
+    исходящие. С ``store`` доставку «хотя бы один раз» гарантирует
+    таблица ``outbox``; без него сообщение, которое очередь отправки
+    отбросила после ``delivery.MAX_ATTEMPTS`` попыток, теряется:
+    позиция опроса уже сдвинулась, и переход больше не будет найден.
+    """
+
+    def __init__(self, bot: 'telegram.Bot', tenants: Iterable[Tenant],
+                 concurrency: int = MAX_CONCURRENCY,
+                 retry_period: int = homework.RETRY_PERIOD,
+                 store: Optional[state.StateStore] = None,
+                 shutdown_timeout: float = shutdown.TIMEOUT,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.bot = bot
+        self.store = store
+        self.tenants: List[Tenant] = list(tenants)
+        self.concurrency = concurrency
+        self.retry_period = retry_period
+        self.shutdown_timeout = shutdown_timeout
+        self.stopping: bool = False
+        self.active: Optional[Set[int]] = None
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.pipeline: Optional[pipeline.Pipeline] = None
+        self.polled: int = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self.scheduler = scheduler.PollScheduler(SCHEDULER_RESOLUTION)
+        self.outbound = delivery.SendQueue(bot, executor=self._executor,
+                                           on_failed=self._on_send_failed)
+        self.breaker = breaker.CircuitBreaker(clock=clock)
+        self.cache = commands.StatusCache(self.request_all, clock=clock)
+        self.commands: Optional[commands.CommandListener] = None
+        self.reviews = analytics.ReviewStats(store)
+        self.errors = alerts.ErrorAggregator(clock=clock)
+        self.digest = digest.Digest(clock=clock)
+
+    def _ensure_pipeline(self) -> pipeline.Pipeline:
+        if self.pipeline is None:
+            self.pipeline = pipeline.Pipeline([
+                pipeline.Stage('fetch', self._fetch,
+                               workers=self.concurrency, maxsize=QUEUE_SIZE),
+                pipeline.Stage('validate', self._validate,
+                               maxsize=QUEUE_SIZE),
+                pipeline.Stage('render', self._render, maxsize=QUEUE_SIZE),
+                pipeline.Stage('send', self._send, maxsize=QUEUE_SIZE),
+            ], on_error=self._on_error)
+        return self.pipeline
+
+    async def _fetch(self, index: int) -> List[Fetched]:
+        """Запрашивает статусы работ пользователя.
+
+        Предохранитель общий для всех пользователей: пока API
+        недоступен, запросы не отправляются.
+        """
+        if not self.breaker.allow():
+            raise exceptions.CircuitOpen('API недоступен.')
+        tenant: Tenant = self.tenants[index]
+        loop = asyncio.get_running_loop()
+        with self.breaker.guard():
+            content: bytes = await loop.run_in_executor(
+                self._executor, homework.request_content,
+                tenant.headers, tenant.from_date
+            )
+        return [(index, content)]
+
+    def request_all(self, index: int) -> Dict[str, Union[int, List]]:
+        """Запрашивает все работы пользователя для ответа на команду.
+
+        Вызывается из потоков приёма команд и учитывает общий
+        предохранитель.
+        """
+        if not self.breaker.allow():
+            raise exceptions.CircuitOpen('API недоступен.')
+        with self.breaker.guard():
+            response: Dict[str, Union[int, List]] = homework.request_statuses(
+                self.tenants[index].headers, 0
+            )
+        payload.validate(response)
+        return response
+
+    async def _validate(self, fetched: Fetched) -> List[Job]:
+        """Разбирает ответ API в пуле потоков.
+
+        Разбор большого ответа не задерживает цикл событий, а с ним
+        опрос и отправку для остальных пользователей.
+        """
+        loop = asyncio.get_running_loop()
+        return [await loop.run_in_executor(self._executor, self._decode,
+                                           *fetched)]
+
+    def _decode(self, index: int, content: bytes) -> Job:
+        """Разбирает ответ API и проверяет его за один проход.
+
+        Если ответ, кроме ``current_date``, совпадает с последним
+        обработанным, он не разбирается и не проверяется: список
+        работ тот же, и переходов в нём нет.
+        """
+        payload_hash, current_date = payload.fingerprint(content)
+        if (current_date is not None
+                and payload_hash == self.tenants[index].payload_hash):
+            return (index, {'homeworks': [], 'current_date': current_date},
+                    payload_hash)
+        return (index, payload.parse(content), payload_hash)
+
+    async def _render(self, job: Job) -> List[Outgoing]:
+        """Готовит сообщения о переходах и планирует следующий опрос."""
+        index, response, payload_hash = job
+        tenant: Tenant = self.tenants[index]
+        changed: List[records.Homework] = [
+            transition.homework for transition in records.find_transitions(
+                tenant.tracker, response['homeworks']
+            )
+        ]
+        messages: List[Outgoing] = self._outgoing(tenant, changed)
+        for item in changed:
+            tenant.tracker.mark(item)
+            self.reviews.observe(tenant.key, item, tenant.cohort)
+        if changed:
+            self.cache.invalidate(index)
+        tenant.payload_hash = payload_hash
+        tenant.from_date = response['current_date']
+        if self.store is not None:
+            self.store.checkpoint(
+                tenant.key, tenant.from_date,
+                {state.homework_key(item): item.get('status')
+                 for item in changed},
+                {state.homework_key(item): item.get('date_updated')
+                 for item in changed}
+            )
+        self.polled += 1
+        self.reschedule(index, tenant.interval.next_delay(
+            tenant.tracker.statuses.values(), changed=bool(changed)
+        ))
+        return messages
+
+    def _outgoing(self, tenant: Tenant,
+                  changed: List[records.Homework]) -> List[Outgoing]:
+        """Готовит сообщения и записывает их в исходящие хранилища.
+
+        Сначала готовятся все сообщения: ошибка в одной работе не
+        оставляет в исходящих записей без отправки. Запись попадает
+        в ту же транзакцию, что и контрольная точка. Уже отправленные
+        уведомления не отправляются повторно, а неотправленный повтор
+        отправляется снова.
+        """
+        texts: List[str] = [homework.parse_status(item) for item in changed]
+        messages: List[Outgoing] = []
+        for item, text in zip(changed, texts):
+            row_id: Optional[int] = None
+            if self.store is not None:
+                row_id = self.store.enqueue(tenant.chat_id, item, text)
+                if row_id is None:
+                    continue
+            messages.append((tenant.chat_id, text, row_id))
+        return messages
+
+    def _confirm(self, rows: List[int]) -> Optional[Callable]:
+        if not rows:
+            return None
+        return functools.partial(self.store.mark_delivered, rows)
+
+    async def _send(self, message: Outgoing) -> List:
+        """Передаёт сообщение в очередь отправки через дайджест."""
+        chat_id, text, row_id = message
+        metrics.DIGEST_TRANSITIONS.inc()
+        await self._put(self.digest.add(chat_id, text, row_id))
+        return []
+
+    async def _put(self, batches: List[digest.Batch]) -> None:
+        for chat_id, text, rows in batches:
+            metrics.DIGEST_MESSAGES.inc()
+            await self.outbound.put(chat_id, text, self._confirm(rows))
+
+    async def _deliver_digests(self) -> NoReturn:
+        """Отправляет дайджесты чатов по окончании их окон.
+
+        Пока окон нет, проверка идёт раз в окно: новое окно не может
+        закончиться раньше следующей проверки.
+        """
+        while True:
+            deadline: Optional[float] = self.digest.next_deadline()
+            await asyncio.sleep(
+                self.digest.window if deadline is None
+                else max(deadline - self.digest.clock(), 0)
+            )
+            await self._put(self.digest.due())
+
+    async def requeue(self, rows: List[state.OutboxRow]) -> None:
+        """Ставит в очередь записи исходящих хранилища по одной."""
+        for row_id, chat_id, text in rows:
+            metrics.count_sent(1)
+            await self.outbound.put(chat_id, text, self._confirm([row_id]))
+
+    async def resend_pending(self) -> int:
+        """Ставит в очередь уведомления, не отправленные до перезапуска.
+
+        Исходящие читаются пачками по ``outbox.BATCH``.
+        Возвращает количество уведомлений.
+        """
+        if self.store is None:
+            return 0
+        queued: int = 0
+        after: int = 0
+        while True:
+            rows: List[state.OutboxRow] = self.store.pending_outbox(
+                outbox.BATCH, after
+            )
+            await self.requeue(rows)
+            if rows:
+                after = rows[-1][0]
+            queued += len(rows)
+            if len(rows) < outbox.BATCH:
+                return queued
+
+    def _on_error(self, stage: str, item: Any, error: Exception) -> None:
+        if stage == 'send':
+            self._on_send_failed(item[0], error)
+            return
+        index: int = item if stage == 'fetch' else item[0]
+        if isinstance(error, exceptions.CircuitOpen):
+            self.reschedule(index, self.breaker.retry_in()
+                            + random.uniform(0, self.retry_period))
+            return
+        tenant: Tenant = self.tenants[index]
+        logger.error('Чат %s: %s', tenant.chat_id, error,
+                     extra={'tenant': tenant.key})
+        self._record_error(error)
+        self.reschedule(index, backoff.jittered(self.retry_period))
+
+    def _on_send_failed(self, chat_id: Union[int, str],
+                        error: BaseException) -> None:
+        logger.error('Чат %s: %s', chat_id, error)
+        self._record_error(error)
+
+    def _record_error(self, error: BaseException) -> None:
+        """Учитывает ошибку; новую сразу отправляет в ERROR_CHAT_ID."""
+        self.errors.record(error)
+        self._send_errors()
+
+    async def run_cycle(self) -> int:
+        """Выполняет один проход по всем пользователям.
+
+        Ошибка одного пользователя не прерывает опрос остальных.
+        Проход завершается, когда очередь отправки опустеет.
+        Возвращает количество успешно опрошенных пользователей.
+        """
+        polling = self._ensure_pipeline()
+        before: int = self.polled
+        for index in range(len(self.tenants)):
+            await polling.put(index)
+        await polling.join()
+        await self._put(self.digest.flush())
+        if self.store is not None:
+            self.store.flush()
+        await self.outbound.join()
+        return self.polled - before
+
+    def reschedule(self, index: int, delay: float) -> None:
+        """Назначает следующий опрос пользователя через ``delay`` секунд.
+
+        Если новый дедлайн раньше ближайшего, диспетчер будится.
+        """
+        deadline: float = asyncio.get_running_loop().time() + delay
+        nearest: Optional[float] = self.scheduler.next_deadline()
+        self.scheduler.schedule(index, deadline)
+        if logger.isEnabledFor(logging.DEBUG):
+            tenant: Tenant = self.tenants[index]
+            logger.debug('Чат %s: следующий опрос через %.0f с.',
+                         tenant.chat_id, delay, extra={'tenant': tenant.key})
+        if self._wakeup is not None and (nearest is None
+                                         or deadline < nearest):
+            self._wakeup.set()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Возвращает глубину очередей и производительность стадий."""
+        stats: Dict[str, Dict[str, float]] = (
+            self.pipeline.stats() if self.pipeline is not None else {}
+        )
+        stats['outbound'] = {'depth': self.outbound.pending,
+                             'processed': self.outbound.sent,
+                             'failed': self.outbound.failed}
+        return stats
+
+    async def _report(self) -> NoReturn:
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            for stage, values in self.stats().items():
+                logger.info('Стадия %s: в очереди %d, обработано %d, '
+                            'ошибок %d, %.1f в секунду.',
+                            stage, values['depth'], values['processed'],
+                            values['failed'], values.get('throughput', 0))
+            self._send_errors()
+
+    def _send_errors(self) -> None:
+        """Отправляет новые ошибки и сводки в ERROR_CHAT_ID, если он задан.
+
+        Ставит их в очередь без ожидания места: ошибок немного,
+        а вызывается и из обработчиков ошибок конвейера и отправки.
+        """
+        for text in self.errors.due():
+            if alerts.ERROR_CHAT_ID:
+                self.outbound.submit(alerts.ERROR_CHAT_ID, text)
+
+    def request_stop(self, reason: str = 'запрос остановки') -> None:
+        """Прекращает новые опросы; ``run`` дошлёт начатое и вернётся."""
+        logger.info('Получен %s, завершаем работу.', reason)
+        self.stopping = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        polling = self._ensure_pipeline()
+        while not self.stopping:
+            deadline: Optional[float] = self.scheduler.next_deadline()
+            timeout: Optional[float] = (
+                None if deadline is None else max(deadline - loop.time(), 0)
+            )
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            now: float = loop.time()
+            for index, deadline in self.scheduler.pop_due_deadlines(now):
+                if self.active is not None and index not in self.active:
+                    self.reschedule(index, self.retry_period)
+                    continue
+                metrics.POLL_LAG.observe(max(now - deadline, 0))
+                await polling.put(index)
+
+    async def _drain(self) -> None:
+        loop = asyncio.get_running_loop()
+        deadline: float = loop.time() + self.shutdown_timeout
+        if self.pipeline is not None:
+            try:
+                await asyncio.wait_for(self.pipeline.join(),
+                                       self.shutdown_timeout)
+            except asyncio.TimeoutError:
+                logger.warning('Конвейер не опустел за %.0f с.',
+                               self.shutdown_timeout)
+        await self._put(self.digest.flush())
+        if self.store is not None:
+            self.store.flush()
+        if not await self.outbound.join(max(deadline - loop.time(), 0)):
+            logger.warning('Не отправлено сообщений: %d, они будут '
+                           'отправлены после запуска.', self.outbound.pending)
+
+    async def run(self) -> None:
+        """Опрашивает пользователей по расписанию.
+
+        Первые опросы равномерно распределены по ``retry_period``.
+        Диспетчер забирает из планировщика наступившие дедлайны пачкой
+        и передаёт их в конвейер: запрос, проверка, подготовка
+        сообщений, отправка. Если отправка не успевает, очереди
+        стадий заполняются, и диспетчер ждёт свободного места.
+        После ``request_stop`` новые опросы не начинаются: начатые
+        доходят до отправки не дольше ``shutdown_timeout`` секунд.
+        """
+        loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self.scheduler.spread(range(len(self.tenants)), self.retry_period,
+                              loop.time())
+        reporter: asyncio.Task = asyncio.create_task(self._report())
+        digests: Optional[asyncio.Task] = (
+            asyncio.create_task(self._deliver_digests())
+            if self.digest.enabled else None
+        )
+        self.commands = commands.start_from_env(
+            self.bot, self.cache,
+            {str(tenant.chat_id): index
+             for index, tenant in enumerate(self.tenants)},
+            lambda chat_id, text: loop.call_soon_threadsafe(
+                self.outbound.submit, chat_id, text
+            ),
+            {'/stats': lambda: analytics.format_stats(self.reviews.summary())}
+        )
+        try:
+            resent: int = await self.resend_pending()
+            if resent:
+                logger.info('Повторно отправляются уведомления: %d.', resent)
+            await self._dispatch()
+            await self._drain()
+        finally:
+            reporter.cancel()
+            if digests is not None:
+                digests.cancel()
+            if self.commands is not None:
+                self.commands.stop()
+            if self.pipeline is not None:
+                await self.pipeline.stop()
+            await self.outbound.stop()
+
+    def close(self) -> None:
+        """Останавливает пул потоков."""
+        self._executor.shutdown(wait=True)
+
+
+async def run_until_signal(engine: PollingEngine) -> None:
+    """Запускает опрос до SIGTERM или SIGINT."""
+    loop = asyncio.get_running_loop()
+    for signum in shutdown.SIGNALS:
+        loop.add_signal_handler(signum, engine.request_stop, signum.name)
+    try:
+        await engine.run()
+    finally:
+        for signum in shutdown.SIGNALS:
+            loop.remove_signal_handler(signum)
+
+
+def run_tenants(tenants: List[Tenant], db_path: Optional[str],
+                serve: Callable[[PollingEngine], Awaitable[None]]
+                = run_until_signal) -> None:
+    """Опрашивает ``tenants`` до остановки.
+
+    Позиция опроса хранится в ``db_path``, если он задан. ``serve``
+    получает готовый движок и запускает его в цикле событий.
+    """
+    store: Optional[state.StateStore] = None
+    if db_path:
+        store = state.StateStore(db_path)
+        logger.info('Позиция опроса восстановлена для %d пользователей.',
+                    restore_tenants(tenants, store))
+    http_client.configure(pool_maxsize=MAX_CONCURRENCY)
+    metrics.start_from_env()
+    import profiling
+    import replay
+    import telegram
+    from telegram.utils.request import Request
+
+    replay.record_from_env()
+    profiling.install_from_env()
+    bot = telegram.Bot(token=homework.TELEGRAM_TOKEN,
+                       request=Request(con_pool_size=delivery.SENDERS + 4))
+    engine = PollingEngine(bot, tenants, store=store)
+    try:
+        asyncio.run(serve(engine))
+    finally:
+        engine.close()
+        http_client.close()
+        if store is not None:
+            store.close()
+
+
+def main() -> NoReturn:
+    """Запускает опрос для всех пользователей из TENANTS_FILE."""
+    logs.setup(homework.logger)
+    if not (TENANTS_FILE and homework.TELEGRAM_TOKEN):
+        error: str = 'Не заданы TENANTS_FILE и TELEGRAM_TOKEN.'
+        logger.critical(error)
+        sys.exit(error)
+    tenants: List[Tenant] = load_tenants(TENANTS_FILE, int(time.time()))
+    logger.info('Загружено пользователей: %d. Одновременных запросов: %d.',
+                len(tenants), MAX_CONCURRENCY)
+    run_tenants(tenants, state.STATE_DB)
+
+
+if __name__ == '__main__':
+    main()
@@ -16,3 +16,11 @@ class NoExpendKeysResponse(Exception):
 
 class DontSentMessage(Exception):
     pass
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class ShutdownRequested(Exception):
+    pass
@@ -0,0 +1,241 @@
+import os
+import sys
+import csv
+import json
+import queue
+import argparse
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, TextIO
+
+import engine
+import exceptions
+import homework
+import logs
+import payload
+import records
+
+CONCURRENCY: int = int(os.getenv('EXPORT_CONCURRENCY', 4))
+CHUNK: int = int(os.getenv('EXPORT_CHUNK', 500))
+READ_SIZE: int = 64 * 1024
+SPOOL_SIZE: int = 1024 * 1024
+FIELDS: List[str] = ['tenant', *records.Homework._fields]
+
+logger = homework.logger.getChild('export')
+
+Row = Dict[str, object]
+Write = Callable[[List[Row]], None]
+
+
+def jsonl_writer(file: TextIO) -> Write:
+    """Пишет работы по одной на строку в JSON."""
+    def write(rows: List[Row]) -> None:
+        file.write(''.join(json.dumps(row, ensure_ascii=False) + '\n'
+                           for row in rows))
+    return write
+
+
+def csv_writer(file: TextIO) -> Write:
+    """Пишет работы в CSV с колонками ``FIELDS``."""
+    writer = csv.DictWriter(file, FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    return writer.writerows
+
+
+WRITERS: Dict[str, Callable[[TextIO], Write]] = {
+    'jsonl': jsonl_writer,
+    'csv': csv_writer,
+}
+
+
+def export_tenant(tenant: engine.Tenant, from_date: int, chunk: int,
+                  put: Write) -> int:
+    """Выгружает работы пользователя пачками по ``chunk``.
+
+    Ответ API читается и разбирается по частям, поэтому память
+    не зависит от длины истории. Работы копятся во временном файле
+    и передаются в ``put`` только после проверки всего ответа:
+    из ответа без ``current_date`` ничего не записывается.
+    Возвращает число выгруженных работ.
+    """
+    import requests
+
+    response = homework.request_api(tenant.headers, from_date, stream=True)
+    with tempfile.SpooledTemporaryFile(SPOOL_SIZE, mode='w+',
+                                       encoding='utf-8') as spool:
+        try:
+            stream = payload.HomeworkStream(response.iter_content(READ_SIZE))
+            for item in stream:
+                if not isinstance(item, dict):
+                    raise TypeError('В ответе API работа передана не в виде '
+                                    'словаря.')
+                spool.write(json.dumps(item, ensure_ascii=False) + '\n')
+            homework.check_response(stream.envelope)
+        except requests.RequestException:
+            raise exceptions.BadConnection('Не удалось подключиться к API.')
+        finally:
+            response.close()
+        spool.seek(0)
+        exported: int = 0
+        rows: List[Row] = []
+        for line in spool:
+            rows.append({'tenant': tenant.key, **json.loads(line)})
+            if len(rows) >= chunk:
+                put(rows)
+                exported += len(rows)
+                rows = []
+    if rows:
+        put(rows)
+    return exported + len(rows)
+
+
+class Channel:
+    """Ограниченная очередь пачек от потоков выгрузки к записи."""
+
+    def __init__(self, size: int) -> None:
+        self._queue: queue.Queue = queue.Queue(maxsize=size)
+        self._closed = threading.Event()
+
+    def put(self, rows: List[Row]) -> None:
+        """Ждёт места в очереди; после ``close`` прерывает выгрузку."""
+        while not self._closed.is_set():
+            try:
+                self._queue.put(rows, timeout=1)
+                return
+            except queue.Full:
+                continue
+        raise exceptions.ShutdownRequested('Выгрузка прервана.')
+
+    def pump(self, write: Write, futures: Iterable[Future]) -> None:
+        """Пишет пачки, пока не завершатся все выгрузки."""
+        futures = list(futures)
+        while True:
+            try:
+                write(self._queue.get(timeout=0.1))
+            except queue.Empty:
+                if (all(future.done() for future in futures)
+                        and self._queue.empty()):
+                    return
+
+    def close(self, futures: Iterable[Future]) -> None:
+        """Прерывает незавершённые выгрузки и ждёт их остановки."""
+        futures = list(futures)
+        self._closed.set()
+        for future in futures:
+            future.cancel()
+        while not all(future.done() for future in futures):
+            try:
+                self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def report(futures: Dict[str, Future]) -> Dict[str, Optional[Exception]]:
+    """Пишет в лог итог выгрузки и возвращает ошибки пользователей."""
+    results: Dict[str, Optional[Exception]] = {}
+    for key, future in futures.items():
+        results[key] = future.exception()
+        if results[key] is None:
+            logger.info('Пользователь %s: выгружено работ %d.',
+                        key, future.result())
+        else:
+            logger.error('Пользователь %s: выгрузка не удалась: %s',
+                         key, results[key])
+    return results
+
+
+def export(tenants: List[engine.Tenant], write: Write, from_date: int = 0,
+           concurrency: int = CONCURRENCY,
+           chunk: int = CHUNK) -> Dict[str, Optional[Exception]]:
+    """Выгружает историю работ пользователей через ``write``.
+
+    Пользователи выгружаются параллельно, не больше ``concurrency``
+    одновременно, а пишет один поток. Между ними очередь из
+    ``2 * concurrency`` пачек, поэтому память ограничена, даже если
+    запись отстаёт. Возвращает ошибку каждого пользователя
+    или ``None``, если его история выгружена.
+    """
+    channel = Channel(2 * concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency,
+                            thread_name_prefix='export') as pool:
+        futures: Dict[str, Future] = {
+            tenant.key: pool.submit(export_tenant, tenant, from_date, chunk,
+                                    channel.put)
+            for tenant in tenants
+        }
+        try:
+            channel.pump(write, futures.values())
+        finally:
+            channel.close(futures.values())
+    return report(futures)
+
+
+def load_tenants(args: argparse.Namespace) -> List[engine.Tenant]:
+    """Собирает пользователей из --token и --tenants-file."""
+    tenants: List[engine.Tenant] = [engine.Tenant(token=token, chat_id=None)
+                                    for token in args.token]
+    if args.tenants_file:
+        tenants.extend(engine.load_tenants(args.tenants_file))
+    if not tenants and homework.PRACTICUM_TOKEN:
+        tenants.append(engine.Tenant(token=homework.PRACTICUM_TOKEN,
+                                     chat_id=None))
+    return tenants
+
+
+def parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(
+        prog='homework.py export',
+        description='Выгружает историю работ в JSONL или CSV.'
+    )
+    parser.add_argument('--token', action='append', default=[],
+                        help='токен Практикума, можно указать несколько раз')
+    parser.add_argument('--tenants-file', default=engine.TENANTS_FILE,
+                        help='JSON-файл пользователей, как для engine.py')
+    parser.add_argument('--output', default='-',
+                        help='файл для записи, «-» — stdout')
+    parser.add_argument('--format', choices=sorted(WRITERS),
+                        help='по умолчанию — по расширению файла, '
+                        'иначе jsonl')
+    parser.add_argument('--from-date', type=int, default=0)
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    parser.add_argument('--chunk', type=int, default=CHUNK)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа ``python homework.py export``."""
+    args = parse_args(argv)
+    logs.setup(homework.logger, output=sys.stderr)
+    tenants: List[engine.Tenant] = load_tenants(args)
+    if not tenants:
+        logger.critical('Не заданы токены: --token, --tenants-file '
+                        'или PRACTICUM_TOKEN.')
+        return 2
+    output_format: str = args.format or (
+        'csv' if args.output.endswith('.csv') else 'jsonl'
+    )
+    file: TextIO = sys.stdout
+    temp: Optional[str] = None
+    if args.output != '-':
+        descriptor, temp = tempfile.mkstemp(
+            suffix='.tmp', dir=os.path.dirname(os.path.abspath(args.output))
+        )
+        file = os.fdopen(descriptor, 'w', encoding='utf-8', newline='')
+    try:
+        results = export(tenants, WRITERS[output_format](file),
+                         args.from_date, args.concurrency, args.chunk)
+    except BaseException:
+        if temp is not None:
+            file.close()
+            os.remove(temp)
+        raise
+    if temp is not None:
+        file.close()
+        os.replace(temp, args.output)
+    return 1 if any(error is not None for error in results.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,14 +2,24 @@ import os
 import sys
 import time
 import logging
-from typing import Union, NoReturn, List, Dict
+from typing import TYPE_CHECKING, Union, NoReturn, List, Dict, Optional
 from http import HTTPStatus
 
-import requests
 from dotenv import load_dotenv
-import telegram
 
+import breaker
 import exceptions
+import http_client
+import logs
+import metrics
+import outbox
+import shutdown
+import state
+import transitions
+
+if TYPE_CHECKING:
+    import requests
+    import telegram
 
 load_dotenv()
 
@@ -28,11 +38,6 @@ HOMEWORK_VERDICTS: Dict[str, str] = {
 }
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-handler = logging.StreamHandler(stream=sys.stdout)
-formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
 
 
 def check_tokens() -> bool:
@@ -40,20 +45,56 @@ def check_tokens() -> bool:
     return all((PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID))
 
 
+@metrics.timed(metrics.FUNCTION_LATENCY, 'get_api_answer')
 def get_api_answer(timestamp: int) -> Dict[str, Union[int, List]]:
     """Делает запрос к эндпоинту API-сервиса."""
+    return request_statuses(HEADERS, timestamp)
+
+
+def request_statuses(headers: Dict[str, str],
+                     timestamp: int) -> Dict[str, Union[int, List]]:
+    """Делает запрос к эндпоинту API-сервиса с заданными заголовками."""
+    import requests
+
     try:
-        response = requests.get(ENDPOINT,
-                                headers=HEADERS,
-                                params={'from_date': timestamp})
-        if response.status_code == HTTPStatus.OK:
-            return response.json()
-        else:
-            raise exceptions.BadConnection('Не удалось подключиться к API.')
+        return request_api(headers, timestamp).json()
     except requests.RequestException:
         raise exceptions.BadConnection('Не удалось подключиться к API.')
 
 
+@metrics.timed(metrics.FUNCTION_LATENCY, 'get_api_answer')
+def request_content(headers: Dict[str, str], timestamp: int) -> bytes:
+    """Возвращает тело ответа API без разбора JSON."""
+    return request_api(headers, timestamp).content
+
+
+def request_api(headers: Dict[str, str], timestamp: int,
+                stream: bool = False) -> 'requests.Response':
+    """Делает запрос к API и проверяет код ответа.
+
+    С ``stream=True`` тело ответа не загружается сразу: его читают
+    по частям через ``iter_content``.
+    """
+    import requests
+
+    try:
+        with metrics.API_IN_FLIGHT.track(), metrics.API_LATENCY.time():
+            response = http_client.get_session().get(
+                ENDPOINT,
+                headers=headers,
+                params={'from_date': timestamp},
+                timeout=http_client.TIMEOUT,
+                stream=stream
+            )
+    except requests.RequestException:
+        raise exceptions.BadConnection('Не удалось подключиться к API.')
+    if response.status_code != HTTPStatus.OK:
+        raise exceptions.BadConnection('Не удалось подключиться к API.')
+    return response
+
+
+@metrics.timed(metrics.FUNCTION_LATENCY, 'check_response')
+@metrics.count_errors(metrics.VALIDATION_FAILURES)
 def check_response(response: Dict[str, Union[int, List]]) -> NoReturn:
     """Проверяет ответ API на соответствие документации."""
     if not isinstance(response, Dict):
@@ -67,6 +108,8 @@ def check_response(response: Dict[str, Union[int, List]]) -> NoReturn:
                         'данные приходят не в виде списка.')
 
 
+@metrics.timed(metrics.FUNCTION_LATENCY, 'parse_status')
+@metrics.count_errors(metrics.VALIDATION_FAILURES)
 def parse_status(homework: Dict[str, Union[str, int]]) -> str:
     """Извлекает из информации о конкретной домашней работе её статус."""
     status: str = homework.get('status')
@@ -82,23 +125,119 @@ def parse_status(homework: Dict[str, Union[str, int]]) -> str:
     return message
 
 
-def send_message(bot: telegram.Bot, message: str) -> NoReturn:
+@metrics.timed(metrics.FUNCTION_LATENCY, 'send_message')
+def send_message(bot: 'telegram.Bot', message: str) -> NoReturn:
     """Отправляет сообщение в Telegram чат."""
-    logger.debug(f'Попытка отправить сообщение: {message}')
+    send_message_to_chat(bot, TELEGRAM_CHAT_ID, message)
+
+
+def send_message_to_chat(bot: 'telegram.Bot', chat_id: Union[int, str],
+                         message: str) -> NoReturn:
+    """Отправляет сообщение в указанный Telegram чат."""
+    logger.debug('Попытка отправить сообщение: %s', message)
     try:
-        bot.send_message(TELEGRAM_CHAT_ID, message)
+        with metrics.SEND_LATENCY.time():
+            bot.send_message(chat_id, message)
     except Exception as error:
+        metrics.SEND_FAILURES.inc()
         logger.error(error)
         raise exceptions.DontSentMessage('Не удалось отправить сообщение '
-                                         f'в Telegram чат {error}')
+                                         f'в Telegram чат {error}'
+                                         ) from error
     else:
-        logger.debug(f'Сообщение  отправлено: {message}')
+        logger.debug('Сообщение  отправлено: %s', message)
+
+
+def call_api(circuit: breaker.CircuitBreaker,
+             timestamp: int) -> Dict[str, Union[int, List]]:
+    """Делает запрос к API, если предохранитель его пропускает."""
+    if not circuit.allow():
+        raise exceptions.CircuitOpen('API недоступен, следующая попытка '
+                                     f'через {circuit.retry_in():.0f} с.')
+    with circuit.guard():
+        return get_api_answer(timestamp)
+
+
+def request_all(
+    circuit: breaker.CircuitBreaker
+) -> Dict[str, Union[int, List]]:
+    """Запрашивает все работы для ответа на команду и проверяет ответ.
+
+    Непроверенный ответ не должен попасть в кэш статусов.
+    """
+    response: Dict[str, Union[int, List]] = call_api(circuit, 0)
+    check_response(response)
+    return response
+
+
+def restore_timestamp(store: Optional[state.StateStore], tenant: str) -> int:
+    """Возвращает сохранённую позицию опроса или текущее время."""
+    if store is not None:
+        timestamp: Optional[int] = store.load_timestamp(tenant)
+        if timestamp is not None:
+            logger.info('Опрос продолжается с сохранённой позиции.')
+            return timestamp
+    return int(time.time())
+
+
+def restore_tracker(store: Optional[state.StateStore],
+                    tenant: str) -> transitions.TransitionTracker:
+    """Создаёт индекс статусов работ из сохранённого состояния."""
+    if store is None:
+        return transitions.TransitionTracker()
+    return transitions.TransitionTracker(store.load_statuses(tenant),
+                                         store.load_dates(tenant))
+
+
+def save_checkpoint(store: Optional[state.StateStore], tenant: str,
+                    current_date: int,
+                    homeworks: List[Dict[str, Union[str, int]]]) -> None:
+    """Сохраняет позицию опроса и новые статусы работ."""
+    if store is None:
+        return
+    store.checkpoint(tenant, current_date,
+                     {state.homework_key(homework): homework.get('status')
+                      for homework in homeworks},
+                     {state.homework_key(homework):
+                      homework.get('date_updated')
+                      for homework in homeworks})
+
+
+def send_errors(bot: 'telegram.Bot', messages: List[str]) -> None:
+    """Отправляет сводки ошибок; сбой отправки только пишется в лог."""
+    for message in messages:
+        try:
+            send_message(bot, message)
+        except exceptions.DontSentMessage as error:
+            logger.error(error)
+
+
+def finish(stopper: shutdown.Shutdown, notifications: outbox.Outbox,
+           store: Optional[state.StateStore], bot: 'telegram.Bot',
+           render: Optional[outbox.Render] = None) -> None:
+    """Досылает накопленные уведомления и закрывает хранилище.
+
+    ``render`` объединяет уведомления так же, как при обычном опросе.
+    """
+    logger.info('Получен %s, завершаем работу.', stopper.reason)
+    try:
+        sent: int = notifications.drain(
+            lambda chat_id, message: send_message(bot, message),
+            deadline=stopper.deadline(),
+            render=render
+        )
+        logger.info('Перед остановкой отправлено уведомлений: %d.', sent)
+    except Exception as error:
+        logger.error('Не удалось дослать уведомления: %s', error)
+    if store is not None:
+        store.close()
 
 
 def main() -> NoReturn:
     """Основная логика работы бота."""
-    logger.info(f'Запуск программы. Данные обновляются каждые {RETRY_PERIOD}'
-                ' секунд. Поиск токенов авторизации.')
+    logs.setup(logger)
+    logger.info('Запуск программы. Данные обновляются каждые %d секунд. '
+                'Поиск токенов авторизации.', RETRY_PERIOD)
 
     if not check_tokens():
         error: str = 'Недостаточно переменных окружения для запуска программы.'
@@ -107,46 +246,105 @@ def main() -> NoReturn:
     logger.debug('Переменные окружения (токены) найдены и подключены. '
                  'Попытка подключения к Telegram боту.')
 
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    timestamp: int = int(time.time())
-    logger.debug(f'Зафиксировано время запроса: {timestamp}.')
-    sent_error_to_tg: bool = False
+    import alerts
+    import analytics
+    import commands
+    import digest
+    import profiling
+    import replay
+    import telegram
+    from telegram.utils.request import Request
 
-    while True:
-        logger.debug('Узнаём статус домашней работы.')
-        try:
-            logger.debug('Попытка подключения к API.')
-            response: Dict[str, Union[int, List]] = get_api_answer(timestamp)
-            logger.debug('Удачное подключение к API. '
-                         'Проверка ответа API на соответствие документации.')
-            check_response(response)
-            logger.debug('Ответ API соответствует документации.')
-            if response and len(response.get('homeworks')) == 0:
-                logger.info('Статус домашней работы работы не изменён.')
-                logger.debug(f'Ожидание {RETRY_PERIOD} секунд.')
-            else:
-                logger.debug('Изменение статуса домашней работы. '
-                             'Просмотр последней записи.')
-                homework = response.get('homeworks')[0]
-                logger.debug('Получена последняя запись. Чтение информации.')
-                message = parse_status(homework)
-                logger.debug('Готово сообщение для отправки в Telegram.')
-                logger.info(message)
-                send_message(bot, message)
-                logger.debug(f'Ожидание {RETRY_PERIOD} секунд.')
-        except Exception as error:
-            logger.error(error)
-            message: str = f'Сбой в работе программы: {error}'
-            if not sent_error_to_tg:
-                send_message(bot, message)
-                sent_error_to_tg = True
-            break
-        else:
-            logger.debug(f'Зафиксировано время запроса: {timestamp}.')
-            timestamp: int = response.get('current_date')
-        finally:
-            time.sleep(RETRY_PERIOD)
+    bot = telegram.Bot(token=TELEGRAM_TOKEN)
+    if commands.BOT_COMMANDS:
+        # Бот делят цикл опроса, приём команд и потоки ответов на них.
+        bot = telegram.Bot(token=TELEGRAM_TOKEN, request=Request(
+            con_pool_size=commands.WORKERS + 2
+        ))
+    replay.record_from_env()
+    profiling.install_from_env()
+    store: Optional[state.StateStore] = (
+        state.StateStore(state.STATE_DB, flush_every=1)
+        if state.STATE_DB else None
+    )
+    tenant: str = state.tenant_key(PRACTICUM_TOKEN)
+    timestamp: int = restore_timestamp(store, tenant)
+    tracker: transitions.TransitionTracker = restore_tracker(store, tenant)
+    notifications = outbox.Outbox(store)
+    reviews = analytics.ReviewStats(store)
+    logger.debug('Зафиксировано время запроса: %d.', timestamp)
+    errors = alerts.ErrorAggregator()
+    merge: Optional[outbox.Render] = (digest.render if digest.DIGEST_WINDOW
+                                      else None)
+    circuit = breaker.CircuitBreaker()
+    cache = commands.StatusCache(lambda key: request_all(circuit))
+    commands.start_from_env(
+        bot, cache, {str(TELEGRAM_CHAT_ID): tenant},
+        lambda chat_id, text: send_message_to_chat(bot, chat_id, text),
+        {'/stats': lambda: analytics.format_stats(reviews.summary())}
+    )
+    metrics.start_from_env()
+    scheduled: float = time.monotonic()
+    stopper = shutdown.Shutdown()
+    stopper.install()
+    try:
+        while True:
+            logger.debug('Узнаём статус домашней работы.')
+            metrics.POLL_LAG.observe(max(time.monotonic() - scheduled, 0))
+            try:
+                logger.debug('Попытка подключения к API.')
+                response: Dict[str, Union[int, List]] = call_api(circuit,
+                                                                 timestamp)
+                logger.debug('Удачное подключение к API. Проверка ответа '
+                             'API на соответствие документации.')
+                check_response(response)
+                logger.debug('Ответ API соответствует документации.')
+                changed: List[Dict[str, Union[str, int]]] = tracker.changes(
+                    response.get('homeworks')
+                )
+                if not changed:
+                    logger.info('Статус домашней работы работы не изменён.')
+                messages: List[str] = [parse_status(homework)
+                                       for homework in changed]
+                for homework, message in zip(changed, messages):
+                    logger.info(message)
+                    notifications.add(TELEGRAM_CHAT_ID, homework, message)
+                    tracker.mark(homework)
+                    reviews.observe(tenant, homework)
+                    cache.invalidate(tenant)
+                logger.debug('Зафиксировано время запроса: %d.', timestamp)
+                timestamp = response.get('current_date')
+                save_checkpoint(store, tenant, timestamp, changed)
+                notifications.drain(
+                    lambda chat_id, message: send_message(bot, message),
+                    render=merge
+                )
+                logger.debug('Ожидание %d секунд.', RETRY_PERIOD)
+            except Exception as error:
+                logger.error(error)
+                errors.record(error)
+            finally:
+                send_errors(bot, errors.due())
+                scheduled = time.monotonic() + RETRY_PERIOD
+                with stopper.interruptible():
+                    time.sleep(RETRY_PERIOD)
+    except exceptions.ShutdownRequested:
+        finish(stopper, notifications, store, bot, merge)
+    finally:
+        stopper.restore()
 
 
 if __name__ == '__main__':
+    if '--check' in sys.argv[1:]:
+        import preflight
+        sys.exit(preflight.main())
+    if sys.argv[1:2] == ['export']:
+        import export
+        sys.exit(export.main(sys.argv[2:]))
+    if sys.argv[1:2] == ['stats']:
+        import analytics
+        sys.exit(analytics.main(sys.argv[2:]))
+    if sys.argv[1:2] == ['replay']:
+        import replay
+        sys.exit(replay.main(sys.argv[2:]))
     main()
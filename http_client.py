@@ -0,0 +1,76 @@
+import os
+import threading
+from typing import TYPE_CHECKING, Optional, Tuple
+
+if TYPE_CHECKING:
+    import requests
+
+POOL_CONNECTIONS: int = int(os.getenv('HTTP_POOL_CONNECTIONS', 4))
+POOL_MAXSIZE: int = int(os.getenv('HTTP_POOL_MAXSIZE', 100))
+CONNECT_TIMEOUT: float = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+READ_TIMEOUT: float = float(os.getenv('HTTP_READ_TIMEOUT', 15))
+TIMEOUT: Tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+_session: Optional['requests.Session'] = None
+_lock = threading.Lock()
+
+
+def create_session(pool_maxsize: int = POOL_MAXSIZE) -> 'requests.Session':
+    """Создаёт сессию с пулом keep-alive соединений.
+
+    Размер пула ``pool_maxsize`` стоит держать не меньше числа
+    потоков, одновременно делающих запросы, иначе лишние
+    соединения будут закрываться после каждого запроса.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS,
+                          pool_maxsize=pool_maxsize,
+                          pool_block=False)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session() -> 'requests.Session':
+    """Возвращает общую для всех запросов сессию."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def configure(pool_maxsize: int) -> 'requests.Session':
+    """Пересоздаёт общую сессию с пулом нужного размера."""
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = create_session(pool_maxsize)
+    return _session
+
+
+def install(session: 'requests.Session'
+            ) -> Optional['requests.Session']:
+    """Подменяет общую сессию, например записью или воспроизведением.
+
+    ``session`` должна поддерживать ``get`` и ``close`` как у
+    ``requests.Session``. Возвращает сессию, которая была до этого.
+    """
+    global _session
+    with _lock:
+        previous, _session = _session, session
+    return previous
+
+
+def close() -> None:
+    """Закрывает общую сессию и все её соединения."""
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,50 @@
+import os
+import random
+from typing import FrozenSet, Iterable
+
+import homework
+from backoff import JITTER, exponential_delay, jittered
+
+ACTIVE_PERIOD: int = int(os.getenv('ACTIVE_PERIOD', 120))
+MAX_PERIOD: int = int(os.getenv('MAX_PERIOD', 3 * 60 * 60))
+
+ACTIVE_STATUSES: FrozenSet[str] = frozenset({'reviewing'})
+
+
+class AdaptiveInterval:
+    """Интервал опроса одного пользователя, зависящий от статусов работ.
+
+    Пока хотя бы одна работа на проверке, API опрашивается каждые
+    ``active`` секунд. Если работ на проверке нет, интервал растёт
+    вдвое после каждого опроса без изменений, начиная с ``base``,
+    и не превышает ``cap``. Любой переход статуса сбрасывает рост.
+    """
+
+    __slots__ = ('base', 'active', 'cap', 'jitter', 'rng', 'idle_polls')
+
+    def __init__(self, base: float = homework.RETRY_PERIOD,
+                 active: float = ACTIVE_PERIOD, cap: float = MAX_PERIOD,
+                 jitter: float = JITTER,
+                 rng: random.Random = random) -> None:
+        self.base = base
+        self.active = active
+        self.cap = cap
+        self.jitter = jitter
+        self.rng = rng
+        self.idle_polls: int = 0
+
+    def next_delay(self, statuses: Iterable[str], changed: bool) -> float:
+        """Возвращает задержку до следующего опроса в секундах."""
+        if changed:
+            self.idle_polls = 0
+        if not ACTIVE_STATUSES.isdisjoint(statuses):
+            delay: float = self.active
+        else:
+            delay = exponential_delay(self.base, self.idle_polls, self.cap)
+            if not changed:
+                self.idle_polls += 1
+        return jittered(delay, self.jitter, self.rng)
+
+    def reset(self) -> None:
+        """Возвращает интервал к базовому значению."""
+        self.idle_polls = 0
@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, TextIO, Tuple
+
+LOG_LEVEL: str = os.getenv('LOG_LEVEL', 'DEBUG')
+LOG_FORMAT: str = os.getenv('LOG_FORMAT', 'text')
+LOG_QUEUE: bool = os.getenv('LOG_QUEUE', '').lower() in ('1', 'true', 'yes')
+LOG_DEBUG_SAMPLE: int = int(os.getenv('LOG_DEBUG_SAMPLE', 1))
+
+TEXT_FORMAT: str = '%(asctime)s [%(levelname)s] %(message)s'
+
+
+class JSONFormatter(logging.Formatter):
+    """Пишет запись одной строкой JSON.
+
+    Идентификатор пользователя берётся из атрибута ``tenant``,
+    который передаётся через ``extra={'tenant': ...}``.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Возвращает запись в виде JSON."""
+        data: Dict[str, object] = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        tenant: Optional[str] = getattr(record, 'tenant', None)
+        if tenant is not None:
+            data['tenant'] = tenant
+        sampled: int = getattr(record, 'sampled', 1)
+        if sampled > 1:
+            data['sampled'] = sampled
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """Пропускает каждую ``every``-ю отладочную запись из одного места.
+
+    Место определяется файлом и строкой вызова, поэтому повторяющиеся
+    в цикле опроса сообщения прореживаются, а редкие проходят всегда
+    (первая запись из каждого места записывается). Прошедшая фильтр
+    запись получает атрибут ``sampled`` — сколько записей она представляет.
+    Записи уровня INFO и выше не прореживаются.
+    """
+
+    def __init__(self, every: int = LOG_DEBUG_SAMPLE) -> None:
+        super().__init__()
+        self.every = max(every, 1)
+        self._counts: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Решает, записывать ли запись."""
+        if self.every == 1 or record.levelno > logging.DEBUG:
+            return True
+        key: Tuple[str, int] = (record.pathname, record.lineno)
+        with self._lock:
+            count: int = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % self.every:
+            return False
+        record.sampled = self.every
+        return True
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Кладёт запись в очередь без форматирования.
+
+    Стандартный ``QueueHandler`` подставляет аргументы в сообщение
+    в вызывающем потоке. Здесь это делает фоновый поток: аргументы
+    в проекте — строки, числа и исключения, которые не меняются
+    после вызова логгера.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Возвращает запись без изменений."""
+        return record
+
+
+class BackgroundListener(QueueListener):
+    """``QueueListener``, который можно останавливать повторно."""
+
+    def stop(self) -> None:
+        """Дописывает очередь и останавливает поток, если он запущен."""
+        if self._thread is not None:
+            super().stop()
+
+
+def create_formatter(log_format: str = LOG_FORMAT) -> logging.Formatter:
+    """Возвращает форматтер для ``text`` или ``json``."""
+    if log_format == 'json':
+        return JSONFormatter()
+    return logging.Formatter(TEXT_FORMAT)
+
+
+def setup(logger: logging.Logger, level: str = LOG_LEVEL,
+          log_format: str = LOG_FORMAT, use_queue: bool = LOG_QUEUE,
+          sample: int = LOG_DEBUG_SAMPLE,
+          output: Optional[TextIO] = None) -> Optional[QueueListener]:
+    """Подключает к логгеру вывод в stdout (или в ``output``).
+
+    В режиме очереди логгер только кладёт записи в очередь, а
+    форматирует и пишет их фоновый поток ``QueueListener``; так
+    вывод не задерживает цикл опроса. Возвращает запущенный
+    ``QueueListener`` (он останавливается при выходе) или ``None``.
+    Если у логгера уже есть обработчики, ничего не делает.
+    """
+    if logger.handlers:
+        return None
+    logger.setLevel(level)
+    stream = logging.StreamHandler(stream=output or sys.stdout)
+    stream.setFormatter(create_formatter(log_format))
+    handler: logging.Handler = stream
+    listener: Optional[QueueListener] = None
+    if use_queue:
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        handler = DeferredQueueHandler(records)
+        listener = BackgroundListener(records, stream)
+        listener.start()
+        atexit.register(listener.stop)
+    if sample > 1:
+        handler.addFilter(DebugSampler(sample))
+    logger.addHandler(handler)
+    return listener
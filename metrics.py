@@ -0,0 +1,394 @@
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from typing import (TYPE_CHECKING, Callable, Dict, Iterator, List, Optional,
+                    Sequence, Tuple, Type)
+
+if TYPE_CHECKING:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT: Optional[str] = os.getenv('METRICS_PORT')
+METRICS_ADDR: str = os.getenv('METRICS_ADDR', '127.0.0.1')
+
+LATENCY_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                                      0.5, 1, 2.5, 5, 10, 30)
+LAG_BUCKETS: Tuple[float, ...] = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 600)
+FUNCTION_BUCKETS: Tuple[float, ...] = (0.0001, 0.0005, 0.001, 0.005, 0.01,
+                                       0.05, 0.1, 0.5, 1, 5, 30)
+
+LabelValues = Tuple[str, ...]
+
+_registry: List['Metric'] = []
+
+
+def _escape(value: str) -> str:
+    return (value.replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    pairs: str = ','.join(f'{name}="{_escape(value)}"'
+                          for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """Метрика с необязательными метками.
+
+    Значения для каждого набора меток хранит дочерний объект,
+    который возвращает ``labels``.
+    """
+
+    kind: str = 'untyped'
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: Sequence[str] = (),
+                 registry: Optional[List['Metric']] = None) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+        (_registry if registry is None else registry).append(self)
+        if not self.labelnames:
+            self.labels()
+
+    def labels(self, *values: str):
+        """Возвращает значение метрики для набора меток."""
+        key: LabelValues = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> Iterator[str]:
+        """Возвращает строки метрики в текстовом формате Prometheus."""
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} {self.kind}'
+        for values, child in list(self._children.items()):
+            yield from child.render(self.name, self.labelnames, values)
+
+
+class _Value:
+    def __init__(self) -> None:
+        self.value: float = 0.0
+        self.function: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.function = function
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+    def render(self, name: str, labelnames: Sequence[str],
+               values: LabelValues) -> Iterator[str]:
+        value: float = (self.function() if self.function is not None
+                        else self.value)
+        yield (f'{name}{_format_labels(labelnames, values)} '
+               f'{_format_value(value)}')
+
+
+class Counter(Metric):
+    """Счётчик, который только растёт."""
+
+    kind = 'counter'
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1) -> None:
+        """Увеличивает счётчик без меток."""
+        self._default().inc(amount)
+
+
+class Gauge(Metric):
+    """Значение, которое может расти и уменьшаться."""
+
+    kind = 'gauge'
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def set(self, value: float) -> None:
+        """Устанавливает значение без меток."""
+        self._default().set(value)
+
+    def track(self):
+        """Увеличивает значение на время блока ``with``."""
+        return self._default().track()
+
+
+class _Buckets:
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        self.counts: List[int] = [0] * (len(bounds) + 1)
+        self.sum: float = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index: int = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        started: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def render(self, name: str, labelnames: Sequence[str],
+               values: LabelValues) -> Iterator[str]:
+        names: Tuple[str, ...] = tuple(labelnames) + ('le',)
+        cumulative: int = 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            cumulative += count
+            labels: str = _format_labels(
+                names, tuple(values) + (_format_value(bound),)
+            )
+            yield f'{name}_bucket{labels} {cumulative}'
+        labels = _format_labels(labelnames, values)
+        yield f'{name}_sum{labels} {_format_value(self.sum)}'
+        yield f'{name}_count{labels} {cumulative}'
+
+
+class Histogram(Metric):
+    """Распределение значений по корзинам."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS,
+                 registry: Optional[List[Metric]] = None) -> None:
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> _Buckets:
+        return _Buckets(self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Добавляет наблюдение без меток."""
+        self._default().observe(value)
+
+    def time(self):
+        """Замеряет время выполнения блока ``with``."""
+        return self._default().time()
+
+
+def count_errors(counter: Counter) -> Callable:
+    """Считает исключения функции по имени их класса."""
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except Exception as error:
+                counter.labels(type(error).__name__).inc()
+                raise
+        return wrapper
+    return decorator
+
+
+def timed(histogram: Histogram, label: str) -> Callable:
+    """Замеряет время вызовов функции в ``histogram`` с меткой ``label``.
+
+    Время берётся по ``time.perf_counter``, значение для метки
+    находится один раз при декорировании, поэтому замер стоит
+    две операции со временем и одно добавление в корзину.
+    """
+    def decorator(func: Callable) -> Callable:
+        child: _Buckets = histogram.labels(label)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started: float = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def totals(histogram: Histogram) -> Dict[LabelValues, Tuple[int, float]]:
+    """Возвращает число наблюдений и их сумму по наборам меток."""
+    return {values: (sum(child.counts), child.sum)
+            for values, child in list(histogram._children.items())}
+
+
+def render(registry: Optional[List[Metric]] = None) -> str:
+    """Возвращает все метрики в текстовом формате Prometheus."""
+    selected: List[Metric] = _registry if registry is None else registry
+    return '\n'.join(line for metric in selected
+                     for line in metric.render()) + '\n'
+
+
+@lru_cache(maxsize=None)
+def handler_class() -> Type['BaseHTTPRequestHandler']:
+    """Возвращает обработчик запросов ``/metrics``.
+
+    ``http.server`` импортируется только при запуске сервера метрик.
+    """
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """Отдаёт метрики по адресу ``/metrics``."""
+
+        def do_GET(self) -> None:
+            """Отвечает на запрос метрик."""
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body: bytes = render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            """Не пишет в лог каждый запрос."""
+
+    return MetricsHandler
+
+
+def start_http_server(port: int,
+                      addr: str = METRICS_ADDR) -> 'ThreadingHTTPServer':
+    """Запускает HTTP-сервер метрик в фоновом потоке."""
+    from http.server import ThreadingHTTPServer
+
+    server = ThreadingHTTPServer((addr, port), handler_class())
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True,
+                     name='metrics').start()
+    return server
+
+
+def start_from_env() -> Optional['ThreadingHTTPServer']:
+    """Запускает сервер метрик, если задан METRICS_PORT."""
+    if not METRICS_PORT:
+        return None
+    return start_http_server(int(METRICS_PORT))
+
+
+API_LATENCY = Histogram(
+    'practicum_request_seconds',
+    'Время запроса к API Практикума (get_api_answer).'
+)
+API_IN_FLIGHT = Gauge(
+    'practicum_requests_in_flight',
+    'Запросы к API Практикума, ожидающие ответа.'
+)
+VALIDATION_FAILURES = Counter(
+    'validation_failures_total',
+    'Ошибки проверки ответа API и разбора статуса по классу исключения.',
+    ('exception',)
+)
+FUNCTION_LATENCY = Histogram(
+    'bot_function_seconds',
+    'Время выполнения функций цикла опроса: get_api_answer, '
+    'check_response, parse_status, send_message; в движке под теми же '
+    'метками request_content, payload.validate и отправка из очереди.',
+    ('function',), buckets=FUNCTION_BUCKETS
+)
+SEND_LATENCY = Histogram(
+    'telegram_send_seconds',
+    'Время отправки сообщения в Telegram (send_message).'
+)
+SEND_FAILURES = Counter(
+    'telegram_send_failures_total',
+    'Неудачные отправки сообщений в Telegram.'
+)
+POLL_LAG = Histogram(
+    'poll_lag_seconds',
+    'Опоздание начала опроса относительно запланированного времени.',
+    buckets=LAG_BUCKETS
+)
+STAGE_LATENCY = Histogram(
+    'pipeline_stage_seconds',
+    'Время обработки элемента стадией конвейера.',
+    ('stage',)
+)
+STAGE_DEPTH = Gauge(
+    'pipeline_queue_depth',
+    'Элементы, ожидающие обработки стадией конвейера.',
+    ('stage',)
+)
+ERRORS = Counter(
+    'poll_errors_total',
+    'Ошибки цикла опроса по классу исключения.',
+    ('exception',)
+)
+DIGEST_TRANSITIONS = Counter(
+    'digest_transitions_total',
+    'Уведомления о смене статуса, переданные на отправку.'
+)
+DIGEST_MESSAGES = Counter(
+    'digest_messages_total',
+    'Сообщения, отправленные после объединения уведомлений.'
+)
+DIGEST_REDUCTION = Gauge(
+    'digest_send_reduction_ratio',
+    'Доля отправок, сэкономленных объединением: '
+    '1 - сообщения / уведомления.'
+)
+STATUS_CACHE = Counter(
+    'status_cache_requests_total',
+    'Запросы к кэшу статусов для команд бота: hit, miss или shared.',
+    ('result',)
+)
+
+
+def count_sent(transitions: int) -> None:
+    """Учитывает сообщение, объединившее ``transitions`` уведомлений."""
+    DIGEST_TRANSITIONS.inc(transitions)
+    DIGEST_MESSAGES.inc()
+
+
+def send_reduction() -> float:
+    """Возвращает долю отправок, сэкономленных объединением."""
+    transitions: float = DIGEST_TRANSITIONS.labels().value
+    if not transitions:
+        return 0.0
+    return 1 - DIGEST_MESSAGES.labels().value / transitions
+
+
+DIGEST_REDUCTION.labels().set_function(send_reduction)
@@ -0,0 +1,121 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import metrics
+import state
+
+BATCH: int = int(os.getenv('OUTBOX_BATCH', 100))
+
+ChatId = Union[int, str]
+Send = Callable[[ChatId, str], None]
+Render = Callable[[List[str]], str]
+Key = Tuple[str, str, str, str]
+Group = Tuple[ChatId, List[int], List[str]]
+
+
+def _expired(deadline: Optional[float]) -> bool:
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def _group(rows: List[state.OutboxRow],
+           render: Optional[Render]) -> List[Group]:
+    """Группирует записи по чатам, если уведомления объединяются."""
+    if render is None:
+        return [(chat_id, [row_id], [message])
+                for row_id, chat_id, message in rows]
+    groups: 'OrderedDict[str, Group]' = OrderedDict()
+    for row_id, chat_id, message in rows:
+        group: Group = groups.setdefault(str(chat_id), (chat_id, [], []))
+        group[1].append(row_id)
+        group[2].append(message)
+    return list(groups.values())
+
+
+class Outbox:
+    """Уведомления, ожидающие подтверждения отправки.
+
+    С хранилищем уведомления пишутся в таблицу ``outbox`` в той же
+    транзакции, что и контрольная точка опроса, поэтому после сбоя
+    или перезапуска ни одно уведомление не теряется. Доставка — «хотя
+    бы один раз»: если процесс упал после отправки, но до фиксации
+    отметки о ней, уведомление уйдёт снова. Повтор с теми же чатом,
+    работой, статусом и ``date_updated`` новой записи не создаёт.
+    Без хранилища очередь живёт в памяти процесса.
+    """
+
+    def __init__(self, store: Optional[state.StateStore] = None,
+                 batch: int = BATCH) -> None:
+        self.store = store
+        self.batch = batch
+        self._memory: 'OrderedDict[Key, Tuple[ChatId, str]]' = OrderedDict()
+
+    def add(self, chat_id: ChatId, homework: Dict[str, Union[str, int]],
+            message: str) -> None:
+        """Добавляет уведомление о смене статуса работы."""
+        if self.store is not None:
+            self.store.enqueue(chat_id, homework, message)
+            return
+        key: Key = (str(chat_id), state.homework_key(homework),
+                    str(homework.get('status')),
+                    str(homework.get('date_updated') or ''))
+        self._memory.setdefault(key, (chat_id, message))
+
+    def drain(self, send: Send, deadline: Optional[float] = None,
+              render: Optional[Render] = None) -> int:
+        """Отправляет ожидающие уведомления по порядку.
+
+        Уведомления читаются пачками по ``batch``. Каждое отмечается
+        отправленным сразу после успешной отправки. При ошибке
+        отправка прекращается, исключение пробрасывается, а
+        оставшиеся уведомления ждут следующего вызова. После
+        ``deadline`` (по ``time.monotonic``) новые отправки не
+        начинаются. С ``render`` уведомления пачки объединяются по
+        чатам: чат получает одно сообщение ``render(messages)``, и все
+        его уведомления отмечаются отправленными вместе. Каждая
+        отправка учитывается в ``metrics.count_sent``.
+        Возвращает количество отправленных уведомлений.
+        """
+        if self.store is None:
+            return self._drain_memory(send, deadline, render)
+        sent: int = 0
+        after: int = 0
+        while True:
+            rows: List[state.OutboxRow] = self.store.pending_outbox(
+                self.batch, after
+            )
+            for chat_id, ids, messages in _group(rows, render):
+                if _expired(deadline):
+                    return sent
+                send(chat_id, messages[0] if render is None
+                     else render(messages))
+                self.store.mark_delivered(ids)
+                self.store.flush()
+                metrics.count_sent(len(ids))
+                sent += len(ids)
+            if rows:
+                after = rows[-1][0]
+            if len(rows) < self.batch:
+                return sent
+
+    def _drain_memory(self, send: Send, deadline: Optional[float],
+                      render: Optional[Render]) -> int:
+        sent: int = 0
+        while self._memory and not _expired(deadline):
+            if render is None:
+                key, (chat_id, message) = next(iter(self._memory.items()))
+                send(chat_id, message)
+                del self._memory[key]
+                metrics.count_sent(1)
+                sent += 1
+                continue
+            chat_id = next(iter(self._memory.values()))[0]
+            keys: List[Key] = [key for key, (chat, _) in self._memory.items()
+                               if chat == chat_id]
+            send(chat_id, render([self._memory[key][1] for key in keys]))
+            for key in keys:
+                del self._memory[key]
+            metrics.count_sent(len(keys))
+            sent += len(keys)
+        return sent
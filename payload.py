@@ -0,0 +1,195 @@
+import re
+import json
+import codecs
+import hashlib
+from typing import (Any, Callable, Dict, FrozenSet, Iterable, Iterator, List,
+                    Optional, Tuple, Union)
+
+import exceptions
+import homework
+import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CURRENT_DATE = re.compile(rb'"current_date"\s*:\s*(\d+)')
+WHITESPACE = re.compile(r'\s*')
+DECODER = json.JSONDecoder()
+
+Response = Dict[str, Union[int, List]]
+
+
+def decode(content: bytes) -> Any:
+    """Разбирает JSON быстрым декодером, если он установлен.
+
+    Без ``orjson`` используется стандартный ``json``.
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def fingerprint(content: bytes) -> Tuple[bytes, Optional[int]]:
+    """Возвращает хэш ответа без ``current_date`` и само ``current_date``.
+
+    ``current_date`` меняется при каждом запросе, поэтому в хэш не
+    входит: одинаковый хэш означает, что список работ не изменился.
+    Ключ ищется с конца ответа, где его ставит API, а не регулярным
+    выражением по всему телу.
+    """
+    digest = hashlib.sha256()
+    position: int = content.rfind(b'"current_date"')
+    match = CURRENT_DATE.match(content, position) if position >= 0 else None
+    if match is None:
+        digest.update(content)
+        return digest.digest(), None
+    view = memoryview(content)
+    digest.update(view[:match.start()])
+    digest.update(view[match.end():])
+    return digest.digest(), int(match.group(1))
+
+
+def compile_validator(verdicts: Iterable[str]) -> Callable[[Any], None]:
+    """Собирает проверку ответа API за один проход.
+
+    Проверяет то же, что ``check_response``, и заодно для каждой
+    работы то, что ``parse_status``: известный статус и название.
+    Работа с неизвестным статусом никогда не отмечается в индексе
+    статусов и всё равно вызвала бы ошибку при разборе, поэтому
+    проверка всего списка сразу не меняет поведение.
+    """
+    known: FrozenSet[str] = frozenset(verdicts)
+
+    @metrics.count_errors(metrics.VALIDATION_FAILURES)
+    def validate(response: Any) -> None:
+        if type(response) is not dict:
+            raise TypeError('Структура ответа API не соответствует '
+                            'ожиданиям.')
+        homeworks: Any = response.get('homeworks')
+        if homeworks is None or response.get('current_date') is None:
+            raise exceptions.NoExpendKeysResponse('В ответе API нет '
+                                                  'необходимых данных.')
+        if type(homeworks) is not list:
+            raise TypeError('В ответе API домашней работы под ключом '
+                            '"homeworks" данные приходят не в виде списка.')
+        for item in homeworks:
+            if type(item) is not dict:
+                raise TypeError('Работа в ответе API не является словарём.')
+            status: Any = item.get('status')
+            if status not in known:
+                raise exceptions.UnknownStatus('Получен неизвестный статус '
+                                               f'домашней работы: {status}.')
+            if item.get('homework_name') is None:
+                raise exceptions.MissingHomeworkName('Не передано название '
+                                                     'домашки.')
+
+    return validate
+
+
+validate: Callable[[Any], None] = metrics.timed(
+    metrics.FUNCTION_LATENCY, 'check_response'
+)(compile_validator(homework.HOMEWORK_VERDICTS))
+
+
+def parse(content: bytes) -> Response:
+    """Разбирает и проверяет ответ API."""
+    response: Response = decode(content)
+    validate(response)
+    return response
+
+
+class HomeworkStream:
+    """Разбирает ответ API по частям, не собирая список работ целиком.
+
+    Итерация по объекту отдаёт работы из ``homeworks`` по одной,
+    по мере поступления частей ответа. В памяти держится только
+    неразобранный хвост и текущая работа. Остальные ключи ответа
+    попадают в ``envelope``, ``homeworks`` там — пустой список,
+    поэтому после итерации ``envelope`` можно проверить
+    ``check_response``.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self.envelope: Dict[str, Any] = {}
+        self._chunks: Iterator[bytes] = iter(chunks)
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buffer: str = ''
+        self._position: int = 0
+        self._finished: bool = False
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._peek() != '{':
+            raise TypeError('Структура ответа API не соответствует '
+                            'ожиданиям.')
+        self._position += 1
+        if self._peek() == '}':
+            self._position += 1
+            return
+        while True:
+            key: Any = self._value()
+            self._expect(':')
+            if key == 'homeworks' and self._peek() == '[':
+                self._position += 1
+                self.envelope[key] = []
+                yield from self._items()
+            else:
+                self.envelope[key] = self._value()
+            if self._expect(',}') == '}':
+                return
+
+    def _items(self) -> Iterator[Any]:
+        if self._peek() == ']':
+            self._position += 1
+            return
+        while True:
+            yield self._value()
+            if self._expect(',]') == ']':
+                return
+
+    def _more(self) -> bool:
+        """Дочитывает следующую часть ответа, отбросив разобранное."""
+        text: str = ''
+        while not text and not self._finished:
+            chunk: Optional[bytes] = next(self._chunks, None)
+            if chunk is None:
+                self._finished = True
+                text = self._text.decode(b'', final=True)
+            else:
+                text = self._text.decode(chunk)
+        self._buffer = self._buffer[self._position:] + text
+        self._position = 0
+        return bool(text)
+
+    def _peek(self) -> str:
+        while True:
+            self._position = WHITESPACE.match(self._buffer,
+                                              self._position).end()
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._more():
+                return ''
+
+    def _expect(self, allowed: str) -> str:
+        char: str = self._peek()
+        if not char or char not in allowed:
+            raise json.JSONDecodeError(f'Ожидался один из символов '
+                                       f'{allowed!r}', self._buffer,
+                                       self._position)
+        self._position += 1
+        return char
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                if self._more():
+                    continue
+                raise
+            if end == len(self._buffer) and self._more():
+                continue
+            self._position = end
+            return value
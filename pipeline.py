@@ -0,0 +1,121 @@
+import time
+import asyncio
+from typing import (Any, Awaitable, Callable, Dict, Iterable, List,
+                    NoReturn, Optional)
+
+import metrics
+
+Handler = Callable[[Any], Awaitable[Iterable[Any]]]
+ErrorHandler = Callable[[str, Any, Exception], None]
+
+
+class Stage:
+    """Стадия конвейера: ограниченная очередь и пул обработчиков.
+
+    Обработчик получает элемент и возвращает элементы для следующей
+    стадии. Если очередь следующей стадии заполнена, обработчики
+    этой стадии ждут, и давление передаётся назад по конвейеру.
+    """
+
+    def __init__(self, name: str, handler: Handler, workers: int = 1,
+                 maxsize: int = 0) -> None:
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.processed: int = 0
+        self.failed: int = 0
+        self.started_at: Optional[float] = None
+
+    @property
+    def depth(self) -> int:
+        """Количество элементов, ожидающих обработки."""
+        return self.queue.qsize()
+
+    def throughput(self, now: Optional[float] = None) -> float:
+        """Среднее число обработанных элементов в секунду."""
+        if self.started_at is None:
+            return 0.0
+        elapsed: float = (now or time.monotonic()) - self.started_at
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+
+class Pipeline:
+    """Цепочка стадий, соединённых ограниченными очередями.
+
+    Ошибка обработки элемента не останавливает стадию: она
+    передаётся в ``on_error`` вместе с именем стадии и элементом.
+    """
+
+    def __init__(self, stages: List[Stage],
+                 on_error: Optional[ErrorHandler] = None) -> None:
+        self.stages = stages
+        self.on_error = on_error
+        self._tasks: List[asyncio.Task] = []
+        for stage in stages:
+            metrics.STAGE_DEPTH.labels(stage.name).set_function(
+                lambda stage=stage: stage.depth
+            )
+
+    def start(self) -> None:
+        """Запускает обработчики всех стадий."""
+        if self._tasks:
+            return
+        now: float = time.monotonic()
+        for index, stage in enumerate(self.stages):
+            stage.started_at = now
+            following: Optional[Stage] = (
+                self.stages[index + 1] if index + 1 < len(self.stages)
+                else None
+            )
+            self._tasks.extend(
+                asyncio.create_task(self._work(stage, following))
+                for _ in range(stage.workers)
+            )
+
+    async def put(self, item: Any) -> None:
+        """Передаёт элемент в первую стадию, ожидая места в очереди."""
+        self.start()
+        await self.stages[0].queue.put(item)
+
+    async def join(self) -> None:
+        """Ждёт, пока все переданные элементы пройдут конвейер."""
+        for stage in self.stages:
+            await stage.queue.join()
+
+    async def stop(self) -> None:
+        """Останавливает обработчики."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Возвращает глубину очереди и производительность стадий."""
+        now: float = time.monotonic()
+        return {stage.name: {'depth': stage.depth,
+                             'processed': stage.processed,
+                             'failed': stage.failed,
+                             'throughput': stage.throughput(now)}
+                for stage in self.stages}
+
+    async def _work(self, stage: Stage,
+                    following: Optional[Stage]) -> NoReturn:
+        latency = metrics.STAGE_LATENCY.labels(stage.name)
+        while True:
+            item: Any = await stage.queue.get()
+            started: float = time.perf_counter()
+            try:
+                results: Iterable[Any] = await stage.handler(item)
+            except Exception as error:
+                stage.failed += 1
+                if self.on_error is not None:
+                    self.on_error(stage.name, item, error)
+            else:
+                stage.processed += 1
+                latency.observe(time.perf_counter() - started)
+                if following is not None:
+                    for result in results:
+                        await following.queue.put(result)
+            finally:
+                stage.queue.task_done()
@@ -0,0 +1,126 @@
+"""Проверка токенов и настроек перед запуском бота.
+
+Запуск:
+    python homework.py --check
+
+Проверка не импортирует ``telegram`` и не делает сетевых запросов.
+Код возврата 0, если всё в порядке, и 1, если найдены ошибки.
+"""
+import os
+import re
+import sys
+import json
+import importlib
+from typing import List, Optional
+
+CONFIG_MODULES = ('homework', 'http_client', 'state', 'intervals',
+                  'breaker', 'delivery', 'metrics', 'logs', 'engine',
+                  'sharding', 'export', 'analytics',
+                  'profiling', 'alerts', 'digest', 'replay')
+TELEGRAM_TOKEN = re.compile(r'^\d+:[\w-]+$')
+CHAT_ID = re.compile(r'^(-?\d+|@\w+)$')
+
+
+def check_modules() -> List[str]:
+    """Импортирует модули, читающие настройки из окружения."""
+    problems: List[str] = []
+    for name in CONFIG_MODULES:
+        try:
+            importlib.import_module(name)
+        except ValueError as error:
+            problems.append(f'{name}: некорректное значение настройки: '
+                            f'{error}')
+    return problems
+
+
+def check_tokens() -> List[str]:
+    """Проверяет наличие и формат токенов и чата."""
+    import homework
+
+    problems: List[str] = [
+        f'Не задана переменная окружения {name}.'
+        for name in ('PRACTICUM_TOKEN', 'TELEGRAM_TOKEN', 'TELEGRAM_CHAT_ID')
+        if not getattr(homework, name)
+    ]
+    if (homework.TELEGRAM_TOKEN
+            and not TELEGRAM_TOKEN.match(homework.TELEGRAM_TOKEN)):
+        problems.append('TELEGRAM_TOKEN должен иметь вид <число>:<строка>.')
+    if (homework.TELEGRAM_CHAT_ID
+            and not CHAT_ID.match(str(homework.TELEGRAM_CHAT_ID))):
+        problems.append('TELEGRAM_CHAT_ID должен быть числом или @каналом.')
+    return problems
+
+
+def check_writable(setting: str, path: Optional[str]) -> List[str]:
+    """Проверяет, что файл из настройки ``setting`` можно создать."""
+    if not path:
+        return []
+    directory: str = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(directory):
+        return [f'{setting}: нет каталога {directory}.']
+    if not os.access(path if os.path.exists(path) else directory, os.W_OK):
+        return [f'{setting}: нет прав на запись в {path}.']
+    return []
+
+
+def check_state_db(path: Optional[str]) -> List[str]:
+    """Проверяет, что файл состояния можно создать или открыть."""
+    return check_writable('STATE_DB', path)
+
+
+def check_tenants_file(path: Optional[str]) -> List[str]:
+    """Проверяет, что файл пользователей — список с токеном и чатом."""
+    if not path:
+        return []
+    try:
+        with open(path, encoding='utf-8') as file:
+            records = json.load(file)
+    except (OSError, ValueError) as error:
+        return [f'TENANTS_FILE: не удалось прочитать {path}: {error}']
+    if not isinstance(records, list):
+        return ['TENANTS_FILE: ожидается список пользователей.']
+    return [f'TENANTS_FILE: у записи {index} нет practicum_token или chat_id.'
+            for index, record in enumerate(records)
+            if not (isinstance(record, dict) and record.get('practicum_token')
+                    and record.get('chat_id') is not None)]
+
+
+def check_metrics_port(port: Optional[str]) -> List[str]:
+    """Проверяет номер порта сервера метрик."""
+    if not port:
+        return []
+    if not port.isdigit() or not 0 < int(port) < 65536:
+        return [f'METRICS_PORT: некорректный порт {port}.']
+    return []
+
+
+def run_checks() -> List[str]:
+    """Выполняет все проверки и возвращает найденные ошибки."""
+    problems: List[str] = check_modules()
+    if problems:
+        return problems
+    import engine
+    import metrics
+    import replay
+    import state
+
+    return (check_tokens()
+            + check_state_db(state.STATE_DB)
+            + check_writable('RECORD_CASSETTE', replay.RECORD_CASSETTE)
+            + check_tenants_file(engine.TENANTS_FILE)
+            + check_metrics_port(metrics.METRICS_PORT))
+
+
+def main() -> int:
+    """Печатает результат проверки и возвращает код выхода."""
+    problems: List[str] = run_checks()
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    if problems:
+        return 1
+    print('Настройки в порядке.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+import os
+import sys
+import time
+import signal
+import cProfile
+import threading
+from collections import Counter
+from types import FrameType
+from typing import Dict, List, Optional, Union
+
+import homework
+import metrics
+
+PROFILE_SIGNAL: str = os.getenv('PROFILE_SIGNAL', 'SIGUSR1')
+PROFILE_SECONDS: float = float(os.getenv('PROFILE_SECONDS', 30))
+PROFILE_MODE: str = os.getenv('PROFILE_MODE', 'sample')
+PROFILE_DIR: str = os.getenv('PROFILE_DIR', '.')
+SAMPLE_INTERVAL: float = float(os.getenv('PROFILE_SAMPLE_INTERVAL', 0.005))
+MODES = ('sample', 'cprofile')
+
+if PROFILE_MODE not in MODES:
+    raise ValueError(f'PROFILE_MODE должен быть одним из {MODES}, '
+                     f'получено {PROFILE_MODE!r}.')
+
+logger = homework.logger.getChild('profiling')
+
+
+def collapse(thread: str, frame: Optional[FrameType]) -> str:
+    """Сворачивает стек в строку ``поток;файл:функция;...`` от корня."""
+    frames: List[str] = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+        frame = frame.f_back
+    return ';'.join([thread, *reversed(frames)])
+
+
+class Sampler:
+    """Снимает стеки всех потоков раз в ``interval`` секунд.
+
+    Работает в отдельном потоке и не замедляет остальные, пока
+    не снимает стек. Результат — свёрнутые стеки (collapsed stacks)
+    с числом попаданий, их читают flamegraph.pl и speedscope.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL) -> None:
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='profiling')
+
+    def start(self) -> None:
+        """Запускает сбор стеков."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Останавливает сбор и ждёт поток."""
+        self._stopped.set()
+        self._thread.join()
+
+    def sample(self) -> None:
+        """Снимает по одному стеку с каждого потока, кроме своего."""
+        names: Dict[int, str] = {thread.ident: thread.name
+                                 for thread in threading.enumerate()}
+        own: int = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident != own:
+                self.stacks[collapse(names.get(ident, str(ident)),
+                                     frame)] += 1
+
+    def dump(self, path: str) -> None:
+        """Пишет свёрнутые стеки в файл."""
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+
+Capture = Union[Sampler, cProfile.Profile]
+
+
+class Profiler:
+    """Включает и выключает профилирование по сигналу.
+
+    Пока съёмка не идёт, профилировщик ничего не стоит: нет ни
+    потока, ни хука трассировки. В режиме ``sample`` стеки всех
+    потоков снимает ``Sampler``, результат — файл ``.collapsed``.
+    В режиме ``cprofile`` профилируется главный поток (цикл опроса),
+    результат — файл ``.pstats`` для ``pstats`` и snakeviz.
+    Съёмка останавливается повторным сигналом или через ``seconds``
+    секунд по ``SIGALRM``. Сигналы обрабатываются в главном потоке,
+    поэтому состояние не требует блокировок.
+    """
+
+    def __init__(self, mode: str = PROFILE_MODE,
+                 seconds: float = PROFILE_SECONDS,
+                 directory: str = PROFILE_DIR,
+                 interval: float = SAMPLE_INTERVAL) -> None:
+        self.mode = mode
+        self.seconds = seconds
+        self.directory = directory
+        self.interval = interval
+        self.capture: Optional[Capture] = None
+        self.started_at: float = 0.0
+
+    @property
+    def running(self) -> bool:
+        """Идёт ли съёмка."""
+        return self.capture is not None
+
+    def start(self) -> None:
+        """Начинает съёмку; вызывается из главного потока."""
+        if self.running:
+            return
+        if self.mode == 'cprofile':
+            self.capture = cProfile.Profile()
+            self.capture.enable()
+        else:
+            self.capture = Sampler(self.interval)
+            self.capture.start()
+        self.started_at = time.time()
+        if self.seconds > 0:
+            signal.signal(signal.SIGALRM, self._on_alarm)
+            signal.setitimer(signal.ITIMER_REAL, self.seconds)
+        logger.info('Профилирование (%s) запущено на %.0f с.',
+                    self.mode, self.seconds)
+
+    def stop(self) -> Optional[str]:
+        """Заканчивает съёмку и возвращает путь к файлу с результатом."""
+        if not self.running:
+            return None
+        capture: Capture = self.capture
+        self.capture = None
+        if self.seconds > 0:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        if isinstance(capture, cProfile.Profile):
+            capture.disable()
+            path: str = self._path('pstats')
+            capture.dump_stats(path)
+        else:
+            capture.stop()
+            path = self._path('collapsed')
+            capture.dump(path)
+        logger.info('Профилирование остановлено через %.1f с, '
+                    'результат: %s.', time.time() - self.started_at, path)
+        log_functions()
+        return path
+
+    def toggle(self) -> Optional[str]:
+        """Запускает съёмку или останавливает идущую."""
+        if self.running:
+            return self.stop()
+        self.start()
+        return None
+
+    def install(self, name: str = PROFILE_SIGNAL) -> bool:
+        """Назначает переключение на сигнал ``name``.
+
+        Возвращает ``False``, если такого сигнала на платформе нет
+        или вызов не из главного потока.
+        """
+        signum: Optional[signal.Signals] = getattr(signal, name, None)
+        if (signum is None or not hasattr(signal, 'setitimer')
+                or threading.current_thread() is not threading.main_thread()):
+            return False
+        signal.signal(signum, lambda *args: self.toggle())
+        return True
+
+    def _on_alarm(self, signum: int, frame: Optional[FrameType]) -> None:
+        self.stop()
+
+    def _path(self, extension: str) -> str:
+        moment: str = time.strftime('%Y%m%d-%H%M%S',
+                                    time.localtime(self.started_at))
+        return os.path.join(self.directory,
+                            f'profile-{os.getpid()}-{moment}.{extension}')
+
+
+def log_functions() -> None:
+    """Пишет в лог число вызовов и среднее время функций цикла опроса."""
+    for (name,), (count, total) in sorted(
+        metrics.totals(metrics.FUNCTION_LATENCY).items()
+    ):
+        if count:
+            logger.info('Функция %s: вызовов %d, в среднем %.2f мс.',
+                        name, count, total / count * 1000)
+
+
+def install_from_env() -> Optional[Profiler]:
+    """Назначает профилирование на PROFILE_SIGNAL, если он есть."""
+    profiler = Profiler()
+    if not profiler.install():
+        return None
+    logger.debug('Профилирование включается сигналом %s.', PROFILE_SIGNAL)
+    return profiler
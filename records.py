@@ -0,0 +1,110 @@
+import enum
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Union
+
+import homework
+import state
+import transitions
+
+
+class _Status(str, enum.Enum):
+    def __str__(self) -> str:
+        return str.__str__(self)
+
+    __format__ = str.__format__
+
+
+Status = _Status('Status', {status: status
+                            for status in homework.HOMEWORK_VERDICTS},
+                 module=__name__, qualname='Status')
+Status.__doc__ = '''Известные статусы работ, по одному объекту на статус.
+
+Члены перечисления — строки и называются так же, как статусы
+(``Status.approved == 'approved'``), поэтому их можно искать
+в ``HOMEWORK_VERDICTS`` и записывать в базу как обычные строки.
+'''
+
+_STATUSES: Dict[str, Status] = {status.value: status for status in Status}
+
+
+def intern_status(status: Optional[str]) -> Optional[Union[Status, str]]:
+    """Заменяет известный статус общим объектом ``Status``.
+
+    Неизвестный статус возвращается как есть: ``parse_status``
+    должен по-прежнему сообщить о нём.
+    """
+    return _STATUSES.get(status, status)
+
+
+def intern_statuses(statuses: Dict[str, str]
+                    ) -> Dict[str, Union[Status, str]]:
+    """Заменяет статусы работ из хранилища общими объектами."""
+    return {key: intern_status(status) for key, status in statuses.items()}
+
+
+class Homework(NamedTuple):
+    """Неизменяемая запись о работе вместо словаря из ответа API.
+
+    Поддерживает ``get`` и ``[]``, как словарь, поэтому её принимают
+    ``parse_status``, ``homework_key`` и остальные функции,
+    работающие с ответом API.
+    """
+
+    id: Optional[int] = None
+    homework_name: Optional[str] = None
+    status: Optional[Union[Status, str]] = None
+    date_updated: Optional[str] = None
+    lesson_name: Optional[str] = None
+    reviewer_comment: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Union['Homework', Dict[str, Any]]
+                  ) -> 'Homework':
+        """Создаёт запись из словаря ответа API, лишние ключи отбрасывает."""
+        if isinstance(data, cls):
+            return data
+        return cls(data.get('id'), data.get('homework_name'),
+                   intern_status(data.get('status')),
+                   data.get('date_updated'), data.get('lesson_name'),
+                   data.get('reviewer_comment'))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Возвращает поле по имени, как ``dict.get``."""
+        if key not in self._fields:
+            return default
+        value: Any = getattr(self, key)
+        return default if value is None else value
+
+    def __getitem__(self, key: Union[int, str]) -> Any:
+        if isinstance(key, int):
+            return tuple.__getitem__(self, key)
+        value: Any = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+
+class Transition(NamedTuple):
+    """Смена статуса работы: прежний статус и новый."""
+
+    homework: Homework
+    previous: Optional[Union[Status, str]]
+    status: Optional[Union[Status, str]]
+
+
+def find_transitions(tracker: transitions.TransitionTracker,
+                     homeworks: Iterable[Dict[str, Any]]
+                     ) -> List[Transition]:
+    """Возвращает смены статусов работ от старых к новым.
+
+    Записи ``Homework`` создаются только для изменившихся работ,
+    их статусы — общие объекты ``Status``; после ``tracker.mark``
+    индекс пользователя хранит именно их.
+    """
+    found: List[Transition] = []
+    for item in tracker.changes(homeworks):
+        record: Homework = Homework.from_dict(item)
+        found.append(Transition(
+            record, tracker.statuses.get(state.homework_key(record)),
+            record.status
+        ))
+    return found
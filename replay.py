@@ -0,0 +1,435 @@
+import os
+import sys
+import json
+import time
+import bisect
+import random
+import asyncio
+import argparse
+import selectors
+import threading
+from concurrent.futures import Executor
+from http import HTTPStatus
+from typing import (TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator,
+                    List, NamedTuple, Optional, TextIO, Tuple, Union)
+
+import homework
+import http_client
+import logs
+import state
+
+if TYPE_CHECKING:
+    import requests
+
+    import engine
+
+RECORD_CASSETTE: Optional[str] = os.getenv('RECORD_CASSETTE')
+DAY: int = 24 * 60 * 60
+RESOLUTION: float = 1e-6
+
+logger = homework.logger.getChild('replay')
+
+ChatId = Union[int, str]
+Message = Tuple[float, ChatId, str]
+
+
+def token_of(headers: Optional[Dict[str, str]]) -> str:
+    """Достаёт токен из заголовка ``Authorization: OAuth <токен>``."""
+    return ((headers or {}).get('Authorization') or '').split(' ')[-1]
+
+
+class VirtualClock:
+    """Часы, которые идут только по ``sleep``.
+
+    ``time`` и ``monotonic`` возвращают одно и то же значение:
+    время начала записи плюс всё, что «проспали».
+    """
+
+    def __init__(self, start: float = 0.0) -> None:
+        self.now = start
+
+    def time(self) -> float:
+        """Текущее виртуальное время в секундах Unix."""
+        return self.now
+
+    monotonic = time
+
+    def sleep(self, seconds: float) -> None:
+        """Переводит часы вперёд, не дожидаясь."""
+        self.now += max(seconds, 0.0)
+
+
+class VirtualSelector(selectors.DefaultSelector):
+    """Селектор, который вместо ожидания переводит часы ``clock``.
+
+    Готовые события забираются без ожидания. Если их нет, часы
+    переводятся на весь таймаут: цикл событий сразу переходит
+    к ближайшему таймеру.
+    """
+
+    def __init__(self, clock: VirtualClock) -> None:
+        super().__init__()
+        self.clock = clock
+
+    def select(self, timeout: Optional[float] = None) -> List:
+        """Возвращает готовые события, не блокируясь."""
+        events: List = super().select(0)
+        if events or timeout == 0:
+            return events
+        if timeout is None:
+            raise RuntimeError('Цикл событий ждёт без таймеров: '
+                               'в виртуальном времени он не проснётся.')
+        self.clock.sleep(timeout)
+        return events
+
+
+class VirtualEventLoop(asyncio.SelectorEventLoop):
+    """Цикл событий в виртуальном времени.
+
+    ``asyncio.sleep``, ``wait_for`` и таймеры отсчитываются по
+    ``clock``, поэтому месяц опроса проходит за время обработки
+    ответов. Ответов настоящих потоков такой цикл не ждёт, поэтому
+    ``run_in_executor`` выполняет функцию сразу, в потоке цикла.
+    """
+
+    def __init__(self, clock: VirtualClock) -> None:
+        super().__init__(VirtualSelector(clock))
+        self.clock = clock
+        # Время цикла — секунды Unix: на таких числах наносекундное
+        # разрешение монотонных часов теряется при сложении, и таймер,
+        # на который перевели часы, не считался бы наступившим.
+        self._clock_resolution = RESOLUTION
+
+    def time(self) -> float:
+        """Виртуальное время цикла."""
+        return self.clock.monotonic()
+
+    def run_in_executor(self, executor: Optional[Executor], func: Callable,
+                        *args: Any) -> asyncio.Future:
+        """Выполняет ``func`` сразу и возвращает готовый ``Future``."""
+        future: asyncio.Future = self.create_future()
+        try:
+            future.set_result(func(*args))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+
+class Response:
+    """Ответ из кассеты с нужной боту частью ``requests.Response``."""
+
+    def __init__(self, status_code: int, content: bytes) -> None:
+        self.status_code = status_code
+        self.content = content
+
+    def json(self) -> Any:
+        """Разбирает тело ответа."""
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size: int = 1) -> Iterator[bytes]:
+        """Отдаёт тело ответа частями по ``chunk_size`` байт."""
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self) -> None:
+        """Ничего не делает: соединения нет."""
+
+
+class Recorder:
+    """Транспорт, который пишет ответы API в кассету JSONL.
+
+    Каждая строка — ответ на один запрос: время, ключ пользователя
+    (``state.tenant_key``, не токен), ``from_date``, код и тело
+    ответа. Потоковые запросы (``stream=True``) не записываются.
+    """
+
+    def __init__(self, session: 'requests.Session', path: str,
+                 clock: Callable[[], float] = time.time) -> None:
+        self.session = session
+        self.clock = clock
+        self._file: TextIO = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None,
+            params: Optional[Dict[str, int]] = None, stream: bool = False,
+            **kwargs: Any) -> 'requests.Response':
+        """Выполняет запрос и записывает ответ."""
+        response = self.session.get(url, headers=headers, params=params,
+                                    stream=stream, **kwargs)
+        if not stream:
+            self.write(state.tenant_key(token_of(headers)),
+                       (params or {}).get('from_date', 0),
+                       response.status_code, response.content)
+        return response
+
+    def write(self, tenant: str, from_date: int, status_code: int,
+              content: bytes) -> None:
+        """Добавляет ответ в кассету."""
+        line: str = json.dumps({
+            'at': self.clock(), 'tenant': tenant, 'from_date': from_date,
+            'status': status_code,
+            'body': content.decode('utf-8', errors='replace'),
+        }, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self) -> None:
+        """Закрывает кассету и сессию."""
+        with self._lock:
+            self._file.close()
+        self.session.close()
+
+
+def record_from_env() -> Optional[Recorder]:
+    """Включает запись ответов API, если задан RECORD_CASSETTE."""
+    if not RECORD_CASSETTE:
+        return None
+    recorder = Recorder(http_client.get_session(), RECORD_CASSETTE)
+    http_client.install(recorder)
+    logger.info('Ответы API записываются в %s.', RECORD_CASSETTE)
+    return recorder
+
+
+class Cassette:
+    """Записанные ответы API по пользователям в порядке времени.
+
+    Записанный ответ содержит только работы, изменившиеся после
+    ``from_date`` того запроса, поэтому проигрывать его как есть можно
+    только с интервалом записи. ``response`` отвечает за окно:
+    работы всех успешных ответов, записанных после уже отданного
+    и не позже момента запроса, с последним статусом каждой работы.
+    Так переход не теряется, даже если опрос при воспроизведении
+    реже, чем при записи. Долю отданных записей считает ``Player``.
+    """
+
+    def __init__(self, entries: Iterable[Dict[str, Any]]) -> None:
+        self.times: Dict[str, List[float]] = {}
+        self.responses: Dict[str, List[Tuple[int, bytes]]] = {}
+        for entry in sorted(entries, key=lambda entry: entry['at']):
+            self.times.setdefault(entry['tenant'], []).append(entry['at'])
+            self.responses.setdefault(entry['tenant'], []).append(
+                (entry['status'], entry['body'].encode())
+            )
+
+    @classmethod
+    def load(cls, path: str) -> 'Cassette':
+        """Читает кассету из файла JSONL."""
+        with open(path, encoding='utf-8') as file:
+            return cls(json.loads(line) for line in file if line.strip())
+
+    @property
+    def tenants(self) -> List[str]:
+        """Ключи записанных пользователей."""
+        return list(self.times)
+
+    @property
+    def start(self) -> float:
+        """Время первой записи."""
+        return min((times[0] for times in self.times.values()), default=0.0)
+
+    @property
+    def end(self) -> float:
+        """Время последней записи."""
+        return max((times[-1] for times in self.times.values()),
+                   default=0.0)
+
+    def count(self, until: float) -> int:
+        """Количество записей не позже ``until``."""
+        return sum(bisect.bisect_right(times, until)
+                   for times in self.times.values())
+
+    def position(self, tenant: str, at: float) -> int:
+        """Номер последней записи не позже ``at`` (до первой — 0)."""
+        return max(bisect.bisect_right(self.times[tenant], at) - 1, 0)
+
+    def response(self, tenant: str, at: float,
+                 after: int = -1) -> Tuple[Response, int]:
+        """Возвращает ответ пользователю ``tenant`` в момент ``at``.
+
+        ``after`` — номер последней уже отданной успешной записи.
+        Возвращает ответ и номер записи, которой он соответствует.
+        Ответ с ошибкой отдаётся как есть.
+        """
+        if tenant not in self.times:
+            return Response(HTTPStatus.UNAUTHORIZED, b'{}'), -1
+        position: int = self.position(tenant, at)
+        responses: List[Tuple[int, bytes]] = self.responses[tenant]
+        status, content = responses[position]
+        if status != HTTPStatus.OK or position - after <= 1:
+            return Response(status, content), position
+        merged: Dict[str, Dict[str, Any]] = {}
+        for earlier, body in responses[after + 1:position]:
+            if earlier == HTTPStatus.OK:
+                for item in json.loads(body).get('homeworks') or []:
+                    merged.pop(state.homework_key(item), None)
+                    merged[state.homework_key(item)] = item
+        data: Dict[str, Any] = json.loads(content)
+        for item in data.get('homeworks') or []:
+            merged.pop(state.homework_key(item), None)
+            merged[state.homework_key(item)] = item
+        # API отдаёт работы от последней изменённой к первой.
+        data['homeworks'] = list(reversed(merged.values()))
+        return Response(status, json.dumps(data).encode()), position
+
+
+class Player:
+    """Транспорт, который отвечает из кассеты по часам ``clock``.
+
+    Пользователь ищется по ключу токена, а если токен сам есть
+    в кассете — по токену: так кассету можно проиграть, не зная
+    настоящих токенов. ``served`` — отданные записи: каждая попадает
+    в ответ один раз, ``coverage`` показывает их долю.
+    """
+
+    def __init__(self, cassette: Cassette,
+                 clock: Callable[[], float]) -> None:
+        self.cassette = cassette
+        self.clock = clock
+        self.requests: int = 0
+        self.served: int = 0
+        self._after: Dict[str, int] = {}
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None,
+            **kwargs: Any) -> Response:
+        """Возвращает записанный ответ."""
+        token: str = token_of(headers)
+        if token not in self.cassette.times:
+            token = state.tenant_key(token)
+        self.requests += 1
+        after: int = self._after.get(token, -1)
+        response, position = self.cassette.response(
+            token, self.clock(), after
+        )
+        if response.status_code == HTTPStatus.OK and position > after:
+            self._after[token] = position
+            self.served += position - after
+        return response
+
+    def coverage(self, until: float) -> float:
+        """Доля записей не позже ``until``, попавших в ответы."""
+        recorded: int = self.cassette.count(until)
+        return self.served / recorded if recorded else 1.0
+
+    def close(self) -> None:
+        """Ничего не делает: соединений нет."""
+
+
+class Inbox:
+    """Бот, который складывает сообщения вместо отправки в Telegram."""
+
+    def __init__(self, clock: Callable[[], float]) -> None:
+        self.clock = clock
+        self.messages: List[Message] = []
+
+    def send_message(self, chat_id: ChatId, text: str,
+                     **kwargs: Any) -> None:
+        """Запоминает сообщение и время отправки."""
+        self.messages.append((self.clock(), chat_id, text))
+
+
+class Report(NamedTuple):
+    """Итог воспроизведения."""
+
+    polls: int
+    requests: int
+    messages: List[Message]
+    simulated: float
+    wall: float
+    coverage: float
+
+
+def replay(cassette: Cassette,
+           tenants: Optional[List['engine.Tenant']] = None,
+           until: Optional[float] = None,
+           store: Optional[state.StateStore] = None, seed: int = 0,
+           retry_period: int = homework.RETRY_PERIOD) -> Report:
+    """Прогоняет ``PollingEngine`` по кассете в виртуальном времени.
+
+    Время идёт от первой записи до ``until`` (по умолчанию — до
+    последней записи). По умолчанию опрашиваются все пользователи
+    кассеты, чатом служит ключ пользователя. ``seed`` фиксирует
+    разброс интервалов, поэтому одинаковые прогоны дают одинаковые
+    сообщения в одинаковое время. Виртуальные часы получает только
+    движок: ``homework.main`` спит через ``time.sleep``, поэтому его
+    кассеты проигрываются через ``PollingEngine``.
+    """
+    import commands
+    import engine
+
+    clock = VirtualClock(cassette.start)
+    if tenants is None:
+        tenants = [engine.Tenant(token=key, chat_id=key,
+                                 from_date=int(cassette.start))
+                   for key in cassette.tenants]
+    player = Player(cassette, clock.time)
+    inbox = Inbox(clock.time)
+    previous = http_client.install(player)
+    listen: bool = commands.BOT_COMMANDS
+    commands.BOT_COMMANDS = False
+    random.seed(seed)
+    loop = VirtualEventLoop(clock)
+    polling = engine.PollingEngine(inbox, tenants, retry_period=retry_period,
+                                   store=store, clock=clock.monotonic)
+    wall: float = time.perf_counter()
+    if until is None:
+        until = cassette.end
+    try:
+        loop.call_at(until, polling.request_stop, 'конец записи')
+        loop.run_until_complete(polling.run())
+    finally:
+        polling.close()
+        loop.close()
+        http_client.install(previous)
+        commands.BOT_COMMANDS = listen
+    return Report(polling.polled, player.requests, inbox.messages,
+                  clock.time() - cassette.start, time.perf_counter() - wall,
+                  player.coverage(until))
+
+
+def parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(
+        prog='homework.py replay',
+        description='Проигрывает кассету ответов API в виртуальном времени.'
+    )
+    parser.add_argument('cassette', help='файл JSONL из RECORD_CASSETTE')
+    parser.add_argument('--days', type=float,
+                        help='сколько дней проиграть; по умолчанию — '
+                        'до последней записи')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--messages',
+                        help='файл JSONL для отправленных сообщений')
+    parser.add_argument('--verbose', action='store_true',
+                        help='писать лог движка в stderr')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа ``python homework.py replay``."""
+    args = parse_args(argv)
+    logs.setup(homework.logger,
+               level=logs.LOG_LEVEL if args.verbose else 'WARNING',
+               output=sys.stderr)
+    cassette = Cassette.load(args.cassette)
+    report: Report = replay(
+        cassette, seed=args.seed,
+        until=None if args.days is None else cassette.start + args.days * DAY
+    )
+    if args.messages:
+        with open(args.messages, 'w', encoding='utf-8') as file:
+            for at, chat_id, text in report.messages:
+                file.write(json.dumps({'at': at, 'chat': chat_id,
+                                       'text': text},
+                                      ensure_ascii=False) + '\n')
+    print(f'Пользователей: {len(cassette.tenants)}, '
+          f'смоделировано: {report.simulated / DAY:.1f} сут. '
+          f'за {report.wall:.1f} с.\n'
+          f'Опросов: {report.polls}, запросов к API: {report.requests}, '
+          f'сообщений: {len(report.messages)}, '
+          f'отдано записей: {report.coverage:.0%}.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import heapq
+import itertools
+from typing import Hashable, List, Dict, Tuple, Iterable, Optional
+
+COMPACT_RATIO: int = 2
+
+
+class PollScheduler:
+    """Очередь дедлайнов опроса на двоичной куче.
+
+    Каждому ключу (пользователю) соответствует не больше одного
+    дедлайна. Перепланирование не ищет старую запись в куче, а
+    добавляет новую; устаревшие записи пропускаются при извлечении
+    и вычищаются, когда их становится слишком много. Так и
+    планирование, и перепланирование стоят O(log n).
+
+    Дедлайны, попадающие в одно окно ``resolution`` секунд,
+    извлекаются одной пачкой, чтобы диспетчер просыпался реже.
+    """
+
+    def __init__(self, resolution: float = 1.0) -> None:
+        self.resolution = resolution
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._entries: Dict[Hashable, int] = {}
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def schedule(self, key: Hashable, deadline: float) -> None:
+        """Назначает (или переназначает) дедлайн для ключа."""
+        entry: int = next(self._counter)
+        self._entries[key] = entry
+        heapq.heappush(self._heap, (deadline, entry, key))
+        if len(self._heap) > COMPACT_RATIO * len(self._entries) + 1024:
+            self._compact()
+
+    def spread(self, keys: Iterable[Hashable], period: float,
+               start: float) -> None:
+        """Равномерно распределяет первые дедлайны по ``period``.
+
+        Так запросы новых пользователей не приходят к API разом.
+        """
+        keys = list(keys)
+        step: float = period / max(len(keys), 1)
+        for index, key in enumerate(keys):
+            self.schedule(key, start + index * step)
+
+    def cancel(self, key: Hashable) -> None:
+        """Снимает ключ с расписания."""
+        self._entries.pop(key, None)
+
+    def next_deadline(self) -> Optional[float]:
+        """Возвращает ближайший актуальный дедлайн."""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> List[Hashable]:
+        """Извлекает ключи с дедлайном не позже ``now + resolution``."""
+        return [key for key, _ in self.pop_due_deadlines(now)]
+
+    def pop_due_deadlines(self,
+                          now: float) -> List[Tuple[Hashable, float]]:
+        """Извлекает наступившие ключи вместе с их дедлайнами."""
+        due: List[Tuple[Hashable, float]] = []
+        limit: float = now + self.resolution
+        heap = self._heap
+        entries = self._entries
+        while heap and heap[0][0] <= limit:
+            deadline, entry, key = heapq.heappop(heap)
+            if entries.get(key) == entry:
+                del entries[key]
+                due.append((key, deadline))
+        return due
+
+    def _drop_stale(self) -> None:
+        heap = self._heap
+        while heap and self._entries.get(heap[0][2]) != heap[0][1]:
+            heapq.heappop(heap)
+
+    def _compact(self) -> None:
+        self._heap = [item for item in self._heap
+                      if self._entries.get(item[2]) == item[1]]
+        heapq.heapify(self._heap)
@@ -0,0 +1,392 @@
+import os
+import sys
+import time
+import bisect
+import signal
+import asyncio
+import hashlib
+import sqlite3
+import functools
+import multiprocessing
+from typing import Callable, Dict, List, NoReturn, Optional, Sequence
+
+import commands
+import engine
+import homework
+import logs
+import metrics
+import shutdown
+import state
+import transitions
+
+WORKERS: int = int(os.getenv('SHARD_WORKERS', os.cpu_count() or 1))
+VNODES: int = int(os.getenv('SHARD_VNODES', 128))
+LEASE_DB: str = os.getenv('LEASE_DB', 'leases.sqlite3')
+LEASE_TTL: float = float(os.getenv('LEASE_TTL', 30))
+RESTART_DELAY: float = 1.0
+
+logger = homework.logger.getChild('sharding')
+
+SCHEMA: str = '''
+CREATE TABLE IF NOT EXISTS leases (
+    tenant TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL,
+    from_date INTEGER NOT NULL DEFAULT 0
+);
+'''
+
+Positions = Dict[str, int]
+
+
+def worker_name(index: int) -> str:
+    """Возвращает имя процесса-обработчика, оно же владелец аренды."""
+    return f'worker-{index}'
+
+
+def shard_path(path: Optional[str], index: int) -> Optional[str]:
+    """Возвращает путь к базе состояния процесса ``index``."""
+    return f'{path}.{index}' if path else None
+
+
+def _point(key: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big'
+    )
+
+
+class HashRing:
+    """Консистентное хеширование пользователей по процессам.
+
+    Каждый процесс занимает ``replicas`` точек на кольце, пользователь
+    достаётся ближайшей точке по часовой стрелке. При добавлении
+    или удалении процесса переезжает только около ``1/N``
+    пользователей, остальные остаются на месте.
+    """
+
+    def __init__(self, nodes: List[str], replicas: int = VNODES) -> None:
+        points = sorted((_point(f'{node}#{replica}'), node)
+                        for node in nodes for replica in range(replicas))
+        self._points: List[int] = [point for point, _ in points]
+        self._nodes: List[str] = [node for _, node in points]
+
+    def owner(self, key: str) -> str:
+        """Возвращает процесс, который отвечает за ключ."""
+        index: int = bisect.bisect(self._points, _point(key))
+        return self._nodes[index % len(self._nodes)]
+
+
+class LeaseStore:
+    """Аренда пользователей процессами в общей базе SQLite.
+
+    Пользователя опрашивает только владелец непросроченной аренды,
+    поэтому два процесса никогда не опрашивают один токен, даже
+    пока после смены числа процессов старый владелец ещё работает.
+    Вместе с арендой хранится позиция опроса: новый владелец
+    продолжает с неё, а не с момента своего запуска. Статусы работ
+    и неотправленные уведомления новый владелец забирает из базы
+    прежнего (см. ``adopt``).
+    """
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.time
+                 ) -> None:
+        self.path = path
+        self.clock = clock
+        self._db = sqlite3.connect(path, isolation_level=None, timeout=30,
+                                   check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(SCHEMA)
+
+    def renew(self, owner: str, positions: Positions,
+              ttl: float = LEASE_TTL) -> Positions:
+        """Продлевает аренду или берёт свободную и просроченную.
+
+        ``positions`` — позиции опроса пользователей, на которых
+        претендует ``owner``. Возвращает позиции тех из них, чья
+        аренда теперь принадлежит ``owner``.
+        """
+        now: float = self.clock()
+        self._db.execute('BEGIN IMMEDIATE')
+        try:
+            self._db.executemany(
+                'INSERT INTO leases (tenant, owner, expires, from_date) '
+                'VALUES (?, ?, ?, ?) ON CONFLICT (tenant) DO UPDATE SET '
+                'owner = excluded.owner, expires = excluded.expires, '
+                'from_date = max(from_date, excluded.from_date) '
+                'WHERE owner = excluded.owner OR expires < ?',
+                ((tenant, owner, now + ttl, from_date, now)
+                 for tenant, from_date in positions.items())
+            )
+            rows = self._db.execute(
+                'SELECT tenant, from_date FROM leases WHERE owner = ?',
+                (owner,)
+            ).fetchall()
+        except BaseException:
+            self._db.execute('ROLLBACK')
+            raise
+        self._db.execute('COMMIT')
+        return {tenant: from_date for tenant, from_date in rows
+                if tenant in positions}
+
+    def release(self, owner: str, positions: Positions) -> None:
+        """Отдаёт аренду, сохранив последние позиции опроса."""
+        self._db.execute('BEGIN IMMEDIATE')
+        self._db.executemany(
+            'UPDATE leases SET expires = 0, '
+            'from_date = max(from_date, ?) WHERE tenant = ? AND owner = ?',
+            ((from_date, tenant, owner)
+             for tenant, from_date in positions.items())
+        )
+        self._db.execute('COMMIT')
+
+    def close(self) -> None:
+        """Закрывает базу."""
+        self._db.close()
+
+
+def positions(polling: engine.PollingEngine) -> Positions:
+    """Возвращает позиции опроса пользователей движка."""
+    return {tenant.key: tenant.from_date for tenant in polling.tenants}
+
+
+def apply_leases(polling: engine.PollingEngine, held: Positions) -> None:
+    """Разрешает опрос только арендованных пользователей.
+
+    Для пользователя, который только что перешёл к процессу,
+    позиция опроса берётся из аренды, если она новее своей.
+    Пользователь без позиции и в базе, и в аренде опрашивается
+    с текущего момента.
+    """
+    active = set()
+    for index, tenant in enumerate(polling.tenants):
+        if tenant.key not in held:
+            continue
+        if index not in polling.active:
+            tenant.from_date = (max(tenant.from_date, held[tenant.key])
+                                or int(time.time()))
+        active.add(index)
+    polling.active = active
+
+
+def adopt(store: state.StateStore, tenants: List[engine.Tenant],
+          sources: Sequence[str]) -> List[state.OutboxRow]:
+    """Переносит состояние пользователей из баз других процессов.
+
+    Статусы работ берутся из базы с самой новой позицией опроса,
+    если она новее своей. Неотправленные уведомления чатов
+    пользователей забираются из всех баз: сначала фиксируются
+    в ``store``, затем отмечаются отправленными в исходной базе,
+    поэтому при сбое посередине уведомление может уйти дважды,
+    но не потеряется. Возвращает перенесённые уведомления.
+    """
+    moved: List[state.OutboxRow] = []
+    for path in sources:
+        source = state.StateStore(path, flush_every=1)
+        try:
+            for tenant in tenants:
+                current: Optional[int] = source.load_timestamp(tenant.key)
+                if current is not None and current > tenant.from_date:
+                    tenant.tracker = transitions.TransitionTracker(
+                        source.load_statuses(tenant.key),
+                        source.load_dates(tenant.key)
+                    )
+                    tenant.from_date = current
+                    store.checkpoint(tenant.key, current,
+                                     tenant.tracker.statuses,
+                                     tenant.tracker.updated)
+                entries: List[state.OutboxEntry] = source.pending_for_chat(
+                    tenant.chat_id
+                )
+                if not entries:
+                    continue
+                moved.extend(store.adopt_outbox(entries))
+                store.flush()
+                source.mark_delivered([entry[0] for entry in entries])
+                source.flush()
+        finally:
+            source.close()
+    store.flush()
+    return moved
+
+
+async def take_leases(leases: LeaseStore, owner: str,
+                      polling: engine.PollingEngine,
+                      sources: Sequence[str] = (),
+                      ttl: float = LEASE_TTL) -> List[state.OutboxRow]:
+    """Продлевает аренду и разрешает опрос арендованных пользователей.
+
+    Если позиция пользователя в аренде новее своей, его опрашивал
+    другой процесс, и состояние сначала переносится из ``sources``.
+    Возвращает перенесённые уведомления.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        held: Positions = await loop.run_in_executor(
+            None, leases.renew, owner, positions(polling), ttl
+        )
+    except sqlite3.Error as error:
+        logger.error('%s: не удалось продлить аренду: %s', owner, error)
+        held = {}
+    moved: List[state.OutboxRow] = []
+    arrived: List[engine.Tenant] = [
+        tenant for index, tenant in enumerate(polling.tenants)
+        if index not in polling.active
+        and held.get(tenant.key, 0) > tenant.from_date
+    ]
+    if arrived and sources and polling.store is not None:
+        try:
+            moved = await loop.run_in_executor(None, adopt, polling.store,
+                                               arrived, sources)
+        except sqlite3.Error as error:
+            logger.error('%s: не удалось перенести состояние: %s',
+                         owner, error)
+    apply_leases(polling, held)
+    return moved
+
+
+async def renew_forever(leases: LeaseStore, owner: str,
+                        polling: engine.PollingEngine,
+                        sources: Sequence[str] = (),
+                        ttl: float = LEASE_TTL) -> NoReturn:
+    """Продлевает аренду каждые ``ttl / 3`` секунд."""
+    while True:
+        await asyncio.sleep(ttl / 3)
+        await polling.requeue(
+            await take_leases(leases, owner, polling, sources, ttl)
+        )
+
+
+async def hold_leases(leases: LeaseStore, owner: str,
+                      polling: engine.PollingEngine,
+                      sources: Sequence[str] = ()) -> None:
+    """Опрашивает пользователей процесса, пока держит их аренду.
+
+    Аренда берётся до первого опроса, иначе диспетчер отложил бы
+    всех пользователей на период повтора. Перенесённые при этом
+    уведомления отправит ``resend_pending`` при запуске движка.
+    """
+    polling.active = set()
+    await take_leases(leases, owner, polling, sources)
+    renewal: asyncio.Task = asyncio.create_task(
+        renew_forever(leases, owner, polling, sources)
+    )
+    try:
+        await engine.run_until_signal(polling)
+    finally:
+        renewal.cancel()
+        await asyncio.gather(renewal, return_exceptions=True)
+        leases.release(owner, positions(polling))
+
+
+def load_shard(path: str, index: int, count: int) -> List[engine.Tenant]:
+    """Возвращает пользователей, которые по кольцу достались ``index``.
+
+    Позиция опроса не задаётся: её восстанавливает база процесса
+    или аренда в ``apply_leases``.
+    """
+    owner: str = worker_name(index)
+    ring = HashRing([worker_name(node) for node in range(count)])
+    return [tenant for tenant in engine.load_tenants(path)
+            if ring.owner(tenant.key) == owner]
+
+
+def run_worker(index: int, count: int) -> None:
+    """Опрашивает пользователей, которые по кольцу достались ``index``."""
+    for signum in shutdown.SIGNALS:
+        signal.signal(signum, signal.SIG_DFL)
+    logs.setup(homework.logger)
+    owner: str = worker_name(index)
+    tenants: List[engine.Tenant] = load_shard(engine.TENANTS_FILE, index,
+                                              count)
+    logger.info('%s: пользователей %d.', owner, len(tenants))
+    if commands.BOT_COMMANDS:
+        logger.warning('%s: команды бота при нескольких процессах '
+                       'не поддерживаются.', owner)
+        commands.BOT_COMMANDS = False
+    if metrics.METRICS_PORT:
+        metrics.METRICS_PORT = str(int(metrics.METRICS_PORT) + index)
+    path: Optional[str] = shard_path(state.STATE_DB, index)
+    sources: List[str] = [
+        source for source in state.shard_paths(state.STATE_DB or '')
+        if source != path
+    ]
+    leases = LeaseStore(LEASE_DB)
+    try:
+        engine.run_tenants(tenants, path, functools.partial(
+            hold_leases, leases, owner, sources=sources
+        ))
+    finally:
+        leases.close()
+
+
+class Supervisor:
+    """Запускает ``count`` процессов-обработчиков и следит за ними.
+
+    Упавший процесс перезапускается с тем же номером и получает
+    тех же пользователей. По SIGTERM процессы останавливаются
+    так же, как одиночный движок, но не дольше ``SHUTDOWN_TIMEOUT``.
+    """
+
+    def __init__(self, count: int = WORKERS,
+                 target: Callable[[int, int], None] = run_worker) -> None:
+        self.count = count
+        self.target = target
+        self.processes: Dict[int, multiprocessing.Process] = {}
+
+    def spawn(self, index: int) -> None:
+        """Запускает процесс-обработчик с номером ``index``."""
+        process = multiprocessing.Process(target=self.target,
+                                          args=(index, self.count),
+                                          name=worker_name(index))
+        process.start()
+        self.processes[index] = process
+
+    def restart_dead(self) -> None:
+        """Перезапускает завершившиеся процессы."""
+        for index, process in list(self.processes.items()):
+            if not process.is_alive():
+                logger.warning('%s завершился с кодом %s, перезапуск.',
+                               process.name, process.exitcode)
+                self.spawn(index)
+
+    def stop(self, timeout: float = shutdown.TIMEOUT) -> None:
+        """Останавливает процессы, зависшие завершает принудительно."""
+        deadline: float = time.monotonic() + timeout
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.error('%s не остановился, завершаем.', process.name)
+                process.kill()
+                process.join()
+
+    def run(self) -> None:
+        """Работает до SIGTERM или SIGINT."""
+        stopper = shutdown.Shutdown()
+        for index in range(self.count):
+            self.spawn(index)
+        stopper.install()
+        try:
+            while not stopper.requested.wait(RESTART_DELAY):
+                self.restart_dead()
+            logger.info('Получен %s, останавливаем процессы.',
+                        stopper.reason)
+        finally:
+            self.stop(stopper.timeout)
+            stopper.restore()
+
+
+def main() -> NoReturn:
+    """Распределяет пользователей из TENANTS_FILE по SHARD_WORKERS."""
+    logs.setup(homework.logger)
+    if not (engine.TENANTS_FILE and homework.TELEGRAM_TOKEN):
+        error: str = 'Не заданы TENANTS_FILE и TELEGRAM_TOKEN.'
+        logger.critical(error)
+        sys.exit(error)
+    logger.info('Запускаем процессов: %d.', WORKERS)
+    Supervisor(WORKERS).run()
+
+
+if __name__ == '__main__':
+    main()
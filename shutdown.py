@@ -0,0 +1,65 @@
+import os
+import time
+import signal
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import exceptions
+
+TIMEOUT: float = float(os.getenv('SHUTDOWN_TIMEOUT', 20))
+SIGNALS: Tuple[signal.Signals, ...] = (signal.SIGTERM, signal.SIGINT)
+
+
+class Shutdown:
+    """Остановка по SIGTERM и SIGINT.
+
+    Обработчик сигнала только запоминает запрос. Прервать ожидание
+    он может лишь внутри блока ``interruptible``: там выбрасывается
+    ``ShutdownRequested``. Так сигнал не обрывает отправку сообщения
+    или запись состояния, а пауза между опросами заканчивается сразу.
+    """
+
+    def __init__(self, timeout: float = TIMEOUT) -> None:
+        self.timeout = timeout
+        self.requested = threading.Event()
+        self.reason: Optional[str] = None
+        self._waiting: bool = False
+        self._previous: Dict[signal.Signals, Callable] = {}
+
+    def install(self) -> None:
+        """Устанавливает обработчики сигналов (из главного потока)."""
+        for signum in SIGNALS:
+            self._previous[signum] = signal.signal(signum, self._handle)
+
+    def restore(self) -> None:
+        """Возвращает прежние обработчики сигналов."""
+        for signum, handler in self._previous.items():
+            signal.signal(signum, handler)
+        self._previous.clear()
+
+    def request(self, reason: str) -> None:
+        """Запрашивает остановку."""
+        self.reason = reason
+        self.requested.set()
+
+    def deadline(self) -> float:
+        """Момент по ``time.monotonic``, к которому нужно завершиться."""
+        return time.monotonic() + self.timeout
+
+    @contextmanager
+    def interruptible(self) -> Iterator[None]:
+        """Блок ожидания, который сигнал остановки прерывает."""
+        if self.requested.is_set():
+            raise exceptions.ShutdownRequested(self.reason)
+        self._waiting = True
+        try:
+            yield
+        finally:
+            self._waiting = False
+
+    def _handle(self, signum: int, frame) -> None:
+        self.request(signal.Signals(signum).name)
+        if self._waiting:
+            self._waiting = False
+            raise exceptions.ShutdownRequested(self.reason)
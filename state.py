@@ -0,0 +1,367 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import pathlib
+import threading
+from typing import Union, Dict, List, Optional, Tuple
+
+STATE_DB: Optional[str] = os.getenv('STATE_DB')
+FLUSH_EVERY: int = int(os.getenv('STATE_FLUSH_EVERY', 100))
+FLUSH_INTERVAL: float = float(os.getenv('STATE_FLUSH_INTERVAL', 5))
+
+SCHEMA: str = '''
+CREATE TABLE IF NOT EXISTS checkpoints (
+    tenant TEXT PRIMARY KEY,
+    from_date INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS homework_statuses (
+    tenant TEXT NOT NULL,
+    homework TEXT NOT NULL,
+    status TEXT NOT NULL,
+    date_updated TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (tenant, homework)
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    chat TEXT NOT NULL,
+    homework TEXT NOT NULL,
+    status TEXT NOT NULL,
+    date_updated TEXT NOT NULL,
+    message TEXT NOT NULL,
+    delivered INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (chat, homework, status, date_updated)
+);
+CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (id) WHERE delivered = 0;
+CREATE TABLE IF NOT EXISTS review_starts (
+    tenant TEXT NOT NULL,
+    homework TEXT NOT NULL,
+    started REAL NOT NULL,
+    PRIMARY KEY (tenant, homework)
+);
+CREATE INDEX IF NOT EXISTS review_starts_started ON review_starts (started);
+CREATE TABLE IF NOT EXISTS review_stats (
+    lesson TEXT NOT NULL,
+    cohort TEXT NOT NULL,
+    aggregate TEXT NOT NULL,
+    PRIMARY KEY (lesson, cohort)
+);
+'''
+
+SHARD = re.compile(r'\.\d+')
+
+OutboxRow = Tuple[int, str, str]
+OutboxKey = Tuple[str, str, str, str]
+OutboxEntry = Tuple[int, str, str, str, str, str]
+StatsRow = Tuple[str, str, str]
+
+
+def shard_paths(path: str) -> List[str]:
+    """Возвращает базы процессов ``sharding``: ``<path>.<номер>``."""
+    directory: str = os.path.dirname(path) or '.'
+    name: str = os.path.basename(path)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, entry) for entry in os.listdir(directory)
+        if entry.startswith(name) and SHARD.fullmatch(entry[len(name):])
+    )
+
+
+def tenant_key(token: str) -> str:
+    """Возвращает ключ пользователя, не раскрывающий его токен."""
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def homework_key(homework: Dict[str, Union[str, int]]) -> str:
+    """Возвращает идентификатор домашней работы из ответа API."""
+    key = homework.get('id')
+    if key is None:
+        key = homework.get('homework_name')
+    return str(key)
+
+
+class StateStore:
+    """Хранилище позиции опроса и статусов работ в SQLite.
+
+    База работает в режиме WAL. Записи копятся в открытой транзакции
+    и фиксируются на диск пачкой: каждые ``flush_every`` контрольных
+    точек, не реже чем раз в ``flush_interval`` секунд и при закрытии.
+    С ``read_only`` база открывается только для чтения: её нельзя
+    изменить, а если файла нет, ``sqlite3.OperationalError``.
+    """
+
+    def __init__(self, path: str, flush_every: int = FLUSH_EVERY,
+                 flush_interval: float = FLUSH_INTERVAL,
+                 read_only: bool = False) -> None:
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._pending: int = 0
+        self._flushed_at: float = time.monotonic()
+        if read_only:
+            self._db = sqlite3.connect(
+                f'{pathlib.Path(path).resolve().as_uri()}?mode=ro',
+                uri=True, isolation_level=None, check_same_thread=False
+            )
+            return
+        self._db = sqlite3.connect(path, isolation_level=None,
+                                   check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=FULL')
+        self._db.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        columns = {row[1] for row in self._db.execute(
+            'PRAGMA table_info(homework_statuses)'
+        )}
+        if 'date_updated' not in columns:
+            self._db.execute('ALTER TABLE homework_statuses ADD COLUMN '
+                             "date_updated TEXT NOT NULL DEFAULT ''")
+
+    def load_timestamps(self) -> Dict[str, int]:
+        """Возвращает сохранённые ``current_date`` всех пользователей."""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT tenant, from_date FROM checkpoints'
+            ).fetchall()
+        return dict(rows)
+
+    def load_timestamp(self, tenant: str) -> Optional[int]:
+        """Возвращает сохранённый ``current_date`` пользователя."""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT from_date FROM checkpoints WHERE tenant = ?',
+                (tenant,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def load_statuses(self, tenant: str) -> Dict[str, str]:
+        """Возвращает последние известные статусы работ пользователя."""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT homework, status FROM homework_statuses '
+                'WHERE tenant = ?',
+                (tenant,)
+            ).fetchall()
+        return dict(rows)
+
+    def load_dates(self, tenant: str) -> Dict[str, str]:
+        """Возвращает ``date_updated`` известных статусов пользователя."""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT homework, date_updated FROM homework_statuses '
+                "WHERE tenant = ? AND date_updated != ''",
+                (tenant,)
+            ).fetchall()
+        return dict(rows)
+
+    def load_all_statuses(self) -> Dict[str, Dict[str, str]]:
+        """Возвращает последние статусы работ всех пользователей."""
+        return self._load_all('status')
+
+    def load_all_dates(self) -> Dict[str, Dict[str, str]]:
+        """Возвращает ``date_updated`` известных статусов всех."""
+        return self._load_all('date_updated')
+
+    def _load_all(self, column: str) -> Dict[str, Dict[str, str]]:
+        with self._lock:
+            rows = self._db.execute(
+                f'SELECT tenant, homework, {column} FROM homework_statuses '
+                f"WHERE {column} != ''"
+            ).fetchall()
+        values: Dict[str, Dict[str, str]] = {}
+        for tenant, homework, value in rows:
+            values.setdefault(tenant, {})[homework] = value
+        return values
+
+    def checkpoint(self, tenant: str, current_date: int,
+                   statuses: Optional[Dict[str, str]] = None,
+                   updated: Optional[Dict[str, str]] = None) -> None:
+        """Запоминает позицию опроса и статусы работ пользователя.
+
+        ``updated`` — ``date_updated`` работ из ``statuses``.
+        """
+        with self._lock:
+            if not self._db.in_transaction:
+                self._db.execute('BEGIN')
+            self._db.execute(
+                'INSERT INTO checkpoints (tenant, from_date) '
+                'VALUES (?, ?) ON CONFLICT (tenant) '
+                'DO UPDATE SET from_date = excluded.from_date',
+                (tenant, current_date)
+            )
+            if statuses:
+                self._db.executemany(
+                    'INSERT INTO homework_statuses '
+                    '(tenant, homework, status, date_updated) '
+                    'VALUES (?, ?, ?, ?) ON CONFLICT (tenant, homework) '
+                    'DO UPDATE SET status = excluded.status, '
+                    'date_updated = excluded.date_updated',
+                    ((tenant, homework, status,
+                      str((updated or {}).get(homework) or ''))
+                     for homework, status in statuses.items())
+                )
+            self._pending += 1
+            if (self._pending >= self.flush_every
+                    or time.monotonic() - self._flushed_at
+                    >= self.flush_interval):
+                self.flush()
+
+    def enqueue(self, chat: Union[int, str],
+                homework: Dict[str, Union[str, int]],
+                message: str) -> Optional[int]:
+        """Добавляет уведомление в исходящие в текущей транзакции.
+
+        Уведомление определяется чатом, работой, статусом и
+        ``date_updated``; повторное добавление запись не меняет.
+        Возвращает номер новой записи, номер ещё не отправленной
+        записи-повтора (её нужно отправить, например после сбоя на
+        середине обработки ответа) или ``None`` для отправленного
+        повтора. Запись фиксируется вместе со следующей контрольной
+        точкой.
+        """
+        return self._enqueue((
+            str(chat), homework_key(homework), homework.get('status'),
+            str(homework.get('date_updated') or '')
+        ), message)
+
+    def _enqueue(self, key: OutboxKey, message: str) -> Optional[int]:
+        with self._lock:
+            if not self._db.in_transaction:
+                self._db.execute('BEGIN')
+            cursor = self._db.execute(
+                'INSERT OR IGNORE INTO outbox '
+                '(chat, homework, status, date_updated, message) '
+                'VALUES (?, ?, ?, ?, ?)', (*key, message)
+            )
+            if cursor.rowcount:
+                return cursor.lastrowid
+            row: Optional[Tuple[int]] = self._db.execute(
+                'SELECT id FROM outbox WHERE chat = ? AND homework = ? '
+                'AND status = ? AND date_updated = ? AND delivered = 0', key
+            ).fetchone()
+        return row[0] if row else None
+
+    def pending_outbox(self, limit: int,
+                       after: int = 0) -> List[OutboxRow]:
+        """Возвращает до ``limit`` неотправленных уведомлений.
+
+        Записи идут по порядку добавления, начиная с номера больше
+        ``after``: так исходящие читаются пачками.
+        """
+        with self._lock:
+            return self._db.execute(
+                'SELECT id, chat, message FROM outbox '
+                'WHERE delivered = 0 AND id > ? ORDER BY id LIMIT ?',
+                (after, limit)
+            ).fetchall()
+
+    def pending_for_chat(self, chat: Union[int, str]) -> List[OutboxEntry]:
+        """Возвращает неотправленные уведомления чата вместе с ключами."""
+        with self._lock:
+            return self._db.execute(
+                'SELECT id, chat, homework, status, date_updated, message '
+                'FROM outbox WHERE delivered = 0 AND chat = ? ORDER BY id',
+                (str(chat),)
+            ).fetchall()
+
+    def adopt_outbox(self, entries: List[OutboxEntry]) -> List[OutboxRow]:
+        """Добавляет уведомления из другой базы в текущей транзакции.
+
+        Возвращает записи, которые ещё нужно отправить.
+        """
+        rows: List[OutboxRow] = []
+        for _, chat, homework, status, date_updated, message in entries:
+            row_id: Optional[int] = self._enqueue(
+                (chat, homework, status, date_updated), message
+            )
+            if row_id is not None:
+                rows.append((row_id, chat, message))
+        return rows
+
+    def mark_delivered(self, ids: List[int]) -> None:
+        """Отмечает уведомления отправленными в текущей транзакции."""
+        with self._lock:
+            if not self._db.in_transaction:
+                self._db.execute('BEGIN')
+            self._db.executemany(
+                'UPDATE outbox SET delivered = 1 WHERE id = ?',
+                ((row_id,) for row_id in ids)
+            )
+
+    def load_review_starts(self) -> Dict[Tuple[str, str], float]:
+        """Возвращает начала незавершённых проверок, от ранних к поздним."""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT tenant, homework, started FROM review_starts '
+                'ORDER BY started'
+            ).fetchall()
+        return {(tenant, homework): started
+                for tenant, homework, started in rows}
+
+    def start_review(self, tenant: str, homework: str,
+                     started: float) -> None:
+        """Запоминает начало проверки работы в текущей транзакции."""
+        with self._lock:
+            if not self._db.in_transaction:
+                self._db.execute('BEGIN')
+            self._db.execute(
+                'INSERT INTO review_starts (tenant, homework, started) '
+                'VALUES (?, ?, ?) ON CONFLICT (tenant, homework) '
+                'DO UPDATE SET started = excluded.started',
+                (tenant, homework, started)
+            )
+
+    def expire_reviews(self, before: float) -> None:
+        """Удаляет начала проверок раньше ``before`` в текущей транзакции."""
+        with self._lock:
+            if not self._db.in_transaction:
+                self._db.execute('BEGIN')
+            self._db.execute('DELETE FROM review_starts WHERE started < ?',
+                             (before,))
+
+    def finish_review(self, tenant: str, homework: str, lesson: str,
+                      cohort: str, aggregate: str) -> None:
+        """Закрывает проверку и сохраняет агрегат урока и когорты.
+
+        Агрегат передаётся уже сериализованным, запись попадает
+        в текущую транзакцию.
+        """
+        with self._lock:
+            if not self._db.in_transaction:
+                self._db.execute('BEGIN')
+            self._db.execute(
+                'DELETE FROM review_starts WHERE tenant = ? AND homework = ?',
+                (tenant, homework)
+            )
+            self._db.execute(
+                'INSERT INTO review_stats (lesson, cohort, aggregate) '
+                'VALUES (?, ?, ?) ON CONFLICT (lesson, cohort) '
+                'DO UPDATE SET aggregate = excluded.aggregate',
+                (lesson, cohort, aggregate)
+            )
+
+    def load_review_stats(self) -> List[StatsRow]:
+        """Возвращает сериализованные агрегаты по урокам и когортам."""
+        with self._lock:
+            return self._db.execute(
+                'SELECT lesson, cohort, aggregate FROM review_stats'
+            ).fetchall()
+
+    def flush(self) -> None:
+        """Фиксирует накопленные контрольные точки на диске."""
+        with self._lock:
+            if self._db.in_transaction:
+                self._db.execute('COMMIT')
+            self._pending = 0
+            self._flushed_at = time.monotonic()
+
+    def close(self) -> None:
+        """Фиксирует изменения и закрывает базу."""
+        with self._lock:
+            self.flush()
+            self._db.close()
@@ -5,6 +5,15 @@ from datetime import datetime
 import pytest
 
 
+@pytest.fixture(autouse=True)
+def session_uses_requests_get(monkeypatch):
+    """Тесты подменяют requests.get, запросы бота должны идти через него."""
+    import requests
+
+    import http_client
+    monkeypatch.setattr(http_client, 'get_session', lambda: requests)
+
+
 @pytest.fixture
 def random_timestamp():
     left_ts = 1000198000
@@ -0,0 +1,93 @@
+import time
+
+import requests
+import telegram
+
+import alerts
+import exceptions
+import utils
+
+
+class TestFingerprint:
+
+    def test_library_errors_keep_own_class(self):
+        assert alerts.error_class(ValueError('x')) == 'ValueError'
+        assert alerts.error_class(exceptions.BadConnection('x')) == (
+            'BadConnection'
+        )
+
+    def test_variable_parts_are_normalised(self):
+        first = exceptions.UnknownStatus('Чат 123: статус "a" в '
+                                         '2024-01-01T00:00:00Z.')
+        second = exceptions.UnknownStatus('Чат 98765: статус "b" в '
+                                          '2024-02-03T10:20:30Z.')
+        assert alerts.fingerprint(first) == alerts.fingerprint(second)
+        assert alerts.fingerprint(first) != alerts.fingerprint(
+            exceptions.BadConnection(str(first))
+        )
+
+
+class TestErrorAggregator:
+
+    def test_repeats_are_summarised_once_per_window(self):
+        clock = utils.FakeClock()
+        errors = alerts.ErrorAggregator(window=60, clock=clock)
+        errors.record(exceptions.BadConnection('Нет связи 1.'))
+        assert errors.due() == [f'{alerts.PREFIX}Нет связи 1.']
+        for number in range(2, 6):
+            clock.now += 10
+            errors.record(exceptions.BadConnection(f'Нет связи {number}.'))
+            assert errors.due() == []
+        clock.now = 60
+        (summary,) = errors.due()
+        assert 'Нет связи 5.' in summary and 'ещё 4 раз' in summary
+        assert errors.due() == []
+
+    def test_new_fingerprint_is_sent_at_once(self):
+        clock = utils.FakeClock()
+        errors = alerts.ErrorAggregator(window=60, clock=clock)
+        errors.record(exceptions.BadConnection('Нет связи.'))
+        errors.record(exceptions.BadConnection('Нет связи.'))
+        errors.record(TypeError('Не список.'))
+        assert errors.due() == [f'{alerts.PREFIX}Нет связи.',
+                                f'{alerts.PREFIX}Не список.']
+
+    def test_quiet_fingerprint_is_forgotten(self):
+        clock = utils.FakeClock()
+        errors = alerts.ErrorAggregator(window=60, clock=clock)
+        errors.record(exceptions.BadConnection('Нет связи.'))
+        errors.due()
+        clock.now = 60
+        assert errors.due() == [] and len(errors) == 0
+        errors.record(exceptions.BadConnection('Нет связи.'))
+        assert errors.due() == [f'{alerts.PREFIX}Нет связи.']
+
+
+def test_main_reports_repeated_error_once(monkeypatch, homework_module):
+    homework_module.PRACTICUM_TOKEN = 'sometoken'
+    homework_module.TELEGRAM_TOKEN = '1234:abcdefg'
+    homework_module.TELEGRAM_CHAT_ID = '12345'
+    sleeps = []
+
+    def mock_get(*args, **kwargs):
+        response = utils.MockResponseGET(*args, **kwargs)
+        response.json = lambda: {'homeworks': 'не список',
+                                 'current_date': 0}
+        return response
+
+    def sleep_three_times(secs):
+        sleeps.append(secs)
+        if len(sleeps) == 3:
+            raise utils.BreakInfiniteLoop('break')
+
+    sent = []
+    monkeypatch.setattr(requests, 'get', mock_get)
+    monkeypatch.setattr(time, 'sleep', sleep_three_times)
+    monkeypatch.setattr(telegram, 'Bot', utils.MockTelegramBot)
+    monkeypatch.setattr(homework_module, 'send_message',
+                        lambda bot, message: sent.append(message))
+    try:
+        homework_module.main()
+    except utils.BreakInfiniteLoop:
+        pass
+    assert len(sent) == 1 and sent[0].startswith(alerts.PREFIX)
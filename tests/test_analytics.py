@@ -0,0 +1,132 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import analytics
+import commands
+import state
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def item(homework_id, status, hours, lesson='Урок 1'):
+    moment = START + timedelta(hours=hours)
+    return {'id': homework_id, 'homework_name': f'hw{homework_id}',
+            'status': status, 'lesson_name': lesson,
+            'date_updated': moment.strftime(analytics.DATE_FORMAT)}
+
+
+def review(stats, homework_id, hours, status='approved', **kwargs):
+    tenant = kwargs.pop('tenant', 'tenant')
+    cohort = kwargs.pop('cohort', '')
+    stats.observe(tenant, item(homework_id, 'reviewing', 0, **kwargs),
+                  cohort)
+    return stats.observe(tenant, item(homework_id, status, hours, **kwargs),
+                         cohort)
+
+
+class TestSketch:
+
+    def test_quantiles_within_relative_accuracy(self):
+        rng = random.Random(0)
+        values = sorted(rng.lognormvariate(10, 1.5) for _ in range(10000))
+        sketch = analytics.Sketch(0.01)
+        for value in values:
+            sketch.add(value)
+        for share in (0.5, 0.9, 0.99):
+            exact = values[int(share * (len(values) - 1))]
+            assert sketch.quantile(share) == pytest.approx(exact, rel=0.01)
+        assert len(sketch.buckets) < 1000
+
+    def test_merge_matches_single_sketch(self):
+        whole, left, right = (analytics.Sketch() for _ in range(3))
+        for value in range(1, 1000):
+            whole.add(value)
+            (left if value % 2 else right).add(value)
+        left.merge(right)
+        restored = analytics.Sketch.from_dict(left.to_dict())
+        assert restored.buckets == whole.buckets
+        assert restored.quantile(0.9) == whole.quantile(0.9)
+
+
+class TestReviewStats:
+
+    def test_turnaround_is_measured_from_date_updated(self):
+        stats = analytics.ReviewStats()
+        assert review(stats, 1, 5) == 5 * 3600
+        assert review(stats, 2, 3, 'rejected') == 3 * 3600
+        assert stats.observe('tenant', item(3, 'approved', 1)) is None
+        ((lesson, aggregate),) = stats.summary()
+        assert lesson == 'Урок 1' and aggregate.count == 2
+        assert aggregate.outcomes == {'approved': 1, 'rejected': 1}
+        assert aggregate.mean == 4 * 3600
+
+    def test_aggregates_survive_restart(self, tmp_path):
+        path = str(tmp_path / 'state.db')
+        store = state.StateStore(path)
+        stats = analytics.ReviewStats(store)
+        review(stats, 1, 2, cohort='весна')
+        stats.observe('tenant', item(2, 'reviewing', 0))
+        store.close()
+
+        store = state.StateStore(path)
+        stats = analytics.ReviewStats(store)
+        assert stats.observe('tenant', item(2, 'approved', 6)) == 6 * 3600
+        store.close()
+        assert [(name, aggregate.count)
+                for name, aggregate in stats.summary('cohort')] == [
+            ('', 1), ('весна', 1)
+        ]
+
+    def test_unfinished_reviews_expire(self, tmp_path):
+        path = str(tmp_path / 'state.db')
+        store = state.StateStore(path)
+        stats = analytics.ReviewStats(store, max_age=24 * 3600)
+        for homework_id in range(100):
+            stats.observe('tenant', item(homework_id, 'reviewing', 0))
+        stats.observe('tenant', item(100, 'reviewing', 25))
+        assert list(stats.started) == [('tenant', '100')]
+        assert stats.observe('tenant', item(1, 'approved', 26)) is None
+        store.close()
+        store = state.StateStore(path)
+        try:
+            assert list(store.load_review_starts()) == [('tenant', '100')]
+        finally:
+            store.close()
+
+    def test_stats_command_reads_aggregates(self):
+        stats = analytics.ReviewStats()
+        review(stats, 1, 2)
+        listener = commands.CommandListener(
+            None, commands.StatusCache(pytest.fail), {'1': 'tenant'},
+            lambda chat_id, text: None,
+            local={'/stats': lambda: analytics.format_stats(stats.summary())}
+        )
+        assert listener.handle(1, '/stats') == (
+            '"Урок 1": проверок 1, в среднем 2.0 ч, медиана 2.0 ч, '
+            '90% — за 2.0 ч.'
+        )
+        assert listener.handle(2, '/stats') is None
+
+    def test_report_does_not_create_database(self, tmp_path, capsys):
+        path = tmp_path / 'missing.db'
+        assert analytics.main(['--db', str(path)]) == 2
+        assert not path.exists()
+
+    def test_report_merges_shard_databases(self, tmp_path, capsys):
+        path = str(tmp_path / 'state.db')
+        for index, lesson in enumerate(['Урок 1', 'Урок 2', 'Урок 1']):
+            store = state.StateStore(f'{path}.{index}')
+            review(analytics.ReviewStats(store), index, index + 1,
+                   lesson=lesson)
+            store.close()
+        assert analytics.state_paths(path) == [f'{path}.{index}'
+                                               for index in range(3)]
+        assert analytics.main(['--db', f'{path}.0',
+                               '--db', f'{path}.2']) == 0
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0].split() == ['lesson', 'reviews', 'approved',
+                                    'rejected', 'mean_h', 'p50_h', 'p90_h',
+                                    'p99_h']
+        assert lines[1].split()[:4] == ['Урок', '1', '2', '2']
@@ -0,0 +1,150 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+import telegram
+
+import breaker
+import exceptions
+import utils
+
+
+@pytest.fixture
+def circuit(monkeypatch):
+    monkeypatch.setattr(breaker.backoff, 'jittered',
+                        lambda delay, *args, **kwargs: delay)
+    return breaker.CircuitBreaker(failure_threshold=3, base_delay=10,
+                                  max_delay=40, clock=utils.FakeClock())
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_threshold(self, circuit):
+        for _ in range(2):
+            circuit.record_failure()
+            assert circuit.allow()
+        circuit.record_failure()
+        assert circuit.state == breaker.OPEN
+        assert not circuit.allow()
+        assert circuit.retry_in() == 10
+
+    def test_success_resets_failures(self, circuit):
+        circuit.record_failure()
+        circuit.record_failure()
+        circuit.record_success()
+        circuit.record_failure()
+        assert circuit.state == breaker.CLOSED
+
+    def test_half_open_lets_single_probe(self, circuit):
+        for _ in range(3):
+            circuit.record_failure()
+        circuit.clock.now = 10
+        assert circuit.allow()
+        assert circuit.state == breaker.HALF_OPEN
+        assert not circuit.allow()
+        circuit.record_success()
+        assert circuit.state == breaker.CLOSED and circuit.allow()
+
+    def test_failed_probe_doubles_delay_up_to_cap(self, circuit):
+        for _ in range(3):
+            circuit.record_failure()
+        delays = []
+        for _ in range(4):
+            delays.append(circuit.retry_in())
+            circuit.clock.now = circuit.retry_at
+            assert circuit.allow()
+            circuit.record_failure()
+        assert delays == [10, 20, 40, 40]
+
+    def test_in_flight_failures_after_trip_keep_base_delay(self, circuit):
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(lambda _: circuit.record_failure(), range(100)))
+        assert circuit.state == breaker.OPEN
+        assert circuit.opened == 1 and circuit.retry_in() == 10
+        circuit.clock.now = circuit.retry_at
+        assert circuit.allow()
+        circuit.record_failure()
+        assert circuit.opened == 2 and circuit.retry_in() == 20
+
+    def test_other_error_during_probe_reopens(self, circuit):
+        for _ in range(3):
+            circuit.record_failure()
+        circuit.clock.now = 10
+        assert circuit.allow()
+        with pytest.raises(ValueError):
+            with circuit.guard():
+                raise ValueError('Ответ API не JSON.')
+        assert circuit.state == breaker.OPEN and circuit.retry_in() == 20
+        circuit.clock.now = circuit.retry_at
+        assert circuit.allow()
+        with circuit.guard():
+            pass
+        assert circuit.state == breaker.CLOSED
+
+    def test_other_error_while_closed_is_not_counted(self, circuit):
+        for _ in range(3):
+            with pytest.raises(ValueError):
+                with circuit.guard():
+                    raise ValueError
+        assert circuit.state == breaker.CLOSED and circuit.failures == 0
+
+
+def test_main_keeps_polling_after_api_error(monkeypatch, homework_module):
+    homework_module.PRACTICUM_TOKEN = 'sometoken'
+    homework_module.TELEGRAM_TOKEN = '1234:abcdefg'
+    homework_module.TELEGRAM_CHAT_ID = '12345'
+    calls = []
+    sleeps = []
+
+    def mock_get(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise requests.RequestException('Something wrong')
+        return utils.MockResponseGET(random_timestamp=1000198500)
+
+    def sleep(secs):
+        sleeps.append(secs)
+        if len(sleeps) == 2:
+            raise utils.BreakInfiniteLoop('break')
+
+    monkeypatch.setattr(requests, 'get', mock_get)
+    monkeypatch.setattr(time, 'sleep', sleep)
+    monkeypatch.setattr(telegram, 'Bot', utils.MockTelegramBot)
+    with pytest.raises(utils.BreakInfiniteLoop):
+        homework_module.main()
+    assert len(calls) == 2
+
+
+def test_call_api_skips_request_while_open(monkeypatch, homework_module):
+    circuit = breaker.CircuitBreaker(failure_threshold=1)
+
+    def mock_get(*args, **kwargs):
+        raise requests.RequestException('Something wrong')
+
+    monkeypatch.setattr(requests, 'get', mock_get)
+    with pytest.raises(exceptions.BadConnection):
+        homework_module.call_api(circuit, 0)
+    with pytest.raises(exceptions.CircuitOpen):
+        homework_module.call_api(circuit, 0)
+
+
+def test_call_api_reopens_after_bad_probe_body(monkeypatch, homework_module):
+    circuit = breaker.CircuitBreaker(failure_threshold=1, base_delay=0,
+                                     max_delay=0)
+
+    def mock_get(*args, **kwargs):
+        response = utils.MockResponseGET(*args, **kwargs)
+        response.json = lambda: json_error()
+        return response
+
+    def json_error():
+        raise ValueError('Expecting value')
+
+    circuit.record_failure()
+    monkeypatch.setattr(requests, 'get', mock_get)
+    with pytest.raises(ValueError):
+        homework_module.call_api(circuit, 0)
+    assert circuit.state == breaker.OPEN
+    with pytest.raises(ValueError):
+        homework_module.call_api(circuit, 0)
@@ -0,0 +1,147 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import commands
+from utils import FakeClock
+
+RESPONSE = {
+    'homeworks': [
+        {'homework_name': 'hw2', 'status': 'reviewing',
+         'date_updated': '2024-01-02T00:00:00Z'},
+        {'homework_name': 'hw1', 'status': 'approved',
+         'reviewer_comment': 'Отлично.'},
+    ],
+    'current_date': 1,
+}
+
+
+class TestStatusCache:
+
+    def test_ttl(self):
+        calls = []
+        clock = FakeClock()
+        cache = commands.StatusCache(lambda key: calls.append(key) or key,
+                                     ttl=10, clock=clock)
+        assert cache.get('a') == 'a'
+        clock.now = 9
+        cache.get('a')
+        assert calls == ['a']
+        clock.now = 11
+        cache.get('a')
+        cache.invalidate('a')
+        cache.get('a')
+        assert calls == ['a', 'a', 'a']
+
+    def test_concurrent_misses_share_one_request(self):
+        calls = []
+        release = threading.Event()
+
+        def fetch(key):
+            calls.append(key)
+            release.wait(5)
+            return RESPONSE
+
+        cache = commands.StatusCache(fetch)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            cache.get('a'))) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        while not calls:
+            pass
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert calls == ['a']
+        assert results == [RESPONSE] * 10
+
+    def test_error_is_shared_and_not_cached(self):
+        calls = []
+
+        def fetch(key):
+            calls.append(key)
+            raise ConnectionError('API недоступен')
+
+        cache = commands.StatusCache(fetch)
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                cache.get('a')
+        assert calls == ['a', 'a']
+
+
+class TestCommandListener:
+
+    def make_listener(self, fetch=lambda key: RESPONSE, bot=None):
+        replies = []
+        listener = commands.CommandListener(
+            bot, commands.StatusCache(fetch), {'1': 'tenant'},
+            lambda chat_id, text: replies.append((chat_id, text))
+        )
+        return listener, replies
+
+    def test_status_and_last(self):
+        listener, replies = self.make_listener()
+        status = listener.handle(1, '/status')
+        last = listener.handle(1, '/last@practicum_bot')
+        assert status.splitlines() == [
+            '"hw2": Работа взята на проверку ревьюером.',
+            '"hw1": Работа проверена: ревьюеру всё понравилось. Ура!',
+        ]
+        assert 'hw2' in last and '2024-01-02' in last
+        assert replies == [(1, status), (1, last)]
+
+    def test_unknown_chat_and_command_are_ignored(self):
+        listener, replies = self.make_listener()
+        assert listener.handle(2, '/status') is None
+        assert listener.handle(1, '/help') is None
+        assert listener.handle(1, None) is None
+        assert replies == []
+
+    def test_api_error_is_reported_to_chat(self):
+        def fetch(key):
+            raise ConnectionError('API недоступен')
+
+        listener, replies = self.make_listener(fetch)
+        assert 'попробуйте позже' in listener.handle(1, '/status')
+
+    def test_updates_are_polled_with_offset(self):
+        offsets = []
+        answered = threading.Event()
+
+        class FakeBot:
+            def get_updates(self, offset=None, **kwargs):
+                offsets.append(offset)
+                if offset is None:
+                    message = SimpleNamespace(chat_id=1, text='/status')
+                    return [SimpleNamespace(update_id=7, message=message)]
+                answered.wait(5)
+                listener.stop()
+                return []
+
+        listener, replies = self.make_listener(bot=FakeBot())
+        listener.reply = lambda *args: (replies.append(args), answered.set())
+        listener.start()
+        listener._thread.join(5)
+        assert offsets == [None, 8]
+        assert replies[0][0] == 1
+
+
+def test_invalid_response_is_not_cached(monkeypatch, homework_module):
+    import requests
+
+    import breaker
+    from utils import mock_get_with_data
+    monkeypatch.setattr(requests, 'get',
+                        mock_get_with_data({'homeworks': 'не список',
+                                            'current_date': 1}))
+    cache = commands.StatusCache(
+        lambda key: homework_module.request_all(breaker.CircuitBreaker())
+    )
+    with pytest.raises(TypeError):
+        cache.get('a')
+    monkeypatch.setattr(requests, 'get',
+                        mock_get_with_data({'homeworks': [],
+                                            'current_date': 1}))
+    assert cache.get('a') == {'homeworks': [], 'current_date': 1}
@@ -0,0 +1,114 @@
+import time
+import asyncio
+
+import telegram
+
+import delivery
+import exceptions
+
+
+class FlakyBot:
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((chat_id, text, time.monotonic()))
+
+
+def deliver(bot, messages, timeout=5, **kwargs):
+    async def run():
+        queue = delivery.SendQueue(bot, **kwargs)
+        for chat_id, text in messages:
+            queue.submit(chat_id, text)
+        drained = await queue.join(timeout)
+        await queue.stop()
+        return queue, drained
+    return asyncio.run(run())
+
+
+class TestTokenBucket:
+
+    def test_burst_then_rate(self):
+        bucket = delivery.TokenBucket(rate=10)
+        waits = [bucket.reserve(0) for _ in range(12)]
+        assert waits[:10] == [0] * 10
+        assert waits[10] == 0.1 and abs(waits[11] - 0.2) < 1e-9
+        assert bucket.reserve(10) == 0
+
+
+class TestSendQueue:
+
+    def test_messages_in_chat_keep_order(self):
+        bot = FlakyBot()
+        queue, drained = deliver(
+            bot, [(1, 'a'), (2, 'x'), (1, 'b'), (1, 'c')], chat_rate=100
+        )
+        assert drained and queue.sent == 4
+        assert [text for chat, text, _ in bot.sent if chat == 1] == [
+            'a', 'b', 'c'
+        ]
+
+    def test_global_rate_is_respected(self):
+        bot = FlakyBot()
+        started = time.monotonic()
+        deliver(bot, [(chat, 'hi') for chat in range(250)], global_rate=200)
+        assert time.monotonic() - started >= 0.2
+        assert len(bot.sent) == 250
+
+    def test_chat_rate_is_respected(self):
+        bot = FlakyBot()
+        deliver(bot, [(1, str(i)) for i in range(5)], chat_rate=20)
+        times = [sent_at for _, _, sent_at in bot.sent]
+        assert all(later - earlier >= 0.045
+                   for earlier, later in zip(times, times[1:]))
+
+    def test_retry_after_pauses_chat(self):
+        bot = FlakyBot([telegram.error.RetryAfter(1)])
+        started = time.monotonic()
+        queue, drained = deliver(bot, [(1, 'hi')], chat_rate=100)
+        assert drained and queue.retried == 1
+        assert bot.sent[0][2] - started >= 1
+
+    def test_network_errors_are_retried(self, monkeypatch):
+        monkeypatch.setattr(delivery, 'RETRY_BASE', 0.01)
+        bot = FlakyBot([telegram.error.TimedOut(),
+                        telegram.error.NetworkError('reset')])
+        queue, drained = deliver(bot, [(1, 'hi')], chat_rate=100)
+        assert drained and queue.sent == 1 and queue.retried == 2
+
+    def test_permanent_errors_are_dropped(self):
+        bot = FlakyBot([telegram.error.BadRequest('chat not found'),
+                        telegram.error.Unauthorized('blocked')])
+        queue, drained = deliver(bot, [(1, 'a'), (2, 'b'), (3, 'c')],
+                                 chat_rate=100)
+        assert drained
+        assert queue.failed == 2 and queue.sent == 1
+
+    def test_dropped_messages_are_reported(self):
+        failed = []
+        bot = FlakyBot([telegram.error.BadRequest('chat not found')])
+        deliver(bot, [(1, 'a'), (2, 'b')], chat_rate=100,
+                on_failed=lambda chat_id, error: failed.append(
+                    (chat_id, type(error))
+                ))
+        assert failed == [(1, exceptions.DontSentMessage)]
+
+    def test_on_sent_error_does_not_stop_sender(self):
+        def on_sent():
+            raise RuntimeError('база заблокирована')
+
+        async def run():
+            queue = delivery.SendQueue(bot, senders=1, chat_rate=100)
+            queue.submit(1, 'a', on_sent)
+            queue.submit(2, 'b')
+            drained = await queue.join(5)
+            await queue.stop()
+            return drained
+
+        bot = FlakyBot()
+        assert asyncio.run(run())
+        assert [text for _, text, _ in bot.sent] == ['a', 'b']
+
@@ -0,0 +1,137 @@
+import asyncio
+
+import requests
+
+import digest
+import metrics
+import outbox
+import state
+from utils import FakeClock, RecordingBot, mock_get_with_data
+
+
+def texts(batches):
+    return [(chat_id, text) for chat_id, text, rows in batches]
+
+
+class TestDigest:
+
+    def test_first_message_is_immediate_rest_wait_for_window(self):
+        clock = FakeClock()
+        merger = digest.Digest(window=60, immediate=True, clock=clock)
+        assert texts(merger.add(1, 'a', 1)) == [(1, 'a')]
+        assert merger.add(1, 'b', 2) == []
+        assert merger.add(2, 'c', 3) == [(2, 'c', [3])]
+        clock.now = 10
+        assert merger.add(1, 'd', 4) == []
+        assert merger.next_deadline() == 60
+        clock.now = 60
+        (batch,) = merger.due()
+        assert batch[0] == 1 and batch[2] == [2, 4]
+        assert batch[1].splitlines() == [
+            digest.HEADER.format(count=2), '• b', '• d'
+        ]
+        assert merger.due() == [] and merger.next_deadline() is None
+
+    def test_without_immediate_whole_window_is_merged(self):
+        clock = FakeClock()
+        merger = digest.Digest(window=60, immediate=False, clock=clock)
+        assert merger.add(1, 'a') == [] and merger.add(1, 'b') == []
+        clock.now = 30
+        assert merger.due() == []
+        (batch,) = merger.flush()
+        assert batch[0] == 1 and batch[2] == []
+        assert 'a' in batch[1] and 'b' in batch[1]
+
+    def test_zero_window_passes_messages_through(self):
+        merger = digest.Digest(window=0)
+        assert merger.add(1, 'a', 7) == [(1, 'a', [7])]
+        assert merger.flush() == []
+
+    def test_reduction_ratio_is_counted_on_send(self):
+        messages = metrics.DIGEST_MESSAGES.labels().value
+        transitions = metrics.DIGEST_TRANSITIONS.labels().value
+        digest.render(['a', 'b', 'c', 'd'])
+        assert metrics.DIGEST_MESSAGES.labels().value == messages
+        box = outbox.Outbox()
+        for number in range(4):
+            box.add(1, {'id': number, 'status': 'approved'}, str(number))
+        box.drain(lambda chat_id, text: None, render=digest.render)
+        assert metrics.DIGEST_MESSAGES.labels().value == messages + 1
+        assert metrics.DIGEST_TRANSITIONS.labels().value == transitions + 4
+        assert 0 < metrics.send_reduction() < 1
+        assert 'digest_send_reduction_ratio' in metrics.render()
+
+
+def test_outbox_merges_pending_rows_per_chat(tmp_path):
+    store = state.StateStore(str(tmp_path / 'state.sqlite3'))
+    try:
+        for number, chat_id in enumerate((1, 2, 1), start=1):
+            store.enqueue(chat_id, {'id': number, 'status': 'approved'},
+                          f'hw{number}')
+        sent = []
+        box = outbox.Outbox(store)
+        assert box.drain(lambda chat_id, text: sent.append((chat_id, text)),
+                         render=digest.render) == 3
+        assert [chat_id for chat_id, _ in sent] == ['1', '2']
+        assert 'hw1' in sent[0][1] and 'hw3' in sent[0][1]
+        assert sent[1][1] == 'hw2'
+        assert store.pending_outbox(10) == []
+    finally:
+        store.close()
+
+
+def test_engine_sends_one_digest_per_chat(monkeypatch, random_timestamp):
+    import engine
+    monkeypatch.setattr(requests, 'get', mock_get_with_data({
+        'homeworks': [{'id': number, 'homework_name': f'hw{number}',
+                       'status': 'approved'} for number in range(3)],
+        'current_date': random_timestamp,
+    }))
+    bot = RecordingBot()
+    tenants = [engine.Tenant(token=f't{i}', chat_id=i, from_date=1)
+               for i in range(2)]
+    polling = engine.PollingEngine(bot, tenants)
+    polling.digest = digest.Digest(window=60, immediate=False)
+    try:
+        assert asyncio.run(polling.run_cycle()) == 2
+    finally:
+        polling.close()
+    assert sorted(chat_id for chat_id, _ in bot.sent) == [0, 1]
+    assert all(text.count('hw') == 3 for _, text in bot.sent)
+
+
+def test_memory_outbox_merges_per_chat():
+    box = outbox.Outbox()
+    box.add(1, {'id': 1, 'status': 'approved'}, 'a')
+    box.add(2, {'id': 2, 'status': 'approved'}, 'b')
+    box.add(1, {'id': 3, 'status': 'approved'}, 'c')
+    sent = []
+    assert box.drain(lambda chat_id, text: sent.append((chat_id, text)),
+                     render=digest.render) == 3
+    assert [chat_id for chat_id, _ in sent] == [1, 2]
+    assert sent[0][1].endswith('• a\n• c') and sent[1][1] == 'b'
+
+
+def test_shutdown_drain_merges_like_poll(homework_module):
+    import shutdown
+    box = outbox.Outbox()
+    box.add(1, {'id': 1, 'status': 'approved'}, 'a')
+    box.add(1, {'id': 2, 'status': 'approved'}, 'b')
+    bot = RecordingBot()
+    homework_module.finish(shutdown.Shutdown(), box, None, bot, digest.render)
+    assert len(bot.sent) == 1 and bot.sent[0][1].endswith('• a\n• b')
+
+
+def test_resent_notifications_are_counted(tmp_path):
+    import engine
+    store = state.StateStore(str(tmp_path / 'state.sqlite3'))
+    polling = engine.PollingEngine(RecordingBot(), [], store=store)
+    try:
+        store.enqueue(1, {'id': 1, 'status': 'approved'}, 'hw1')
+        store.flush()
+        messages = metrics.DIGEST_MESSAGES.labels().value
+        assert asyncio.run(polling.resend_pending()) == 1
+        assert metrics.DIGEST_MESSAGES.labels().value == messages + 1
+    finally:
+        polling.close()
+        store.close()
@@ -0,0 +1,195 @@
+import json
+import asyncio
+import threading
+
+import requests
+
+import utils
+from utils import RecordingBot, mock_get_with_data
+
+
+class TestEngine:
+
+    def test_load_tenants(self, tmp_path):
+        import engine
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps([
+            {'practicum_token': 'token-1', 'chat_id': 1},
+            {'practicum_token': 'token-2', 'chat_id': '2'},
+        ]))
+        tenants = engine.load_tenants(str(path), from_date=100)
+        assert [tenant.chat_id for tenant in tenants] == [1, '2']
+        assert tenants[0].headers == {'Authorization': 'OAuth token-1'}
+        assert all(tenant.from_date == 100 for tenant in tenants)
+
+    def test_cycle_sends_and_advances_from_date(self, monkeypatch,
+                                                random_timestamp):
+        import engine
+        requested = []
+
+        def mock_get(url, headers=None, params=None, **kwargs):
+            requested.append((headers['Authorization'], params['from_date']))
+            return mock_get_with_data({
+                'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+                'current_date': random_timestamp,
+            })(url)
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        bot = RecordingBot()
+        tenants = [engine.Tenant(token=f't{i}', chat_id=i, from_date=1)
+                   for i in range(5)]
+        polling = engine.PollingEngine(bot, tenants, concurrency=2)
+        try:
+            polled = asyncio.run(polling.run_cycle())
+        finally:
+            polling.close()
+        assert polled == 5
+        assert sorted(requested) == [(f'OAuth t{i}', 1) for i in range(5)]
+        assert sorted(chat_id for chat_id, _ in bot.sent) == list(range(5))
+        assert all(t.from_date == random_timestamp for t in tenants)
+
+    def test_tenant_error_does_not_stop_cycle(self, monkeypatch,
+                                              random_timestamp):
+        import engine
+
+        def mock_get(url, headers=None, params=None, **kwargs):
+            if headers['Authorization'] == 'OAuth broken':
+                raise requests.RequestException('Something wrong')
+            return mock_get_with_data({
+                'homeworks': [],
+                'current_date': random_timestamp,
+            })(url)
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        tenants = [engine.Tenant(token='broken', chat_id=1),
+                   engine.Tenant(token='ok', chat_id=2)]
+        polling = engine.PollingEngine(RecordingBot(), tenants)
+        try:
+            polled = asyncio.run(polling.run_cycle())
+        finally:
+            polling.close()
+        assert polled == 1
+        assert tenants[0].from_date == 0
+        assert tenants[1].from_date == random_timestamp
+
+    def test_new_error_is_sent_to_error_chat_at_once(self, monkeypatch):
+        import alerts
+        import engine
+        monkeypatch.setattr(alerts, 'ERROR_CHAT_ID', 'errors')
+        monkeypatch.setattr(requests, 'get', mock_get_with_data({
+            'homeworks': 'не список', 'current_date': 1,
+        }))
+        bot = RecordingBot()
+        tenants = [engine.Tenant(token=f't{i}', chat_id=i) for i in range(3)]
+        polling = engine.PollingEngine(bot, tenants)
+        try:
+            asyncio.run(polling.run_cycle())
+        finally:
+            polling.close()
+        assert [chat_id for chat_id, _ in bot.sent] == ['errors']
+        assert bot.sent[0][1].startswith(alerts.PREFIX)
+
+    def test_run_polls_tenants_on_schedule(self, monkeypatch,
+                                           random_timestamp):
+        import engine
+        import intervals
+        polls = []
+
+        def mock_get(url, headers=None, params=None, **kwargs):
+            polls.append(headers['Authorization'])
+            return mock_get_with_data({
+                'homeworks': [],
+                'current_date': random_timestamp,
+            })(url)
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        monkeypatch.setattr(engine, 'SCHEDULER_RESOLUTION', 0.001)
+        tenants = [engine.Tenant(token=f't{i}', chat_id=i) for i in range(3)]
+        for tenant in tenants:
+            tenant.interval = intervals.AdaptiveInterval(
+                base=0.02, active=0.02, cap=0.02, jitter=0
+            )
+        polling = engine.PollingEngine(RecordingBot(), tenants,
+                                       concurrency=2, retry_period=0.02)
+
+        async def run_briefly():
+            try:
+                await asyncio.wait_for(polling.run(), 0.3)
+            except asyncio.TimeoutError:
+                pass
+
+        try:
+            asyncio.run(run_briefly())
+        finally:
+            polling.close()
+        for i in range(3):
+            assert polls.count(f'OAuth t{i}') >= 3
+
+    def test_stats_expose_queue_depth_and_throughput(self, monkeypatch,
+                                                     random_timestamp):
+        import engine
+
+        monkeypatch.setattr(requests, 'get', mock_get_with_data({
+            'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+            'current_date': random_timestamp,
+        }))
+        tenants = [engine.Tenant(token=f't{i}', chat_id=i) for i in range(4)]
+        polling = engine.PollingEngine(RecordingBot(), tenants)
+        try:
+            asyncio.run(polling.run_cycle())
+        finally:
+            polling.close()
+        stats = polling.stats()
+        assert list(stats) == ['fetch', 'validate', 'render', 'send',
+                               'outbound']
+        assert stats['render']['processed'] == 4
+        assert stats['send']['processed'] == 4
+        assert stats['outbound']['processed'] == 4
+        assert all(values['depth'] == 0 for values in stats.values())
+        assert stats['fetch']['throughput'] > 0
+
+    def test_breaker_is_shared_between_tenants(self, monkeypatch):
+        import breaker
+        import engine
+        calls = []
+
+        def mock_get(*args, **kwargs):
+            calls.append(1)
+            raise requests.RequestException('Something wrong')
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        tenants = [engine.Tenant(token=f't{i}', chat_id=i)
+                   for i in range(10)]
+        polling = engine.PollingEngine(RecordingBot(), tenants,
+                                       concurrency=1)
+        polling.breaker = breaker.CircuitBreaker(failure_threshold=3)
+        try:
+            polled = asyncio.run(polling.run_cycle())
+        finally:
+            polling.close()
+        assert polled == 0
+        assert len(calls) == 3
+        assert polling.stats()['fetch']['failed'] == 10
+
+    def test_payload_is_parsed_off_the_loop_thread(self, monkeypatch,
+                                                   random_timestamp):
+        import engine
+        import payload
+        threads = []
+        parse = payload.parse
+
+        def recording_parse(content):
+            threads.append(threading.get_ident())
+            return parse(content)
+
+        monkeypatch.setattr(requests, 'get', mock_get_with_data({
+            'homeworks': [], 'current_date': random_timestamp,
+        }))
+        monkeypatch.setattr(payload, 'parse', recording_parse)
+        polling = engine.PollingEngine(RecordingBot(),
+                                       [engine.Tenant(token='t', chat_id=1)])
+        try:
+            assert asyncio.run(polling.run_cycle()) == 1
+        finally:
+            polling.close()
+        assert threads and threading.get_ident() not in threads
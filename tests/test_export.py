@@ -0,0 +1,153 @@
+import csv
+import json
+import random
+from http import HTTPStatus
+
+import pytest
+import requests
+
+import export
+import payload
+
+
+def history(token, size):
+    return {
+        'homeworks': [{'id': index, 'homework_name': f'{token} дз {index}',
+                       'status': 'approved', 'lesson_name': 'урок'}
+                      for index in range(size)],
+        'current_date': 1700000000,
+    }
+
+
+class StreamResponse:
+    def __init__(self, data, status_code=HTTPStatus.OK):
+        self.content = json.dumps(data, ensure_ascii=False).encode()
+        self.status_code = status_code
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), 7):
+            yield self.content[start:start + 7]
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def api(monkeypatch):
+    responses = []
+
+    def mock_get(url, headers=None, params=None, stream=False, **kwargs):
+        assert stream and params == {'from_date': 0}
+        token = headers['Authorization'].split()[1]
+        if token == 'broken':
+            response = StreamResponse({}, HTTPStatus.INTERNAL_SERVER_ERROR)
+        elif token == 'invalid':
+            response = StreamResponse({'homeworks': []})
+        elif token == 'nodate':
+            response = StreamResponse({'homeworks':
+                                       history(token, 5)['homeworks']})
+        else:
+            response = StreamResponse(history(token, 5))
+        responses.append(response)
+        return response
+
+    monkeypatch.setattr(requests, 'get', mock_get)
+    return responses
+
+
+class TestHomeworkStream:
+
+    def test_matches_json_for_any_chunking(self):
+        data = dict(history('t', 20), extra={'nested': [1, 2.5, None]})
+        content = json.dumps(data, ensure_ascii=False, indent=1).encode()
+        rng = random.Random(0)
+        for _ in range(50):
+            cuts = sorted(rng.sample(range(1, len(content)), 30))
+            chunks = [content[start:end] for start, end
+                      in zip([0] + cuts, cuts + [len(content)])]
+            stream = payload.HomeworkStream(chunks)
+            assert list(stream) == data['homeworks']
+            assert stream.envelope == dict(data, homeworks=[])
+
+    @pytest.mark.parametrize('content', [b'[]', b'{"homeworks": [1,',
+                                         b'{"homeworks" 1}'])
+    def test_malformed_response(self, content):
+        with pytest.raises((TypeError, ValueError)):
+            list(payload.HomeworkStream([content]))
+
+
+class TestExport:
+
+    def test_rows_are_written_in_bounded_chunks(self, api):
+        batches = []
+        tenants = export.load_tenants(
+            export.parse_args(['--token', 'a', '--token', 'b'])
+        )
+        results = export.export(tenants, batches.append, concurrency=2,
+                                chunk=2)
+        assert list(results.values()) == [None, None]
+        assert max(len(batch) for batch in batches) == 2
+        rows = [row for batch in batches for row in batch]
+        assert len(rows) == 10
+        assert {row['tenant'] for row in rows} == set(results)
+        assert all(response.closed for response in api)
+
+    def test_failures_are_reported_per_token(self, api):
+        tenants = export.load_tenants(export.parse_args(
+            ['--token', 'ok', '--token', 'broken', '--token', 'invalid']
+        ))
+        results = export.export(tenants, lambda rows: None)
+        errors = [type(error).__name__ if error else None
+                  for error in results.values()]
+        assert errors == [None, 'BadConnection', 'NoExpendKeysResponse']
+
+    def test_rows_of_invalid_response_are_not_written(self, api):
+        written = []
+        tenants = export.load_tenants(
+            export.parse_args(['--token', 'nodate', '--token', 'a'])
+        )
+        results = export.export(tenants, written.extend, chunk=2)
+        assert type(results[tenants[0].key]).__name__ == (
+            'NoExpendKeysResponse'
+        )
+        assert {row['tenant'] for row in written} == {tenants[1].key}
+
+    def test_writer_error_stops_export(self, api):
+        def write(rows):
+            raise OSError('Нет места на диске')
+
+        tenants = [export.engine.Tenant(token=str(index), chat_id=None)
+                   for index in range(4)]
+        with pytest.raises(OSError):
+            export.export(tenants, write, concurrency=1, chunk=1)
+
+    def test_main_writes_csv(self, api, tmp_path):
+        path = tmp_path / 'history.csv'
+        code = export.main(['--token', 'a', '--token', 'broken',
+                            '--output', str(path)])
+        assert code == 1
+        with open(path, encoding='utf-8', newline='') as file:
+            rows = list(csv.DictReader(file))
+        assert list(rows[0]) == export.FIELDS
+        assert [row['homework_name'] for row in rows] == [
+            f'a дз {index}' for index in range(5)
+        ]
+        assert [entry.name for entry in tmp_path.iterdir()] == ['history.csv']
+
+    def test_interrupted_export_keeps_previous_file(self, api, monkeypatch,
+                                                    tmp_path):
+        path = tmp_path / 'history.jsonl'
+        path.write_text('прошлая выгрузка')
+
+        def write(file):
+            def fail(rows):
+                raise OSError('Нет места на диске')
+            return fail
+
+        monkeypatch.setitem(export.WRITERS, 'jsonl', write)
+        with pytest.raises(OSError):
+            export.main(['--token', 'a', '--output', str(path)])
+        assert path.read_text() == 'прошлая выгрузка'
+        assert [entry.name for entry in tmp_path.iterdir()] == [path.name]
+
@@ -0,0 +1,30 @@
+import http_client
+
+
+class TestHttpClient:
+
+    def test_session_is_shared_and_pooled(self, monkeypatch):
+        monkeypatch.undo()
+        http_client.close()
+        session = http_client.get_session()
+        try:
+            assert http_client.get_session() is session
+            adapter = session.get_adapter('https://practicum.yandex.ru/')
+            assert adapter._pool_maxsize == http_client.POOL_MAXSIZE
+        finally:
+            http_client.close()
+
+    def test_configure_recreates_session(self, monkeypatch):
+        monkeypatch.undo()
+        old = http_client.get_session()
+        new = http_client.configure(pool_maxsize=7)
+        try:
+            assert new is not old
+            assert http_client.get_session() is new
+            assert new.get_adapter('http://localhost/')._pool_maxsize == 7
+        finally:
+            http_client.close()
+
+    def test_timeout_has_connect_and_read_parts(self):
+        assert http_client.TIMEOUT == (http_client.CONNECT_TIMEOUT,
+                                       http_client.READ_TIMEOUT)
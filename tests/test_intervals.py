@@ -0,0 +1,53 @@
+import random
+
+from backoff import exponential_delay, jittered
+from intervals import AdaptiveInterval
+
+DAY = 24 * 60 * 60
+
+
+def make_interval(**kwargs):
+    params = {'base': 600, 'active': 120, 'cap': 3 * 60 * 60, 'jitter': 0}
+    params.update(kwargs)
+    return AdaptiveInterval(**params)
+
+
+class TestAdaptiveInterval:
+
+    def test_reviewing_is_polled_fast(self):
+        interval = make_interval()
+        for _ in range(10):
+            assert interval.next_delay(['approved', 'reviewing'],
+                                       changed=False) == 120
+
+    def test_idle_tenant_backs_off_up_to_cap(self):
+        interval = make_interval()
+        delays = [interval.next_delay(['approved'], changed=False)
+                  for _ in range(8)]
+        assert delays[:4] == [600, 1200, 2400, 4800]
+        assert max(delays) == 3 * 60 * 60
+
+    def test_transition_resets_backoff(self):
+        interval = make_interval()
+        for _ in range(5):
+            interval.next_delay([], changed=False)
+        assert interval.next_delay(['rejected'], changed=True) == 600
+
+    def test_idle_day_costs_order_of_magnitude_fewer_polls(self):
+        interval = make_interval()
+        elapsed, polls = 0, 0
+        while elapsed < DAY:
+            elapsed += interval.next_delay(['approved'], changed=False)
+            polls += 1
+        assert polls * 10 <= DAY // 600
+
+
+def test_exponential_delay_handles_huge_attempts():
+    assert exponential_delay(600, 1000, 3600) == 3600
+
+
+def test_jitter_is_symmetric_and_bounded():
+    rng = random.Random(1)
+    samples = [jittered(100, 0.1, rng) for _ in range(10_000)]
+    assert 90 <= min(samples) and max(samples) <= 110
+    assert abs(sum(samples) / len(samples) - 100) < 0.5
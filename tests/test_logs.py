@@ -0,0 +1,48 @@
+import io
+import json
+import logging
+
+import logs
+
+
+def make_logger(name, **kwargs):
+    logger = logging.getLogger(f'test_logs.{name}')
+    logger.handlers.clear()
+    logger.propagate = False
+    listener = logs.setup(logger, **kwargs)
+    stream = io.StringIO()
+    handler = (listener.handlers[0] if listener is not None
+               else logger.handlers[0])
+    handler.setStream(stream)
+    return logger, listener, stream
+
+
+class TestLogs:
+
+    def test_json_output_has_tenant(self):
+        logger, _, stream = make_logger('json', log_format='json',
+                                        use_queue=False)
+        logger.error('Чат %s: %s', 1, 'ошибка', extra={'tenant': 'abc'})
+        record = json.loads(stream.getvalue())
+        assert record['message'] == 'Чат 1: ошибка'
+        assert record['tenant'] == 'abc'
+        assert record['level'] == 'ERROR'
+
+    def test_queue_mode_writes_in_background(self):
+        logger, listener, stream = make_logger('queue', log_format='text',
+                                               use_queue=True)
+        assert isinstance(logger.handlers[0], logs.DeferredQueueHandler)
+        logger.debug('Опрос %d', 42)
+        listener.stop()
+        assert 'Опрос 42' in stream.getvalue()
+
+    def test_debug_lines_are_sampled_per_call_site(self):
+        logger, _, stream = make_logger('sample', log_format='json',
+                                        use_queue=False, sample=10)
+        for _ in range(25):
+            logger.debug('Повтор')
+        logger.info('Важное')
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        assert [line['message'] for line in lines] == ['Повтор'] * 3 + [
+            'Важное']
+        assert lines[0]['sampled'] == 10
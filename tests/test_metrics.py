@@ -0,0 +1,72 @@
+import re
+import urllib.request
+
+import pytest
+import requests
+
+import metrics
+import utils
+
+
+def validation_failures(exception):
+    return metrics.VALIDATION_FAILURES.labels(exception).value
+
+
+class TestMetrics:
+
+    def test_counter_and_gauge_render(self):
+        registry = []
+        counter = metrics.Counter('errors_total', 'Errors.', ('kind',),
+                                  registry=registry)
+        gauge = metrics.Gauge('in_flight', 'In flight.', registry=registry)
+        counter.labels('a"b').inc(2)
+        gauge.set(3)
+        text = metrics.render(registry)
+        assert '# TYPE errors_total counter' in text
+        assert 'errors_total{kind="a\\"b"} 2' in text
+        assert 'in_flight 3' in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = []
+        histogram = metrics.Histogram('latency_seconds', 'Latency.',
+                                      buckets=(0.1, 1), registry=registry)
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value)
+        text = metrics.render(registry)
+        assert 'latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{le="1"} 2' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+        assert 'latency_seconds_count 3' in text
+        assert 'latency_seconds_sum 5.55' in text
+
+    def test_validation_failures_by_exception_class(self, homework_module):
+        before = validation_failures('UnknownStatus')
+        with pytest.raises(Exception):
+            homework_module.parse_status({'homework_name': 'hw',
+                                          'status': 'unknown'})
+        assert validation_failures('UnknownStatus') == before + 1
+
+    def test_api_latency_is_observed(self, monkeypatch, homework_module,
+                                     random_timestamp):
+        def mock_get(*args, **kwargs):
+            assert metrics.API_IN_FLIGHT.labels().value == 1
+            return utils.MockResponseGET(random_timestamp=random_timestamp)
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        count = metrics.API_LATENCY.labels().counts[:]
+        homework_module.get_api_answer(random_timestamp)
+        assert sum(metrics.API_LATENCY.labels().counts) == sum(count) + 1
+        assert metrics.API_IN_FLIGHT.labels().value == 0
+
+    def test_http_server_serves_metrics(self):
+        server = metrics.start_http_server(0)
+        try:
+            port = server.server_address[1]
+            with urllib.request.urlopen(
+                    f'http://127.0.0.1:{port}/metrics') as response:
+                body = response.read().decode()
+            assert '# TYPE practicum_request_seconds histogram' in body
+            assert re.search(r'^telegram_send_failures_total \d+$', body,
+                             re.MULTILINE)
+        finally:
+            server.shutdown()
@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+import outbox
+import state
+from utils import RecordingBot
+
+HW1 = {'id': 1, 'homework_name': 'hw1', 'status': 'approved',
+       'date_updated': '2024-01-01T00:00:00Z'}
+HW2 = {'id': 2, 'homework_name': 'hw2', 'status': 'rejected',
+       'date_updated': '2024-01-02T00:00:00Z'}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'state.sqlite3')
+
+
+class FlakySend:
+    def __init__(self, fail_on=()):
+        self.sent = []
+        self.fail_on = set(fail_on)
+
+    def __call__(self, chat_id, message):
+        if message in self.fail_on:
+            self.fail_on.discard(message)
+            raise ConnectionError('Telegram недоступен')
+        self.sent.append((chat_id, message))
+
+
+class TestOutbox:
+
+    def test_rows_are_committed_with_checkpoint(self, path):
+        store = state.StateStore(path, flush_every=1)
+        reader = state.StateStore(path)
+        try:
+            store.enqueue(1, HW1, 'first')
+            assert reader.pending_outbox(10) == []
+            store.checkpoint('tenant', 100, {'1': 'approved'})
+            assert reader.pending_outbox(10) == [(1, '1', 'first')]
+        finally:
+            store.close()
+            reader.close()
+
+    def test_duplicates_are_not_added(self, path):
+        store = state.StateStore(path)
+        try:
+            assert store.enqueue(1, HW1, 'first') == 1
+            assert store.enqueue(1, HW1, 'again') == 1
+            assert store.pending_outbox(10) == [(1, '1', 'first')]
+            store.mark_delivered([1])
+            assert store.enqueue(1, HW1, 'after delivery') is None
+            assert store.enqueue(1, dict(HW1, status='rejected'), 'new')
+        finally:
+            store.close()
+
+    def test_failed_send_is_retried_after_restart(self, path):
+        store = state.StateStore(path, flush_every=1)
+        box = outbox.Outbox(store, batch=1)
+        box.add(1, HW1, 'first')
+        box.add(1, HW2, 'second')
+        store.checkpoint('tenant', 100)
+        send = FlakySend(fail_on={'second'})
+        with pytest.raises(ConnectionError):
+            box.drain(send)
+        store.close()
+
+        store = state.StateStore(path)
+        try:
+            assert outbox.Outbox(store, batch=1).drain(send) == 1
+            assert outbox.Outbox(store).drain(send) == 0
+        finally:
+            store.close()
+        assert send.sent == [('1', 'first'), ('1', 'second')]
+
+    def test_memory_outbox_keeps_order_and_retries(self):
+        box = outbox.Outbox()
+        box.add(1, HW1, 'first')
+        box.add(1, HW1, 'first')
+        box.add(2, HW2, 'second')
+        send = FlakySend(fail_on={'second'})
+        with pytest.raises(ConnectionError):
+            box.drain(send)
+        assert box.drain(send) == 1
+        assert send.sent == [(1, 'first'), (2, 'second')]
+
+    def test_engine_resends_pending_rows(self, path):
+        import engine
+        store = state.StateStore(path)
+        store.enqueue(1, HW1, 'first')
+        store.enqueue(2, HW2, 'second')
+        store.flush()
+        bot = RecordingBot()
+        polling = engine.PollingEngine(bot, [], store=store)
+
+        async def resend():
+            queued = await polling.resend_pending()
+            await polling.outbound.join()
+            return queued
+
+        try:
+            assert asyncio.run(resend()) == 2
+        finally:
+            polling.close()
+        assert sorted(bot.sent) == [('1', 'first'), ('2', 'second')]
+        assert store.pending_outbox(10) == []
+        store.close()
+
+
+def test_engine_resends_row_left_by_failed_render(monkeypatch, path):
+    import requests
+
+    import engine
+    from utils import mock_get_with_data
+    broken = dict(HW2, status='unknown')
+    monkeypatch.setattr(requests, 'get', mock_get_with_data({
+        'homeworks': [broken, HW1], 'current_date': 100,
+    }))
+    store = state.StateStore(path)
+    tenant = engine.Tenant(token='t', chat_id=1, from_date=1)
+    bot = RecordingBot()
+    polling = engine.PollingEngine(bot, [tenant], store=store)
+
+    async def retry():
+        assert await polling.run_cycle() == 0
+        assert store.pending_outbox(10) == []
+        assert store.enqueue(1, HW1, 'left by a crash') == 1
+        monkeypatch.setattr(requests, 'get', mock_get_with_data({
+            'homeworks': [HW1], 'current_date': 100,
+        }))
+        assert await polling.run_cycle() == 1
+
+    try:
+        asyncio.run(retry())
+    finally:
+        polling.close()
+    assert len(bot.sent) == 1 and 'hw1' in bot.sent[0][1]
+    assert store.pending_outbox(10) == []
+    store.close()
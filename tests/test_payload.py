@@ -0,0 +1,74 @@
+import json
+import asyncio
+
+import pytest
+import requests
+
+import exceptions
+import payload
+from utils import RecordingBot, mock_get_with_data
+
+
+def encode(homeworks, current_date=100):
+    return json.dumps({'homeworks': homeworks,
+                       'current_date': current_date}).encode()
+
+
+class TestPayload:
+
+    def test_decode_without_fast_decoder(self, monkeypatch):
+        monkeypatch.setattr(payload, 'orjson', None)
+        assert payload.decode(encode([])) == {'homeworks': [],
+                                              'current_date': 100}
+
+    def test_fingerprint_ignores_current_date(self):
+        first, date = payload.fingerprint(encode([], current_date=1))
+        second, _ = payload.fingerprint(encode([], current_date=2))
+        changed, _ = payload.fingerprint(encode([{'id': 1}], current_date=2))
+        assert date == 1
+        assert first == second
+        assert first != changed
+
+    @pytest.mark.parametrize('response, error', [
+        ([], TypeError),
+        ({'homeworks': []}, exceptions.NoExpendKeysResponse),
+        ({'homeworks': {}, 'current_date': 1}, TypeError),
+        ({'homeworks': ['hw'], 'current_date': 1}, TypeError),
+        ({'homeworks': [{'homework_name': 'hw', 'status': 'unknown'}],
+          'current_date': 1}, exceptions.UnknownStatus),
+        ({'homeworks': [{'status': 'approved'}], 'current_date': 1},
+         exceptions.MissingHomeworkName),
+    ])
+    def test_validator_rejects_invalid_payload(self, response, error):
+        with pytest.raises(error):
+            payload.validate(response)
+
+    def test_engine_skips_unchanged_payload(self, monkeypatch):
+        import engine
+        dates = iter(range(1, 10))
+        homeworks = [{'id': 1, 'homework_name': 'hw', 'status': 'approved'}]
+
+        def mock_get(*args, **kwargs):
+            return mock_get_with_data({'homeworks': homeworks,
+                                       'current_date': next(dates)})()
+
+        parsed = []
+        parse = payload.parse
+        monkeypatch.setattr(requests, 'get', mock_get)
+        monkeypatch.setattr(payload, 'parse',
+                            lambda content: parsed.append(1) or parse(content))
+        bot = RecordingBot()
+        tenant = engine.Tenant(token='t', chat_id=1)
+        polling = engine.PollingEngine(bot, [tenant])
+
+        async def cycles():
+            for _ in range(3):
+                await polling.run_cycle()
+
+        try:
+            asyncio.run(cycles())
+        finally:
+            polling.close()
+        assert len(parsed) == 1
+        assert len(bot.sent) == 1
+        assert tenant.from_date == 3
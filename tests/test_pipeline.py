@@ -0,0 +1,84 @@
+import asyncio
+
+from pipeline import Pipeline, Stage
+
+
+async def double(item):
+    return [item, item]
+
+
+class TestPipeline:
+
+    def test_items_flow_through_stages(self):
+        collected = []
+
+        async def collect(item):
+            collected.append(item)
+            return []
+
+        async def run():
+            pipeline = Pipeline([Stage('double', double, workers=2),
+                                 Stage('collect', collect)])
+            for item in range(3):
+                await pipeline.put(item)
+            await pipeline.join()
+            await pipeline.stop()
+            return pipeline.stats()
+
+        stats = asyncio.run(run())
+        assert sorted(collected) == [0, 0, 1, 1, 2, 2]
+        assert stats['double']['processed'] == 3
+        assert stats['collect']['processed'] == 6
+        assert stats['collect']['depth'] == 0
+
+    def test_errors_are_reported_and_do_not_stop_stage(self):
+        errors = []
+
+        async def fail_on_odd(item):
+            if item % 2:
+                raise ValueError(item)
+            return []
+
+        async def run():
+            pipeline = Pipeline(
+                [Stage('check', fail_on_odd)],
+                on_error=lambda stage, item, error: errors.append(
+                    (stage, item)
+                )
+            )
+            for item in range(4):
+                await pipeline.put(item)
+            await pipeline.join()
+            await pipeline.stop()
+            return pipeline.stats()
+
+        stats = asyncio.run(run())
+        assert errors == [('check', 1), ('check', 3)]
+        assert stats['check']['failed'] == 2
+        assert stats['check']['processed'] == 2
+
+    def test_slow_stage_applies_backpressure(self):
+        release = None
+
+        async def slow(item):
+            await release.wait()
+            return []
+
+        async def run():
+            nonlocal release
+            release = asyncio.Event()
+            pipeline = Pipeline([Stage('fast', double, maxsize=1),
+                                 Stage('slow', slow, maxsize=1)])
+            accepted = 0
+            for item in range(10):
+                try:
+                    await asyncio.wait_for(pipeline.put(item), 0.05)
+                except asyncio.TimeoutError:
+                    break
+                accepted += 1
+            release.set()
+            await pipeline.join()
+            await pipeline.stop()
+            return accepted
+
+        assert asyncio.run(run()) < 10
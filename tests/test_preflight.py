@@ -0,0 +1,81 @@
+import os
+import sys
+import json
+import subprocess
+
+import preflight
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_BUDGET_MS = 150
+HEAVY_MODULES = ('telegram', 'requests', 'urllib3', 'http.server')
+
+
+def run_python(*args, **env):
+    return subprocess.run(
+        [sys.executable, *args], cwd=ROOT, capture_output=True, text=True,
+        env={**os.environ, 'PRACTICUM_TOKEN': 'token', 'TELEGRAM_TOKEN':
+             '123:abc', 'TELEGRAM_CHAT_ID': '1', **env}, timeout=60
+    )
+
+
+def import_times(module, runs=3):
+    """Возвращает {модуль: суммарное время импорта в мкс}.
+
+    Из ``runs`` запусков берётся самый быстрый: так на загруженной
+    машине замер меньше зависит от соседних процессов.
+    """
+    times = {}
+    for _ in range(runs):
+        result = run_python('-X', 'importtime', '-c', f'import {module}')
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line.split('|')
+            times[name.strip()] = min(int(cumulative),
+                                      times.get(name.strip(), int(cumulative)))
+    return times
+
+
+class TestPreflight:
+
+    def test_check_passes_without_importing_telegram(self):
+        result = run_python('homework.py', '--check')
+        assert result.returncode == 0, result.stderr
+        result = run_python('-c', 'import sys, preflight; '
+                            'preflight.run_checks(); '
+                            'print("telegram" in sys.modules)')
+        assert result.stdout.strip() == 'False'
+
+    def test_check_reports_problems(self):
+        result = run_python('preflight.py', TELEGRAM_TOKEN='bad token',
+                            HTTP_READ_TIMEOUT='abc')
+        assert result.returncode == 1
+        assert 'http_client' in result.stderr
+
+    def test_token_and_file_checks(self, monkeypatch, tmp_path,
+                                   homework_module):
+        monkeypatch.setattr(homework_module, 'TELEGRAM_TOKEN', 'bad token')
+        monkeypatch.setattr(homework_module, 'TELEGRAM_CHAT_ID', 'chat')
+        monkeypatch.setattr(homework_module, 'PRACTICUM_TOKEN', None)
+        assert len(preflight.check_tokens()) == 3
+        tenants = tmp_path / 'tenants.json'
+        tenants.write_text(json.dumps([{'practicum_token': 't'}]))
+        assert len(preflight.check_tenants_file(str(tenants))) == 1
+        assert preflight.check_state_db(str(tmp_path / 'state.db')) == []
+        assert preflight.check_state_db('/missing/dir/state.db')
+        assert preflight.check_metrics_port('70000')
+        assert preflight.check_writable('RECORD_CASSETTE',
+                                        '/missing/dir/cassette.jsonl')
+
+
+class TestImportTime:
+
+    def test_homework_import_is_light(self):
+        times = import_times('homework')
+        assert not [name for name in times if name in HEAVY_MODULES]
+        assert times['homework'] / 1000 < IMPORT_BUDGET_MS
+
+    def test_engine_does_not_import_telegram(self):
+        times = import_times('engine')
+        assert 'telegram' not in times
+        assert 'requests' not in times
@@ -0,0 +1,124 @@
+import os
+import time
+import asyncio
+import pstats
+import signal
+import inspect
+import threading
+
+import pytest
+import requests
+
+import metrics
+import profiling
+from utils import RecordingBot, mock_get_with_data
+
+
+def busy_loop(stopped):
+    while not stopped.is_set():
+        sum(range(100))
+
+
+@pytest.fixture
+def restore_signals():
+    handlers = {signum: signal.getsignal(signum)
+                for signum in (signal.SIGUSR1, signal.SIGALRM)}
+    yield
+    signal.setitimer(signal.ITIMER_REAL, 0)
+    for signum, handler in handlers.items():
+        signal.signal(signum, handler)
+
+
+class TestFunctionTimers:
+
+    def test_timed_functions_keep_signature(self, homework_module):
+        for name in ('get_api_answer', 'check_response', 'parse_status',
+                     'send_message'):
+            func = getattr(homework_module, name)
+            assert func.__doc__
+            assert func.__wrapped__ is not None
+        assert list(inspect.signature(homework_module.parse_status)
+                    .parameters) == ['homework']
+
+    def test_calls_and_errors_are_timed(self):
+        histogram = metrics.Histogram('test_function_seconds', 'Тест.',
+                                      ('function',), registry=[])
+
+        @metrics.timed(histogram, 'fail')
+        def fail():
+            raise ValueError
+
+        @metrics.timed(histogram, 'ok')
+        def ok():
+            return 1
+
+        assert ok() == 1
+        with pytest.raises(ValueError):
+            fail()
+        totals = metrics.totals(histogram)
+        assert totals[('ok',)][0] == 1 and totals[('fail',)][0] == 1
+
+    def test_engine_functions_share_labels(self, monkeypatch):
+        import engine
+        before = metrics.totals(metrics.FUNCTION_LATENCY)
+        monkeypatch.setattr(requests, 'get', mock_get_with_data({
+            'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+            'current_date': 1,
+        }))
+        polling = engine.PollingEngine(
+            RecordingBot(), [engine.Tenant(token='t', chat_id=1)]
+        )
+        try:
+            asyncio.run(polling.run_cycle())
+        finally:
+            polling.close()
+        after = metrics.totals(metrics.FUNCTION_LATENCY)
+        for name in ('get_api_answer', 'check_response', 'parse_status',
+                     'send_message'):
+            assert after[(name,)][0] == before.get((name,), (0, 0))[0] + 1
+
+
+class TestProfiler:
+
+    def test_sampler_collapses_stacks_of_other_threads(self, tmp_path):
+        stopped = threading.Event()
+        worker = threading.Thread(target=busy_loop, args=(stopped,),
+                                  name='worker')
+        worker.start()
+        profiler = profiling.Profiler('sample', seconds=0,
+                                      directory=str(tmp_path),
+                                      interval=0.001)
+        try:
+            assert profiler.toggle() is None and profiler.running
+            time.sleep(0.1)
+            path = profiler.toggle()
+        finally:
+            stopped.set()
+            worker.join()
+        assert not profiler.running and path.endswith('.collapsed')
+        with open(path, encoding='utf-8') as file:
+            stacks = [line.rsplit(' ', 1) for line in file]
+        assert any(stack.startswith('worker;')
+                   and stack.endswith('test_profiling.py:busy_loop')
+                   for stack, count in stacks)
+        assert all(int(count) > 0 for stack, count in stacks)
+
+    def test_signal_starts_capture_and_alarm_stops_it(self, tmp_path,
+                                                      restore_signals):
+        profiler = profiling.Profiler('cprofile', seconds=0.2,
+                                      directory=str(tmp_path))
+        assert profiler.install('SIGUSR1')
+        os.kill(os.getpid(), signal.SIGUSR1)
+        assert profiler.running
+        deadline = time.monotonic() + 5
+        while profiler.running and time.monotonic() < deadline:
+            sum(range(1000))
+        assert not profiler.running
+        (name,) = os.listdir(tmp_path)
+        assert name.endswith('.pstats')
+        stats = pstats.Stats(str(tmp_path / name))
+        assert any(func == 'sum' or func.endswith('sum>')
+                   for _, _, func in stats.stats)
+
+    def test_unknown_signal_is_not_installed(self):
+        assert not profiling.Profiler().install('SIGNOPE')
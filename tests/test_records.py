@@ -0,0 +1,62 @@
+import pytest
+
+import engine
+import exceptions
+import records
+import state
+from transitions import TransitionTracker
+
+HW = {'id': 1, 'homework_name': 'hw1', 'status': 'approved',
+      'date_updated': '2024-01-01T00:00:00Z', 'reviewer': {'id': 7}}
+
+
+class TestRecords:
+
+    def test_statuses_are_interned_strings(self, homework_module):
+        status = records.intern_status('approved')
+        assert status is records.Status.approved
+        assert status == 'approved' and f'{status}' == 'approved'
+        assert homework_module.HOMEWORK_VERDICTS[status]
+        assert records.intern_status('unknown') == 'unknown'
+        assert [item.value for item in records.Status] == list(
+            homework_module.HOMEWORK_VERDICTS
+        )
+
+    def test_homework_is_accepted_by_existing_functions(self,
+                                                        homework_module):
+        record = records.Homework.from_dict(HW)
+        assert record.status is records.Status.approved
+        assert record.get('reviewer') is None
+        assert record['date_updated'] == HW['date_updated']
+        with pytest.raises(KeyError):
+            record['reviewer_comment']
+        assert homework_module.parse_status(record) == (
+            homework_module.parse_status(HW)
+        )
+        assert state.homework_key(record) == '1'
+        with pytest.raises(exceptions.UnknownStatus):
+            homework_module.parse_status(
+                records.Homework.from_dict(dict(HW, status='unknown'))
+            )
+
+    def test_transitions_keep_interned_statuses(self):
+        tracker = TransitionTracker({'1': 'reviewing'})
+        found = records.find_transitions(tracker, [HW])
+        assert found == [records.Transition(records.Homework.from_dict(HW),
+                                            'reviewing', 'approved')]
+        tracker.mark(found[0].homework)
+        assert tracker.statuses['1'] is records.Status.approved
+        assert records.find_transitions(tracker, [HW]) == []
+
+    def test_tenant_is_slotted(self, tmp_path):
+        tenant = engine.Tenant(token='t', chat_id=1)
+        assert not hasattr(tenant, '__dict__')
+        assert tenant.headers == {'Authorization': 'OAuth t'}
+        store = state.StateStore(str(tmp_path / 'state.db'))
+        try:
+            store.checkpoint(tenant.key, 1, {'1': records.Status.approved})
+            store.flush()
+            assert engine.restore_tenants([tenant], store) == 1
+        finally:
+            store.close()
+        assert tenant.tracker.statuses['1'] is records.Status.approved
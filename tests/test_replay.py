@@ -0,0 +1,169 @@
+import json
+import asyncio
+import time
+from http import HTTPStatus
+
+import pytest
+
+import http_client
+import intervals
+import replay
+import state
+
+START = 1700000000.0
+HOUR = 60 * 60
+GET_SESSION = http_client.get_session
+
+
+@pytest.fixture(autouse=True)
+def shared_session(monkeypatch):
+    # Воспроизведение подменяет общую сессию http_client, а не requests.
+    monkeypatch.setattr(http_client, 'get_session', GET_SESSION)
+
+
+def body(at, status=None):
+    homeworks = [] if status is None else [{
+        'id': 1, 'homework_name': 'hw1', 'status': status,
+        'lesson_name': 'Урок 1',
+        'date_updated': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(at)),
+    }]
+    return json.dumps({'homeworks': homeworks, 'current_date': int(at)})
+
+
+def entry(tenant, at, status=None):
+    return {'at': at, 'tenant': tenant, 'from_date': 0,
+            'status': HTTPStatus.OK, 'body': body(at, status)}
+
+
+def cassette(tenants=2):
+    entries = []
+    for number in range(tenants):
+        tenant = f'tenant-{number}'
+        entries += [entry(tenant, START),
+                    entry(tenant, START + (number + 1) * HOUR, 'reviewing'),
+                    entry(tenant, START + 30 * HOUR, 'approved')]
+    return replay.Cassette(entries)
+
+
+class FakeSession:
+    def __init__(self):
+        self.closed = False
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        content = body(params['from_date']).encode()
+        return replay.Response(HTTPStatus.OK, content)
+
+    def close(self):
+        self.closed = True
+
+
+class TestVirtualTime:
+
+    def test_timers_do_not_wait(self):
+        clock = replay.VirtualClock(START)
+        loop = replay.VirtualEventLoop(clock)
+
+        async def scenario():
+            await asyncio.sleep(30 * 24 * HOUR)
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(asyncio.Event().wait(), HOUR)
+            return await loop.run_in_executor(None, sum, [1, 2])
+
+        try:
+            started = time.perf_counter()
+            assert loop.run_until_complete(scenario()) == 3
+        finally:
+            loop.close()
+        assert time.perf_counter() - started < 1
+        assert clock.time() == START + 30 * 24 * HOUR + HOUR
+
+
+class TestCassette:
+
+    def test_recorded_responses_are_replayed_by_time(self, tmp_path):
+        path = str(tmp_path / 'cassette.jsonl')
+        clock = iter([START, START + HOUR])
+        session = FakeSession()
+        recorder = replay.Recorder(session, path, clock=lambda: next(clock))
+        for from_date in (1, 2):
+            recorder.get('url', headers={'Authorization': 'OAuth secret'},
+                         params={'from_date': from_date})
+        recorder.close()
+        assert session.closed
+        with open(path, encoding='utf-8') as file:
+            assert 'secret' not in file.read()
+
+        loaded = replay.Cassette.load(path)
+        assert loaded.tenants == [state.tenant_key('secret')]
+        assert (loaded.start, loaded.end) == (START, START + HOUR)
+        now = START + HOUR / 2
+        player = replay.Player(loaded, lambda: now)
+        headers = {'Authorization': 'OAuth secret'}
+        assert player.get('url', headers=headers).json()['current_date'] == 1
+        now = START + 2 * HOUR
+        assert player.get('url', headers=headers).json()['current_date'] == 2
+        unknown = player.get('url', headers={'Authorization': 'OAuth x'})
+        assert unknown.status_code == HTTPStatus.UNAUTHORIZED
+
+
+class TestReplay:
+
+    def test_engine_sends_transitions_in_virtual_time(self):
+        report = replay.replay(cassette(), until=START + 2 * 24 * HOUR)
+        assert report.simulated == 2 * 24 * HOUR
+        assert report.polls == report.requests > 0
+        by_chat = {}
+        for at, chat_id, text in report.messages:
+            by_chat.setdefault(chat_id, []).append((at, text))
+        for number in range(2):
+            (reviewing_at, reviewing), (approved_at, approved) = by_chat[
+                f'tenant-{number}'
+            ]
+            assert 'взята на проверку' in reviewing
+            assert 'всё понравилось' in approved
+            # Пока работа на проверке, опрос идёт раз в ACTIVE_PERIOD.
+            assert 0 <= approved_at - (START + 30 * HOUR) <= (
+                intervals.ACTIVE_PERIOD * 1.5
+            )
+            assert reviewing_at >= START + (number + 1) * HOUR
+
+    def test_sparse_polling_does_not_lose_transitions(self):
+        import engine
+        recorded = replay.Cassette([
+            entry('tenant-0', START), entry('tenant-0', START + HOUR,
+                                            'approved'),
+            entry('tenant-0', START + 2 * HOUR),
+        ])
+        tenant = engine.Tenant(
+            token='tenant-0', chat_id=0, from_date=int(START),
+            interval=intervals.AdaptiveInterval(base=3 * HOUR,
+                                                active=3 * HOUR,
+                                                cap=3 * HOUR)
+        )
+        report = replay.replay(recorded, [tenant], until=START + 4 * HOUR)
+        assert report.requests == 2
+        assert [text for _, _, text in report.messages] == [
+            replay.homework.HOMEWORK_VERDICTS['approved'].join(
+                ['Изменился статус проверки работы "hw1". ', '']
+            )
+        ]
+        assert report.coverage == 1.0
+
+    def test_replay_is_deterministic(self):
+        first = replay.replay(cassette(), seed=1)
+        second = replay.replay(cassette(), seed=1)
+        assert first.messages == second.messages
+        assert first.polls == second.polls
+
+    def test_main_writes_messages(self, tmp_path, capsys):
+        source = tmp_path / 'cassette.jsonl'
+        source.write_text(''.join(
+            json.dumps(entry('tenant-0', at, status)) + '\n'
+            for at, status in [(START, None), (START + HOUR, 'approved')]
+        ), encoding='utf-8')
+        messages = tmp_path / 'messages.jsonl'
+        assert replay.main([str(source), '--days', '1',
+                            '--messages', str(messages)]) == 0
+        assert 'сообщений: 1' in capsys.readouterr().out
+        lines = messages.read_text(encoding='utf-8').splitlines()
+        assert json.loads(lines[0])['chat'] == 'tenant-0'
@@ -0,0 +1,44 @@
+from scheduler import PollScheduler
+
+
+class TestPollScheduler:
+
+    def test_pop_due_returns_batch_within_resolution(self):
+        poll_scheduler = PollScheduler(resolution=1)
+        poll_scheduler.schedule('a', 10)
+        poll_scheduler.schedule('b', 10.5)
+        poll_scheduler.schedule('c', 12)
+        assert poll_scheduler.pop_due(5) == []
+        assert poll_scheduler.pop_due(9.5) == ['a', 'b']
+        assert poll_scheduler.next_deadline() == 12
+        assert len(poll_scheduler) == 1
+
+    def test_reschedule_replaces_old_deadline(self):
+        poll_scheduler = PollScheduler(resolution=0)
+        poll_scheduler.schedule('a', 10)
+        poll_scheduler.schedule('a', 100)
+        assert poll_scheduler.next_deadline() == 100
+        assert poll_scheduler.pop_due(50) == []
+        assert poll_scheduler.pop_due(100) == ['a']
+        assert len(poll_scheduler) == 0
+
+    def test_cancel(self):
+        poll_scheduler = PollScheduler()
+        poll_scheduler.schedule('a', 1)
+        poll_scheduler.cancel('a')
+        assert poll_scheduler.next_deadline() is None
+        assert poll_scheduler.pop_due(10) == []
+
+    def test_spread_is_uniform(self):
+        poll_scheduler = PollScheduler(resolution=0)
+        poll_scheduler.spread(range(600), period=600, start=0)
+        per_second = [len(poll_scheduler.pop_due(second))
+                      for second in range(600)]
+        assert per_second == [1] * 600
+
+    def test_stale_entries_are_compacted(self):
+        poll_scheduler = PollScheduler()
+        for deadline in range(10_000):
+            poll_scheduler.schedule('a', deadline)
+        assert len(poll_scheduler._heap) < 2_000
+        assert poll_scheduler.pop_due(10_000) == ['a']
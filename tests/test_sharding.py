@@ -0,0 +1,178 @@
+import json
+import time
+import asyncio
+from collections import Counter
+
+import requests
+
+import engine
+import sharding
+import state
+from utils import FakeClock, RecordingBot, mock_get_with_data
+
+KEYS = [f'tenant-{i}' for i in range(10000)]
+
+
+def quick_exit(index, count):
+    pass
+
+
+class TestHashRing:
+
+    def test_keys_are_spread_evenly(self):
+        ring = sharding.HashRing([sharding.worker_name(i) for i in range(4)])
+        counts = Counter(ring.owner(key) for key in KEYS)
+        assert len(counts) == 4
+        assert max(counts.values()) < 1.3 * len(KEYS) / 4
+
+    def test_adding_worker_moves_only_its_share(self):
+        nodes = [sharding.worker_name(i) for i in range(5)]
+        before = sharding.HashRing(nodes[:4])
+        after = sharding.HashRing(nodes)
+        moved = [key for key in KEYS if before.owner(key) != after.owner(key)]
+        assert {after.owner(key) for key in moved} == {'worker-4'}
+        assert len(moved) < 0.3 * len(KEYS)
+
+
+class TestLeases:
+
+    def test_only_one_owner_until_expiry(self, tmp_path):
+        clock = FakeClock(1000.0)
+        leases = sharding.LeaseStore(str(tmp_path / 'leases.db'), clock)
+        try:
+            assert leases.renew('a', {'t1': 10, 't2': 10}, ttl=30) == {
+                't1': 10, 't2': 10}
+            assert leases.renew('b', {'t1': 5}, ttl=30) == {}
+            clock.now += 20
+            assert leases.renew('a', {'t1': 20}, ttl=30) == {'t1': 20}
+            clock.now += 20
+            assert leases.renew('b', {'t1': 5, 't2': 5}, ttl=30) == {
+                't2': 10}
+        finally:
+            leases.close()
+
+    def test_release_hands_over_position(self, tmp_path):
+        path = str(tmp_path / 'leases.db')
+        first = sharding.LeaseStore(path)
+        second = sharding.LeaseStore(path)
+        try:
+            first.renew('a', {'t1': 10})
+            first.release('a', {'t1': 50})
+            assert second.renew('b', {'t1': 0}) == {'t1': 50}
+        finally:
+            first.close()
+            second.close()
+
+    def test_engine_polls_only_leased_tenants(self, monkeypatch, tmp_path):
+        polls = []
+
+        def mock_get(url, headers=None, params=None, **kwargs):
+            polls.append(headers['Authorization'])
+            return mock_get_with_data({'homeworks': [],
+                                       'current_date': 1})(url)
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        monkeypatch.setattr(engine, 'SCHEDULER_RESOLUTION', 0.001)
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps([{'practicum_token': f't{i}',
+                                     'chat_id': i} for i in range(3)]))
+        tenants = sharding.load_shard(str(path), 0, 1)
+        tenants[2].from_date = int(time.time())
+        polling = engine.PollingEngine(RecordingBot(), tenants,
+                                       retry_period=0.01)
+        polling.active = set()
+        started = int(time.time())
+        sharding.apply_leases(polling, {tenants[1].key: 42,
+                                        tenants[2].key: 42})
+        assert polling.active == {1, 2}
+        assert tenants[1].from_date == 42
+        assert tenants[2].from_date >= started
+        polling.active = set()
+        sharding.apply_leases(polling, {tenants[0].key: 0})
+        assert polling.active == {0}
+        assert tenants[0].from_date >= started
+
+        async def run_briefly():
+            asyncio.get_running_loop().call_later(0.1, polling.request_stop)
+            await polling.run()
+
+        try:
+            asyncio.run(run_briefly())
+        finally:
+            polling.close()
+        assert polls and set(polls) == {'OAuth t0'}
+
+
+class TestHandover:
+
+    HW = {'id': 1, 'homework_name': 'hw1', 'status': 'reviewing',
+          'date_updated': '2024-01-01T00:00:00Z'}
+
+    def test_shard_paths_skip_journal_files(self, tmp_path):
+        base = str(tmp_path / 'state.db')
+        for name in ('state.db.0', 'state.db.1', 'state.db.1-wal'):
+            (tmp_path / name).write_text('')
+        assert state.shard_paths(base) == [f'{base}.0', f'{base}.1']
+
+    def test_state_moves_with_lease(self, tmp_path):
+        base = str(tmp_path / 'state.db')
+        tenant = engine.Tenant(token='t', chat_id=7)
+        old = state.StateStore(sharding.shard_path(base, 0), flush_every=1)
+        old.checkpoint(tenant.key, 50, {'1': 'reviewing'},
+                       {'1': self.HW['date_updated']})
+        old.enqueue(7, self.HW, 'на проверке')
+        old.close()
+        new = state.StateStore(sharding.shard_path(base, 1))
+        try:
+            moved = sharding.adopt(new, [tenant],
+                                   [sharding.shard_path(base, 0)])
+            assert [text for _, _, text in moved] == ['на проверке']
+            assert tenant.from_date == 50
+            assert tenant.tracker.changes([self.HW]) == []
+            assert new.load_statuses(tenant.key) == {'1': 'reviewing'}
+            assert new.pending_outbox(10) == moved
+        finally:
+            new.close()
+        old = state.StateStore(sharding.shard_path(base, 0))
+        try:
+            assert old.pending_outbox(10) == []
+        finally:
+            old.close()
+
+    def test_leases_are_taken_before_first_poll(self, monkeypatch,
+                                                tmp_path):
+        tenants = [engine.Tenant(token=f't{i}', chat_id=i, from_date=1)
+                   for i in range(2)]
+        leases = sharding.LeaseStore(str(tmp_path / 'leases.db'))
+        polling = engine.PollingEngine(RecordingBot(), tenants)
+        started = []
+
+        async def run_until_signal(polling):
+            started.append(set(polling.active))
+
+        monkeypatch.setattr(engine, 'run_until_signal', run_until_signal)
+        try:
+            asyncio.run(sharding.hold_leases(leases, 'a', polling))
+        finally:
+            polling.close()
+            leases.close()
+        assert started == [{0, 1}]
+
+
+class TestSupervisor:
+
+    def test_dead_workers_are_restarted(self):
+        supervisor = sharding.Supervisor(2, target=quick_exit)
+        for index in range(2):
+            supervisor.spawn(index)
+        first = dict(supervisor.processes)
+        for process in first.values():
+            process.join(5)
+        supervisor.restart_dead()
+        try:
+            assert all(supervisor.processes[index] is not first[index]
+                       for index in range(2))
+        finally:
+            supervisor.stop(timeout=5)
+        assert not any(process.is_alive()
+                       for process in supervisor.processes.values())
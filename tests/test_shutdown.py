@@ -0,0 +1,122 @@
+import os
+import time
+import signal
+import asyncio
+import threading
+
+import pytest
+import requests
+import telegram
+
+import exceptions
+import outbox
+import shutdown
+import state
+from utils import RecordingBot, mock_get_with_data
+
+HW = {'id': 1, 'homework_name': 'hw1', 'status': 'approved',
+      'date_updated': '2024-01-01T00:00:00Z'}
+
+
+class FlakyBot(RecordingBot):
+    def __init__(self, failures=1):
+        super().__init__()
+        self.failures = failures
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('Telegram недоступен')
+        super().send_message(chat_id, text)
+
+
+class TestShutdown:
+
+    def test_signal_outside_wait_is_deferred(self):
+        previous = signal.getsignal(signal.SIGTERM)
+        stopper = shutdown.Shutdown()
+        stopper.install()
+        try:
+            os.kill(os.getpid(), signal.SIGTERM)
+            assert stopper.requested.is_set()
+            assert stopper.reason == 'SIGTERM'
+            with pytest.raises(exceptions.ShutdownRequested):
+                with stopper.interruptible():
+                    pass
+        finally:
+            stopper.restore()
+        assert signal.getsignal(signal.SIGTERM) is previous
+
+    def test_signal_interrupts_wait(self):
+        stopper = shutdown.Shutdown()
+        stopper.install()
+        timer = threading.Timer(0.05, os.kill, (os.getpid(), signal.SIGINT))
+        started = time.monotonic()
+        try:
+            timer.start()
+            with pytest.raises(exceptions.ShutdownRequested):
+                with stopper.interruptible():
+                    time.sleep(5)
+        finally:
+            timer.cancel()
+            stopper.restore()
+        assert time.monotonic() - started < 1
+
+    def test_drain_stops_at_deadline(self):
+        box = outbox.Outbox()
+        box.add(1, HW, 'first')
+        sent = []
+        assert box.drain(lambda *args: sent.append(args),
+                         deadline=time.monotonic() - 1) == 0
+        assert box.drain(lambda *args: sent.append(args),
+                         deadline=time.monotonic() + 10) == 1
+        assert sent == [(1, 'first')]
+
+    def test_main_drains_outbox_on_sigterm(self, monkeypatch, tmp_path,
+                                           homework_module):
+        path = str(tmp_path / 'state.sqlite3')
+        bot = FlakyBot()
+        monkeypatch.setattr(homework_module, 'PRACTICUM_TOKEN', 'token')
+        monkeypatch.setattr(homework_module, 'TELEGRAM_TOKEN', '123:abc')
+        monkeypatch.setattr(homework_module, 'TELEGRAM_CHAT_ID', 1)
+        monkeypatch.setattr(state, 'STATE_DB', path)
+        monkeypatch.setattr(telegram, 'Bot', lambda token: bot)
+        monkeypatch.setattr(requests, 'get', mock_get_with_data(
+            {'homeworks': [HW], 'current_date': 100}
+        ))
+        monkeypatch.setattr(
+            time, 'sleep', lambda secs: os.kill(os.getpid(), signal.SIGTERM)
+        )
+        previous = signal.getsignal(signal.SIGTERM)
+
+        homework_module.main()
+
+        assert signal.getsignal(signal.SIGTERM) is previous
+        assert bot.sent[-1] == (1, homework_module.parse_status(HW))
+        store = state.StateStore(path)
+        try:
+            assert store.pending_outbox(10) == []
+            assert store.load_timestamp(state.tenant_key('token')) == 100
+        finally:
+            store.close()
+
+    def test_engine_stops_after_request(self, monkeypatch):
+        import engine
+        monkeypatch.setattr(requests, 'get', mock_get_with_data(
+            {'homeworks': [HW], 'current_date': 100}
+        ))
+        bot = RecordingBot()
+        polling = engine.PollingEngine(
+            bot, [engine.Tenant(token='t', chat_id=1)], retry_period=0.01
+        )
+
+        async def stop_soon():
+            asyncio.get_running_loop().call_later(0.1, polling.request_stop)
+            await asyncio.wait_for(polling.run(), 5)
+
+        try:
+            asyncio.run(stop_soon())
+        finally:
+            polling.close()
+        assert polling.stopping
+        assert bot.sent == [(1, engine.homework.parse_status(HW))]
@@ -0,0 +1,116 @@
+import time
+import sqlite3
+
+import state
+
+
+class TestStateStore:
+
+    def test_checkpoint_survives_reopen(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = state.StateStore(path)
+        store.checkpoint('tenant', 1000, {'1': 'reviewing', '2': 'approved'})
+        store.checkpoint('tenant', 2000, {'1': 'approved'})
+        store.close()
+
+        store = state.StateStore(path)
+        try:
+            assert store.load_timestamp('tenant') == 2000
+            assert store.load_timestamps() == {'tenant': 2000}
+            assert store.load_statuses('tenant') == {
+                '1': 'approved', '2': 'approved'
+            }
+            assert store.load_timestamp('unknown') is None
+        finally:
+            store.close()
+
+    def test_checkpoints_are_flushed_in_batches(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = state.StateStore(path, flush_every=3, flush_interval=3600)
+        reader = state.StateStore(path)
+        try:
+            store.checkpoint('a', 1)
+            store.checkpoint('b', 2)
+            assert reader.load_timestamps() == {}
+            store.checkpoint('c', 3)
+            assert reader.load_timestamps() == {'a': 1, 'b': 2, 'c': 3}
+        finally:
+            store.close()
+            reader.close()
+
+    def test_resume_is_fast(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = state.StateStore(path, flush_every=10_000)
+        for i in range(10_000):
+            store.checkpoint(f'tenant-{i}', i)
+        store.close()
+        started = time.perf_counter()
+        store = state.StateStore(path)
+        timestamps = store.load_timestamps()
+        elapsed = time.perf_counter() - started
+        store.close()
+        assert len(timestamps) == 10_000
+        assert elapsed < 1
+
+    def test_keys(self):
+        assert state.tenant_key('secret') != 'secret'
+        assert state.tenant_key('secret') == state.tenant_key('secret')
+        assert state.homework_key({'id': 5, 'homework_name': 'hw'}) == '5'
+        assert state.homework_key({'homework_name': 'hw'}) == 'hw'
+
+
+def test_main_resumes_from_checkpoint(monkeypatch, tmp_path, homework_module):
+    import requests
+    import telegram
+
+    import utils
+
+    path = str(tmp_path / 'state.sqlite3')
+    homework_module.PRACTICUM_TOKEN = 'sometoken'
+    homework_module.TELEGRAM_TOKEN = '1234:abcdefg'
+    homework_module.TELEGRAM_CHAT_ID = '12345'
+    store = state.StateStore(path)
+    store.checkpoint(state.tenant_key('sometoken'), 1000198000)
+    store.close()
+    requested = []
+
+    def mock_get(*args, params=None, **kwargs):
+        requested.append(params['from_date'])
+        return utils.MockResponseGET(random_timestamp=1000198500)
+
+    def sleep_to_interrupt(secs):
+        raise utils.BreakInfiniteLoop('break')
+
+    monkeypatch.setattr(state, 'STATE_DB', path)
+    monkeypatch.setattr(requests, 'get', mock_get)
+    monkeypatch.setattr(time, 'sleep', sleep_to_interrupt)
+    monkeypatch.setattr(telegram, 'Bot', utils.MockTelegramBot)
+    try:
+        homework_module.main()
+    except utils.BreakInfiniteLoop:
+        pass
+    assert requested == [1000198000]
+    store = state.StateStore(path)
+    try:
+        assert store.load_timestamp(state.tenant_key('sometoken')) == (
+            1000198500
+        )
+    finally:
+        store.close()
+
+
+def test_old_database_gets_date_column(tmp_path):
+    path = str(tmp_path / 'old.db')
+    db = sqlite3.connect(path)
+    db.execute('CREATE TABLE homework_statuses (tenant TEXT NOT NULL, '
+               'homework TEXT NOT NULL, status TEXT NOT NULL, '
+               'PRIMARY KEY (tenant, homework))')
+    db.execute("INSERT INTO homework_statuses VALUES ('t', '1', 'approved')")
+    db.commit()
+    db.close()
+    store = state.StateStore(path)
+    try:
+        assert store.load_statuses('t') == {'1': 'approved'}
+        assert store.load_dates('t') == {}
+    finally:
+        store.close()
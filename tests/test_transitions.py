@@ -0,0 +1,94 @@
+import time
+
+import requests
+import telegram
+
+import state
+import utils
+from transitions import TransitionTracker
+
+
+class TestTransitionTracker:
+
+    def test_all_homeworks_are_checked_oldest_first(self):
+        tracker = TransitionTracker()
+        homeworks = [
+            {'id': 2, 'homework_name': 'hw2', 'status': 'approved'},
+            {'id': 1, 'homework_name': 'hw1', 'status': 'rejected'},
+        ]
+        changed = tracker.changes(homeworks)
+        assert [hw['id'] for hw in changed] == [1, 2]
+
+    def test_only_real_transitions_are_emitted(self):
+        tracker = TransitionTracker({'1': 'reviewing'})
+        same = {'id': 1, 'homework_name': 'hw1', 'status': 'reviewing'}
+        assert tracker.changes([same]) == []
+        approved = dict(same, status='approved')
+        assert tracker.changes([approved]) == [approved]
+
+    def test_unmarked_change_is_reported_again(self):
+        tracker = TransitionTracker()
+        homework = {'homework_name': 'hw', 'status': 'approved'}
+        assert tracker.changes([homework]) == [homework]
+        assert tracker.changes([homework]) == [homework]
+        tracker.mark(homework)
+        assert tracker.changes([homework]) == []
+
+    def test_repeated_verdict_with_newer_date_is_a_transition(self):
+        tracker = TransitionTracker()
+        first = {'id': 1, 'homework_name': 'hw1', 'status': 'rejected',
+                 'date_updated': '2024-01-01T10:00:00Z'}
+        tracker.mark(first)
+        assert tracker.changes([first]) == []
+        again = dict(first, date_updated='2024-01-01T12:00:00Z')
+        assert tracker.changes([again]) == [again]
+        tracker.mark(again)
+        assert tracker.changes([again]) == []
+
+    def test_dates_survive_restart(self, tmp_path):
+        store = state.StateStore(str(tmp_path / 'state.db'))
+        homework = {'id': 1, 'status': 'rejected',
+                    'date_updated': '2024-01-01T10:00:00Z'}
+        store.checkpoint('tenant', 1, {'1': 'rejected'},
+                         {'1': homework['date_updated']})
+        tracker = TransitionTracker(store.load_statuses('tenant'),
+                                    store.load_dates('tenant'))
+        store.close()
+        assert tracker.changes([homework]) == []
+        newer = dict(homework, date_updated='2024-01-02T10:00:00Z')
+        assert tracker.changes([newer]) == [newer]
+
+
+def test_main_sends_every_changed_homework(monkeypatch, homework_module,
+                                           random_timestamp):
+    homework_module.PRACTICUM_TOKEN = 'sometoken'
+    homework_module.TELEGRAM_TOKEN = '1234:abcdefg'
+    homework_module.TELEGRAM_CHAT_ID = '12345'
+    data = {
+        'homeworks': [
+            {'id': 2, 'homework_name': 'hw2', 'status': 'approved'},
+            {'id': 1, 'homework_name': 'hw1', 'status': 'rejected'},
+        ],
+        'current_date': random_timestamp,
+    }
+
+    def mock_get(*args, **kwargs):
+        response = utils.MockResponseGET(*args, **kwargs)
+        response.json = lambda: data
+        return response
+
+    def sleep_to_interrupt(secs):
+        raise utils.BreakInfiniteLoop('break')
+
+    sent = []
+    monkeypatch.setattr(requests, 'get', mock_get)
+    monkeypatch.setattr(time, 'sleep', sleep_to_interrupt)
+    monkeypatch.setattr(telegram, 'Bot', utils.MockTelegramBot)
+    monkeypatch.setattr(homework_module, 'send_message',
+                        lambda bot, message: sent.append(message))
+    try:
+        homework_module.main()
+    except utils.BreakInfiniteLoop:
+        pass
+    assert len(sent) == 2
+    assert '"hw1"' in sent[0] and '"hw2"' in sent[1]
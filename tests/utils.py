@@ -1,3 +1,4 @@
+import json
 import logging
 from collections import namedtuple
 from contextlib import contextmanager
@@ -103,3 +104,28 @@ class MockTelegramBot:
 
 class BreakInfiniteLoop(Exception):
     pass
+
+
+class RecordingBot:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+def mock_get_with_data(data):
+    def mocked(*args, **kwargs):
+        response = MockResponseGET(*args, **kwargs)
+        response.json = lambda: data
+        response.content = json.dumps(data).encode()
+        return response
+    return mocked
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
@@ -0,0 +1,59 @@
+from typing import Union, List, Dict, Iterable, Optional
+
+import state
+
+Homework = Dict[str, Union[str, int]]
+
+
+class TransitionTracker:
+    """Индекс последних известных статусов работ одного пользователя.
+
+    Работа считается изменившейся, если её статус отличается от
+    запомненного или статус тот же, но ``date_updated`` новее
+    запомненной: так виден повторный вердикт, например второе
+    «есть замечания» после доработки. Если дата не запомнена
+    (старое хранилище), сравнивается только статус.
+
+    Статус запоминается вызовом ``mark``, как только уведомление
+    о переходе принято в исходящие (``outbox.Outbox``
+    или таблицу ``outbox`` хранилища), ещё до отправки: за доставку
+    дальше отвечают исходящие, а не повторный опрос. С хранилищем
+    неотправленное уведомление уйдёт позже или после перезапуска,
+    возможно повторно (доставка «хотя бы один раз»).
+    Без хранилища ``main`` держит его в памяти до успешной отправки,
+    а движок теряет сообщение, которое очередь Telegram отбросила
+    после ``MAX_ATTEMPTS`` попыток.
+    """
+
+    __slots__ = ('statuses', 'updated')
+
+    def __init__(self, statuses: Optional[Dict[str, str]] = None,
+                 updated: Optional[Dict[str, str]] = None) -> None:
+        self.statuses: Dict[str, str] = dict(statuses or {})
+        self.updated: Dict[str, str] = dict(updated or {})
+
+    def changes(self, homeworks: Iterable[Homework]) -> List[Homework]:
+        """Возвращает работы со сменившимся статусом, от старых к новым.
+
+        API отдаёт работы от последней изменённой к первой.
+        """
+        changed: List[Homework] = []
+        for homework in reversed(list(homeworks)):
+            key: str = state.homework_key(homework)
+            if (self.statuses.get(key) != homework.get('status')
+                    or self._updated_later(key, homework)):
+                changed.append(homework)
+        return changed
+
+    def mark(self, homework: Homework) -> None:
+        """Запоминает статус и ``date_updated`` работы как известные."""
+        key: str = state.homework_key(homework)
+        self.statuses[key] = homework.get('status')
+        date_updated: Optional[str] = homework.get('date_updated')
+        if date_updated:
+            self.updated[key] = date_updated
+
+    def _updated_later(self, key: str, homework: Homework) -> bool:
+        known: Optional[str] = self.updated.get(key)
+        date_updated: Optional[str] = homework.get('date_updated')
+        return bool(known and date_updated and date_updated > known)